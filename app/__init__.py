@@ -47,9 +47,32 @@ def create_app():
             SQLALCHEMY_DATABASE_URI=uri  # app.config["DATABASE_URI"]
         )
         # app.config['UPLOAD_FOLDER'] = "upload/lcs"
-        app.config['MAX_CONTENT_PATH'] = 5 * 1024 * 1024  # 5 Mb
+        # max size of request (413 error). Uploads are not kept in memory: werkzeug spools them (bigger than 500 KB)
+        # to temporary files, and ingest job copies them by chunks to INGEST_SPOOL_DIR
+        app.config.setdefault('MAX_CONTENT_LENGTH', 128 * 1024 * 1024)
         app.config['UPLOAD_EXTENSIONS'] = ['.phc', '.ph']
         app.config['multi_lc_state'] = False
+        # LC arrays codec (see app/lc_storage.py), can be set in config class
+        app.config.setdefault('LC_CODEC_COMPRESSION', 'zlib')  # zlib, lzma, none
+        app.config.setdefault('LC_CODEC_LEVEL', 6)
+        app.config.setdefault('LC_CODEC_MAX_ERROR', None)  # float32 storage if error <= value (mag, deg, ...)
+        app.config.setdefault('INGEST_WORKERS', 1)  # background ingest threads per process, 0 - in request
+        app.config.setdefault('INGEST_PROGRESS_INTERVAL', 2)  # seconds between writes of running job progress to DB
+        # parsing and period analysis processes of every app process: CPU cores are shared by gunicorn workers
+        # (WEB_CONCURRENCY, see Procfile and gunicorn_myconf.py), INGEST_PROCESSES environment variable overrides it
+        app.config.setdefault('INGEST_PROCESSES', int(os.environ.get('INGEST_PROCESSES', 0))
+                              or max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1))))
+        app.config.setdefault('ARCHIVE_MAX_ENTRY_SIZE', 50 * 1024 * 1024)  # max unpacked file in zip/tar upload
+        # uploads wait for ingest job in files of this directory (see app/jobs.py)
+        app.config.setdefault('INGEST_SPOOL_DIR', os.path.join(app.instance_path, 'ingest_spool'))
+        # period detection (see detect_period in app/sat_utils.py)
+        app.config.setdefault('PERIOD_MODEL', 'random_forest')  # model of find_period, PERIOD_MODELS of app/period
+        app.config.setdefault('PERIOD_MAX_POINTS', 2000)  # longer LCs are binned to this number of points, None - no binning
+        app.config.setdefault('PERIOD_TIME_BUDGET', 60)  # seconds of find_period per LC, None - no limit
+        from app.lc_storage import configure_codec
+        configure_codec(compression=app.config['LC_CODEC_COMPRESSION'],
+                        level=app.config['LC_CODEC_LEVEL'],
+                        max_error=app.config['LC_CODEC_MAX_ERROR'])
 
         # print(os.getenv('CONFIG_TYPE', default='app.config.DevConfig'))
         # print(app.config['DATABASE_URI'])
@@ -90,6 +113,9 @@ def create_app():
         app.register_blueprint(api_bp)
         csrf.exempt(api_bp)    # <---- This line disables CSRF for API
 
+        from app.commands import register_commands
+        register_commands(app)
+
 
         login_manager.login_view = "auth.login"
         # app.app_context().push()
@@ -0,0 +1,92 @@
+from flask_login import current_user
+from flask_restx import Namespace, Resource, fields, reqparse
+from werkzeug.datastructures import FileStorage
+
+from app.ingest import ArchiveError
+from app.jobs import submit_ingest_job, job_progress
+from app.models import IngestJob
+from .lightcurves import check_access
+
+api = Namespace("jobs", description="Background ingest jobs (LC file uploads)")
+
+# Swagger Model
+job_file_model = api.model("IngestJobFile", {
+    "file": fields.String(description="File name"),
+    "status": fields.String(description="added, duplicate, error, skipped or null (not processed yet)"),
+    "lcs": fields.Integer(description="Number of added LCs"),
+    "message": fields.String(description="Result of processing"),
+})
+
+job_model = api.model("IngestJob", {
+    "id": fields.Integer(readonly=True),
+    "status": fields.String(description="queued, running, done or failed"),
+    "created": fields.String(description="Time of upload (UT), ISO format"),
+    "started": fields.String(description="Start of processing (UT), ISO format"),
+    "finished": fields.String(description="End of processing (UT), ISO format"),
+    "n_files": fields.Integer(description="Number of files"),
+    "n_done": fields.Integer(description="Number of processed files"),
+    "n_lcs": fields.Integer(description="Number of added LCs"),
+    "error": fields.String(description="Error of failed job"),
+    "files": fields.List(fields.Nested(job_file_model)),
+})
+
+# Define Error Message Model
+error_model = api.model("Error", {
+    "message": fields.String(description="Error message"),
+})
+
+upload_parser = reqparse.RequestParser()
+upload_parser.add_argument("files", location="files", type=FileStorage, required=True, action="append",
+                           help="LC files (.phc, .ph*) or archives of them (.zip, .tar.gz)")
+
+
+@api.route("/")
+class JobList(Resource):
+    @api.response(200, "Success", [job_model])
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No Satellite access", error_model)
+    @api.doc(security="SessionAuth", description="Requires login & Satellite access")
+    def get(self):
+        """Get last ingest jobs of current user"""
+        error = check_access()
+        if error:
+            return error
+        return [job_progress(job) for job in IngestJob.get_by_user(current_user.id)], 200
+
+    @api.expect(upload_parser)
+    @api.response(202, "Job is queued", job_model)
+    @api.response(400, "Bad archive", error_model)
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No rights to upload LCs", error_model)
+    @api.doc(security="SessionAuth", description="Requires login, Satellite access & LC upload rights")
+    def post(self):
+        """Upload LC files or archive of observing night, files are processed by background job"""
+        error = check_access()
+        if error:
+            return error
+        if not current_user.sat_lc_upload:
+            return {"message": "Access denied. No rights to upload LCs."}, 403
+        args = upload_parser.parse_args()
+        try:
+            job = submit_ingest_job(args["files"], user_id=current_user.id)
+        except ArchiveError as e:
+            return {"message": str(e)}, 400
+        return job.to_dict(), 202
+
+
+@api.route("/<int:id>")
+class JobResource(Resource):
+    @api.response(200, "Success", job_model)
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No Satellite access", error_model)
+    @api.response(404, "Job not found", error_model)
+    @api.doc(security="SessionAuth", description="Requires login & Satellite access")
+    def get(self, id):
+        """Get status and progress of ingest job by ID"""
+        error = check_access()
+        if error:
+            return error
+        job = IngestJob.get_by_id(id)
+        if job is None or (job.user_id != current_user.id and not current_user.is_admin):
+            return {"message": "Job not found"}, 404
+        return job_progress(job), 200
@@ -0,0 +1,116 @@
+from flask_login import current_user
+from flask_restx import Namespace, Resource, fields
+
+from app.jobs import submit_analysis
+from app.models import Lightcurve, Satellite
+
+api = Namespace("lightcurves", description="Satellite light curves (metadata and statistics)")
+
+# Swagger Model
+stats_model = api.model("LightcurveStats", {
+    "n_points": fields.Integer(description="Number of points"),
+    "duration": fields.Float(description="Duration of LC, sec"),
+    "mag_min": fields.Float(description="Minimal magnitude"),
+    "mag_max": fields.Float(description="Maximal magnitude"),
+    "mag_median": fields.Float(description="Median magnitude"),
+    "mag_std": fields.Float(description="Standard deviation of magnitude"),
+    "amplitude": fields.Float(description="mag_max - mag_min"),
+    "mag_err_median": fields.Float(description="Median error of magnitude"),
+    "mag_err_max": fields.Float(description="Maximal error of magnitude"),
+    "el_min": fields.Float(description="Minimal elevation, deg"),
+    "el_max": fields.Float(description="Maximal elevation, deg"),
+    "rg_min": fields.Float(description="Minimal range, km"),
+    "rg_max": fields.Float(description="Maximal range, km"),
+})
+
+lc_model = api.model("Lightcurve", {
+    "id": fields.Integer(readonly=True),
+    "sat_id": fields.Integer(description="Satellite id"),
+    "ut_start": fields.String(description="LC start (UT), ISO format", example="2025-01-30T17:19:41"),
+    "ut_end": fields.String(description="LC end (UT), ISO format", example="2025-01-30T17:24:41"),
+    "dt": fields.Float(description="Exposure, sec"),
+    "band": fields.String(description="Filter", example="V"),
+    "site": fields.String(description="Observatory"),
+    "lsp_period": fields.Float(description="Period from Lomb-Scargle periodogram, sec"),
+    "analysis_status": fields.String(description="Period analysis: pending, running, done or failed",
+                                     example="done"),
+    "analysis_updated": fields.String(description="Time of last change of analysis status (UT), ISO format"),
+    "observation_group_id": fields.Integer(description="Id of first LC of synchronous observation"),
+    "stats": fields.Nested(stats_model),
+})
+
+# Define Error Message Model
+error_model = api.model("Error", {
+    "message": fields.String(description="Error message"),
+})
+
+
+def check_access():
+    """
+    Return error response if user can not read satellite LCs, None otherwise
+    """
+    if not current_user.is_authenticated:
+        return {"message": "Authentication required. Please log in."}, 401
+    if not current_user.sat_access:
+        return {"message": "Access denied. No rights for Satellite section."}, 403
+    return None
+
+
+@api.route("/<int:id>")
+class LightcurveResource(Resource):
+    @api.response(200, "Success", lc_model)
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No Satellite access", error_model)
+    @api.response(404, "LC not found", error_model)
+    @api.doc(security="SessionAuth", description="Requires login & Satellite access")
+    def get(self, id):
+        """Get LC metadata and statistics by ID"""
+        error = check_access()
+        if error:
+            return error
+        lc = Lightcurve.get_by_id(id)
+        if lc is None:
+            return {"message": "LC not found"}, 404
+        return lc.to_dict(), 200
+
+
+@api.route("/<int:id>/analysis")
+class LightcurveAnalysis(Resource):
+    @api.response(202, "Analysis is queued", lc_model)
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No rights to upload LCs", error_model)
+    @api.response(404, "LC not found", error_model)
+    @api.response(409, "Analysis of LC has not failed", error_model)
+    @api.doc(security="SessionAuth", description="Requires login, Satellite access & LC upload rights")
+    def post(self, id):
+        """Queue failed period analysis of LC again"""
+        error = check_access()
+        if error:
+            return error
+        if not current_user.sat_lc_upload:
+            return {"message": "Access denied. No rights to upload LCs."}, 403
+        lc = Lightcurve.get_by_id(id)
+        if lc is None:
+            return {"message": "LC not found"}, 404
+        if not Lightcurve.retry_analysis(id):
+            return {"message": f"Analysis of LC is {lc.analysis_status}, only failed analysis can be retried"}, 409
+        submit_analysis()
+        return Lightcurve.get_by_id(id).to_dict(), 202
+
+
+@api.route("/satellite/<int:norad>")
+class SatelliteLightcurves(Resource):
+    @api.response(200, "Success", [lc_model])
+    @api.response(401, "Authentication required", error_model)
+    @api.response(403, "No Satellite access", error_model)
+    @api.response(404, "Satellite not found", error_model)
+    @api.doc(security="SessionAuth", description="Requires login & Satellite access")
+    def get(self, norad):
+        """Get metadata and statistics of all LCs of Satellite by NORAD"""
+        error = check_access()
+        if error:
+            return error
+        sat = Satellite.get_by_norad(norad)
+        if sat is None:
+            return {"message": "Satellite not found"}, 404
+        return [lc.to_dict() for lc in sat.get_lcs()], 200
@@ -0,0 +1,158 @@
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+import sqlalchemy as sa
+from flask.cli import with_appcontext
+
+from app.lc_storage import codec_header, decode_array, encode_array
+from app.models import db, Satellite, Lightcurve, ObservationGeometry
+
+
+@click.command("lc-repair-stats")
+@with_appcontext
+def lc_repair_stats():
+    """
+    Rebuild LC counters (lc_count, first/last LC time, LCs per band) of all Satellites
+    """
+    n = Satellite.rebuild_lc_stats()
+    click.echo(f"LC counters rebuilt for {n} satellites")
+
+
+@click.command("lc-recompress")
+@click.option("--batch-size", default=200, show_default=True, help="rows per transaction")
+@click.option("--raw-only", is_flag=True, help="re-encode only raw float64 arrays (stored before the codec)")
+@with_appcontext
+def lc_recompress(batch_size, raw_only):
+    """
+    Re-encode stored LC arrays with current codec settings (LC_CODEC_*).
+    Raw float64 arrays without codec header are converted too, so none of them are left
+    """
+    for model, columns in ((Lightcurve, ('flux', 'flux_err', 'mag', 'mag_err')),
+                           (ObservationGeometry, ('date_time', 'az', 'el', 'rg'))):
+        table = model.__table__
+        # read blobs as they are stored
+        blobs = [sa.type_coerce(table.c[name], db.LargeBinary).label(name) for name in columns]
+        n_rows, size_before, size_after, last_id = 0, 0, 0, 0
+        while True:
+            rows = db.session.execute(
+                sa.select(table.c.id, *blobs).where(table.c.id > last_id).order_by(table.c.id).limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            for row in rows:
+                values = {}
+                for name in columns:
+                    blob = row._mapping[name]
+                    if blob is None or (raw_only and codec_header(blob) is not None):
+                        continue
+                    values[name] = encode_array(decode_array(blob))
+                    size_before += len(blob)
+                    size_after += len(values[name])
+                if values:
+                    db.session.execute(table.update().where(table.c.id == row.id).values(
+                        **{name: sa.bindparam(name, value, type_=db.LargeBinary) for name, value in values.items()}))
+                n_rows += 1
+                last_id = row.id
+            db.session.commit()
+        click.echo(f"{table.name}: {n_rows} rows, {size_before / 1e6:.2f} MB -> {size_after / 1e6:.2f} MB")
+
+
+@click.command("ingest-run-queued")
+@click.option("--requeue-running", is_flag=True, help="run also jobs left running (worker died, e.g. restart of app)")
+@click.option("--older-than", type=int, default=None,
+              help="requeue only jobs started more than this number of minutes ago")
+@with_appcontext
+def ingest_run_queued(requeue_running, older_than):
+    """
+    Run queued ingest jobs (e.g. left after restart of app) in this process
+    """
+    from app.jobs import run_queued_jobs
+    started_before = datetime.utcnow() - timedelta(minutes=older_than) if older_than is not None else None
+    for job in run_queued_jobs(requeue_running=requeue_running, started_before=started_before):
+        click.echo(f"Job {job.id} {job.status}: {job.n_done} of {job.n_files} files, {job.n_lcs} LC(s) added")
+
+
+@click.command("lc-import")
+@click.argument("root", type=click.Path(exists=True, file_okay=False))
+@click.option("--processes", type=int, default=None, help="worker processes [default: INGEST_PROCESSES]")
+@click.option("--batch-size", default=50, show_default=True, help="files per transaction")
+@click.option("--dry-run", is_flag=True, help="only parse new files and check their LCs, DB is not changed")
+@click.option("--analyse/--no-analyse", default=True, show_default=True,
+              help="calculate periods of imported LCs (later by flask lc-analyse otherwise)")
+@with_appcontext
+def lc_import(root, processes, batch_size, dry_run, analyse):
+    """
+    Import LC files (.phc, .ph*) from directory tree ROOT.
+    Files imported before (same SHA-256) are skipped, so import can be restarted
+    """
+    from app.ingest import find_lc_files, import_lc_files, ERROR
+
+    paths = find_lc_files(root)
+    click.echo(f"{len(paths)} LC files in {root}" + (" (dry run)" if dry_run else ""))
+    counts, failures = Counter(), []
+    n_files, n_lcs, size = 0, 0, 0
+    t0 = time.perf_counter()
+    for res in import_lc_files(paths, root=root, processes=processes, batch_size=batch_size, dry_run=dry_run):
+        n_files += 1
+        n_lcs += res["lcs"]
+        size += res["size"]
+        counts[res["status"]] += 1
+        if res["status"] == ERROR:
+            failures.append(res)
+            click.echo(f"FAILED {res['file']}: {res['message']}", err=True)
+        if n_files % batch_size == 0 or n_files == len(paths):
+            elapsed = time.perf_counter() - t0
+            click.echo(f"{n_files}/{len(paths)} files, {n_lcs} LC(s), {n_files / elapsed:.2f} files/s, "
+                       f"{size / 1e6 / elapsed:.2f} MB/s")
+
+    elapsed = time.perf_counter() - t0
+    click.echo(f"Done in {elapsed:.1f} s: " + ", ".join(f"{n} {status}" for status, n in sorted(counts.items())))
+    if elapsed > 0:
+        click.echo(f"Throughput: {n_files / elapsed:.2f} files/s, {n_lcs / elapsed:.2f} LCs/s, "
+                   f"{size / 1e6 / elapsed:.2f} MB/s")
+    if failures:
+        click.echo(f"{len(failures)} file(s) failed:", err=True)
+        for res in failures:
+            click.echo(f"  {res['file']}: {res['message']}", err=True)
+    if n_lcs and not dry_run and analyse:
+        _analyse(processes)
+
+
+def _analyse(processes):
+    from app.jobs import analyse_pending
+
+    n = len(Lightcurve.pending_analysis_ids())
+    click.echo(f"Period analysis of {n} LC(s)...")
+    t0 = time.perf_counter()
+    results = analyse_pending(processes=processes)
+    failed = [lc_id for lc_id, status in results if status == Lightcurve.FAILED]
+    click.echo(f"Period analysis done in {time.perf_counter() - t0:.1f} s: {len(results)} LC(s), {len(failed)} failed")
+    if failed:
+        click.echo("Failed LC ids: " + " ".join(map(str, failed)), err=True)
+
+
+@click.command("lc-analyse")
+@click.option("--processes", type=int, default=None, help="worker processes [default: INGEST_PROCESSES]")
+@click.option("--retry-failed", is_flag=True, help="queue LCs with failed analysis again")
+@click.option("--requeue-running", is_flag=True, help="queue LCs left running (after restart of app)")
+@with_appcontext
+def lc_analyse(processes, retry_failed, requeue_running):
+    """
+    Calculate periods of LCs waiting for analysis in this process
+    """
+    if requeue_running:
+        click.echo(f"{Lightcurve.requeue_running()} running LC(s) queued again")
+    if retry_failed:
+        ids = [lc.id for lc in Lightcurve.query.filter_by(analysis_status=Lightcurve.FAILED)]
+        click.echo(f"{sum(map(Lightcurve.retry_analysis, ids))} failed LC(s) queued again")
+    _analyse(processes)
+
+
+def register_commands(app):
+    app.cli.add_command(lc_repair_stats)
+    app.cli.add_command(lc_recompress)
+    app.cli.add_command(ingest_run_queued)
+    app.cli.add_command(lc_import)
+    app.cli.add_command(lc_analyse)
@@ -56,8 +56,9 @@ class TestConfig:
     DEBUG = False
     TESTING = True  # Увімкнено тестовий режим
     SECRET_KEY = 'secret_test_777' #environ.get('SECRET_KEY')
-    DATABASE_URI = "sqlite:///test.db"  # Окрема тестова база
+    DATABASE_URI = environ.get('TEST_DATABASE_URL', "sqlite:///test.db")  # Окрема тестова база
     SQLALCHEMY_TRACK_MODIFICATIONS = False # Warning if skip this option
     WTF_CSRF_ENABLED = False
+    INGEST_WORKERS = 0  # run ingest jobs in request
     SESSION_TYPE = 'filesystem'  # Використовуємо файлову систему для збереження сесій
     SESSION_PERMANENT = False  # Опційно: робимо сесію непостійною
\ No newline at end of file
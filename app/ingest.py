@@ -0,0 +1,434 @@
+"""
+Batch ingest of LC files (one unit of work for the whole upload).
+
+Re-uploads are cheap: before parsing, every file is looked up by SHA-256 in
+UploadedFile, and a new file by (NORAD, start time, band) of its header.
+
+Parsing is CPU-bound and runs in a pool of worker processes (INGEST_PROCESSES,
+one per core by default). The calling thread is the single DB writer: it stores
+files in upload order, every file inside its own SAVEPOINT, then commits the
+session once at the end. A bad file rolls back only its own Satellite/LCs, so
+no partial records are left and other files are kept. Results do not depend on
+the number of processes. Files are never read whole by the calling thread: they
+are hashed in chunks, only the header is read for the duplicate check, and worker
+processes parse them from file paths (not from pickled bytes).
+
+New LCs are stored with analysis status pending, their periods are calculated
+later by the analyser (analyse_pending in app/jobs.py, in the same process pool).
+
+Archives (.zip, .tar, .tar.gz, ...) are expanded entry by entry
+(expand_uploads), every entry is ingested as a separate file. Upload jobs keep
+their files in spool files on disk until they are processed (app/jobs.py).
+Files from disk are imported by batches (import_lc_files, flask lc-import).
+"""
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import traceback
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from dateutil import parser
+from flask import current_app
+from werkzeug.datastructures import FileStorage
+
+from app.models import db, UploadedFile
+from app.lc_parser import parse_lc_file, parse_lc_header
+from app.sat_utils import store_lc_file, lcs_in_db
+
+# statuses of file in ingest report
+ADDED = "added"
+DUPLICATE = "duplicate"
+ERROR = "error"
+SKIPPED = "skipped"
+NEW = "new"  # dry run of import_lc_files: file will be added
+
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+CHUNK_SIZE = 1024 * 1024  # files are hashed and copied by chunks
+
+_pools = {}  # by number of processes
+_pool_lock = threading.Lock()
+
+
+def allowed_file(file_name):
+    """
+    Check extension of LC file by UPLOAD_EXTENSIONS (.phc, .ph[BVRC...])
+    """
+    file_ext = os.path.splitext(file_name)[1][:3]
+    return file_ext in current_app.config['UPLOAD_EXTENSIONS']
+
+
+def file_hash(file):
+    """
+    SHA-256 of bytes or binary stream (read by chunks from current position to the end)
+    """
+    if isinstance(file, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(file).hexdigest()
+    sha256 = hashlib.sha256()
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def is_archive(file_name):
+    return file_name.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+class ArchiveError(ValueError):
+    """
+    Archive can not be read (bad format, too big entry)
+    """
+
+
+def _is_service_entry(path):
+    # macOS resource forks and hidden files
+    return path.startswith("__MACOSX/") or os.path.basename(path).startswith(".")
+
+
+def _check_entry_size(name, size, max_size):
+    # zipfile and tarfile do not read more than the size in entry header
+    if size > max_size:
+        raise ArchiveError(f"Entry {name} is bigger than {max_size} bytes")
+
+
+def iter_archive(file, max_entry_size=None):
+    """
+    Read entries of zip or tar archive one by one (archive is not extracted to disk).
+    zip needs seekable stream (uploads are spooled to temporary file by werkzeug),
+    tar (compressed or not) is read as a stream
+    Args:
+        file: FileStorage (or other object with .filename and .stream)
+        max_entry_size: max size of unpacked entry, ARCHIVE_MAX_ENTRY_SIZE by default
+    Yields:
+        (name of entry, binary stream of entry), name is "archive_name/path/in/archive".
+        Stream is valid only until the next entry is taken
+    """
+    if max_entry_size is None:
+        max_entry_size = current_app.config['ARCHIVE_MAX_ENTRY_SIZE']
+    archive_name = file.filename
+    try:
+        if archive_name.lower().endswith(".zip"):
+            with zipfile.ZipFile(file.stream) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or _is_service_entry(info.filename):
+                        continue
+                    _check_entry_size(info.filename, info.file_size, max_entry_size)
+                    with zf.open(info) as entry:
+                        yield f"{archive_name}/{info.filename}", entry
+        else:
+            with tarfile.open(fileobj=file.stream, mode="r|*") as tf:
+                for member in tf:
+                    if not member.isfile() or _is_service_entry(member.name):
+                        continue
+                    _check_entry_size(member.name, member.size, max_entry_size)
+                    yield f"{archive_name}/{member.name}", tf.extractfile(member)
+    except (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError) as e:
+        raise ArchiveError(f"Bad archive {archive_name}: {e}") from e
+
+
+def expand_uploads(files):
+    """
+    Uploaded files and entries of uploaded archives
+    Args:
+        files: list of FileStorage (or other objects with .filename and .stream)
+    Yields:
+        (file name, binary stream of file), stream is valid only until the next file is taken
+    Raises:
+        ArchiveError if archive can not be read
+    """
+    for file in files:
+        if is_archive(file.filename):
+            yield from iter_archive(file)
+        else:
+            yield file.filename, file.stream
+
+
+def get_process_pool(processes, broken=None):
+    """
+    Pool of worker processes, shared by threads of app process (job workers, requests, CLI).
+    There is one pool per number of processes: a pool in use is never shut down by request of other size.
+    Processes are spawned (not forked), as app process runs other threads
+    Args:
+        processes: number of worker processes
+        broken: pool which raised BrokenProcessPool (worker process died), it is replaced by new pool
+    """
+    with _pool_lock:
+        pool = _pools.get(processes)
+        if pool is None or pool is broken:
+            if pool is not None:
+                pool.shutdown(wait=False)  # broken pool does not take or run tasks anymore
+            pool = ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"))
+            pool.processes = processes
+            _pools[processes] = pool
+    return pool
+
+
+def submit_task(pool, func, *args):
+    """
+    Run func in pool, or right now if there is no pool. Returns Future.
+    Broken pool (see get_process_pool) is replaced, the task runs in the new pool
+    """
+    if pool is not None:
+        try:
+            return pool.submit(func, *args)
+        except BrokenProcessPool:
+            return get_process_pool(pool.processes, broken=pool).submit(func, *args)
+    future = Future()
+    try:
+        future.set_result(func(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def spool_file(stream, spool_dir, prefix=""):
+    """
+    Copy binary stream by chunks to new file in spool_dir
+    Returns: path of file
+    """
+    with tempfile.NamedTemporaryFile(dir=spool_dir, prefix=prefix, delete=False) as f:
+        shutil.copyfileobj(stream, f, CHUNK_SIZE)
+    return f.name
+
+
+def _parse_path(path, file_ext):
+    """
+    parse_lc_file of file on disk (task of worker process)
+    """
+    with open(path, "rb") as f:
+        return parse_lc_file(f, file_ext)
+
+
+def _find_duplicate(stream, file_ext, sha256):
+    """
+    Check file before parsing: one hash lookup, then (if file is new) one indexed query by header.
+    Only header lines are read from stream, stream is rewound after that.
+    Returns: message if file is stored already (None otherwise), header of file (None if it is not read)
+    """
+    if UploadedFile.get_by_hash(sha256) is not None:
+        return "file already uploaded", None
+    try:
+        header = parse_lc_header(stream, file_ext)
+        for lc in header["lcs"]:
+            lc["lc_st"] = parser.parse(lc["lc_st"])
+    except Exception:
+        return None, None  # full parser reports the error
+    finally:
+        stream.seek(0)
+    if all(lcs_in_db(header["norad"], header["lcs"])):
+        return "LC(s) already in DB", header
+    return None, header
+
+
+def _lc_key(parsed):
+    """
+    (NORAD, start time) of LCs of parsed file or header, for UploadedFile
+    """
+    lc_st = parsed["lcs"][0]["lc_st"]
+    return parsed["norad"], parser.parse(lc_st) if isinstance(lc_st, str) else lc_st
+
+
+def ingest_files(files, processes=None, on_file=None):
+    """
+    Parse and store LC files in one transaction.
+    Files are not parsed if they were uploaded before (SHA-256 in UploadedFile)
+    or all their LCs are in DB (NORAD, start time and band from header).
+    Files are taken one by one when they are needed and are not read into memory:
+    they are hashed by chunks, and worker processes parse them from disk
+    (streams without file path are copied to temporary files for the pool).
+    Periods of added LCs are not calculated here (analysis status pending)
+    Args:
+        files: iterable of FileStorage (or other objects with .filename and seekable binary .stream)
+        processes: number of worker processes for parsing,
+                   INGEST_PROCESSES by default, 1 - everything in calling thread
+        on_file: function(index of file in files, result), called when file is processed (before commit)
+    Returns:
+        list of dicts (one per file) {"file", "status", "lcs" (number of added LCs), "message", "sha256"}
+        status is one of ADDED, DUPLICATE, ERROR, SKIPPED.
+        Hashes of stored files (ADDED, DUPLICATE) are kept in UploadedFile
+    """
+    logger = current_app.logger
+    if processes is None:
+        processes = current_app.config['INGEST_PROCESSES']
+    window = processes
+    pool = None
+    report = []
+    parsing = deque()  # (index, result, size, future of parsed file, temporary file or None)
+
+    def done(index, result):
+        if on_file is not None:
+            on_file(index, result)
+
+    def store_next():
+        # single writer, files are stored in upload order
+        index, result, size, future, tmp_path = parsing.popleft()
+        try:
+            parsed = future.result()
+        except Exception as e:
+            logger.error(f"Bad format in file = {result['file']}. Error: {e}")
+            logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+            result.update(status=ERROR, message=f"bad format: {e}")
+            done(index, result)
+            return
+        finally:
+            if tmp_path is not None:
+                os.remove(tmp_path)
+        try:
+            with db.session.begin_nested():
+                added = store_lc_file(parsed, db, commit=False)
+                UploadedFile.record(result["sha256"], result["file"], size, len(added), *_lc_key(parsed))
+        except Exception as e:
+            logger.error(f"Error: {e}. File {result['file']} is not added to DB")
+            logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+            result.update(status=ERROR, message=str(e))
+        else:
+            result["lcs"] = len(added)
+            if added:
+                result.update(status=ADDED, message=f"{len(added)} LC(s) added")
+            else:
+                result.update(status=DUPLICATE, message="LC(s) already in DB")
+            logger.info(f"File {result['file']} successfully processed: {result['message']}")
+        done(index, result)
+
+    for index, file in enumerate(files):
+        file_name = file.filename
+        if not allowed_file(file_name):
+            logger.warning(f"Wrong file ext in {file_name}. Skipping this file....")
+            result = {"file": file_name, "status": SKIPPED, "lcs": 0, "message": "wrong file extension",
+                      "sha256": None}
+            report.append(result)
+            done(index, result)
+            continue
+        stream = file.stream
+        file_ext = os.path.splitext(file_name)[1]
+        result = {"file": file_name, "status": None, "lcs": 0, "message": "", "sha256": file_hash(stream)}
+        size = stream.tell()
+        stream.seek(0)
+        report.append(result)
+
+        if any(r["sha256"] == result["sha256"] for _, r, _, _, _ in parsing):
+            # copy of file in the window: original is stored first, so the copy is found by hash
+            while parsing:
+                store_next()
+        # files which are stored already are not parsed
+        message, header = _find_duplicate(stream, file_ext, result["sha256"])
+        if message is not None:
+            if header is not None:  # file is new, its LCs are not
+                try:
+                    with db.session.begin_nested():
+                        UploadedFile.record(result["sha256"], file_name, size, 0, *_lc_key(header))
+                except Exception as e:
+                    logger.error(f"Error: {e}. File {file_name} is not recorded as uploaded")
+                    logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+            result.update(status=DUPLICATE, message=message)
+            logger.info(f"File {file_name} is not parsed: {message}")
+            done(index, result)
+            continue
+
+        if pool is None and processes > 1:
+            pool = get_process_pool(processes)
+        tmp_path = None
+        if pool is None:
+            future = submit_task(pool, parse_lc_file, stream, file_ext)
+        else:
+            path = getattr(stream, "name", None)
+            if not isinstance(path, str) or not os.path.isfile(path):
+                path = tmp_path = spool_file(stream, None, prefix="lc_ingest_")
+            future = submit_task(pool, _parse_path, os.path.abspath(path), file_ext)
+        parsing.append((index, result, size, future, tmp_path))
+        if len(parsing) > window:
+            store_next()
+
+    while parsing:
+        store_next()
+
+    db.session.commit()
+    return report
+
+
+def find_lc_files(root):
+    """
+    Paths of LC files (UPLOAD_EXTENSIONS) in directory tree, sorted
+    """
+    paths = []
+    for dir_path, dir_names, file_names in os.walk(root):
+        dir_names.sort()
+        paths.extend(os.path.join(dir_path, name) for name in sorted(file_names) if allowed_file(name))
+    return paths
+
+
+def _path_hash(path):
+    with open(path, "rb") as f:
+        return file_hash(f)
+
+
+def _dry_run(paths, names, pool):
+    """
+    Parse new files and check their LCs in DB, nothing is written
+    """
+    hashes = [_path_hash(path) for path in paths]
+    known = UploadedFile.known_hashes(hashes)
+    futures = [None if sha256 in known else submit_task(pool, _parse_path, path, os.path.splitext(name)[1])
+               for path, name, sha256 in zip(paths, names, hashes)]
+    report = []
+    for name, sha256, future in zip(names, hashes, futures):
+        result = {"file": name, "status": None, "lcs": 0, "message": "", "sha256": sha256}
+        report.append(result)
+        if future is None:
+            result.update(status=DUPLICATE, message="file already uploaded")
+            continue
+        try:
+            parsed = future.result()
+        except Exception as e:
+            result.update(status=ERROR, message=f"bad format: {e}")
+            continue
+        result["lcs"] = lcs_in_db(parsed["norad"], parsed["lcs"]).count(False)
+        if result["lcs"]:
+            result.update(status=NEW, message=f"{result['lcs']} LC(s) to add")
+        else:
+            result.update(status=DUPLICATE, message="LC(s) already in DB")
+    return report
+
+
+def import_lc_files(paths, root=None, processes=None, batch_size=50, dry_run=False):
+    """
+    Bulk import of LC files from disk (flask lc-import). Files are ingested by batches,
+    every batch is one transaction. Files which are in UploadedFile (imported before)
+    are not parsed (see ingest_files), so interrupted import can be started again
+    Args:
+        paths: list of file paths
+        root: file names in report are relative to root
+        processes: number of worker processes, INGEST_PROCESSES by default
+        batch_size: files per transaction
+        dry_run: only parse new files and check their LCs in DB (status NEW or DUPLICATE)
+    Yields:
+        result of every file (see ingest_files) with "size" of file, in order of paths
+    """
+    if processes is None:
+        processes = current_app.config['INGEST_PROCESSES']
+    for i in range(0, len(paths), batch_size):
+        batch = paths[i:i + batch_size]
+        names = [os.path.relpath(path, root) if root else path for path in batch]
+        if dry_run:
+            report = _dry_run(batch, names, get_process_pool(processes) if processes > 1 else None)
+        else:
+            report = ingest_files(_open_files(batch, names), processes=processes)
+        for path, result in zip(batch, report):
+            result["size"] = os.path.getsize(path)
+            yield result
+
+
+def _open_files(paths, names):
+    """
+    Files from disk for ingest_files, every file is opened when it is needed and closed after parsing
+    (worker processes open it again by path)
+    """
+    for path, name in zip(paths, names):
+        with open(path, "rb") as f:
+            yield FileStorage(stream=f, filename=name)
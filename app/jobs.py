@@ -0,0 +1,300 @@
+"""
+Background ingest jobs and period analysis.
+
+Upload request only copies the files by chunks to spool files on disk
+(INGEST_SPOOL_DIR), records them in ingest_job / ingest_job_file tables
+and returns. Spool file is deleted when its file is processed. Files are parsed and stored by a local pool of worker threads
+(INGEST_WORKERS per app process). Files of job are stored in one transaction
+(see ingest_files); job counters are written meanwhile by short transactions of another
+connection (every INGEST_PROGRESS_INTERVAL seconds), so UI polls progress via /api/jobs/<id>
+from any app process. SQLite can not write them during the ingest transaction, there
+progress is seen only by the process which runs the job (job_progress).
+Jobs left queued, or running by a worker which died (restart, OOM kill),
+are run by flask ingest-run-queued [--requeue-running].
+
+New LCs are visible at once with analysis status pending. The analyser
+(analyse_pending, queued after every job) claims pending LCs one by one and
+calculates their periods in the ingest process pool; LC gets status done, or
+failed if analysis raised. Failed LC can be queued again on its own
+(POST /api/lightcurves/<id>/analysis, flask lc-analyse --retry-failed).
+INGEST_WORKERS = 0 runs jobs and analysis in the calling thread (tests, CLI).
+"""
+import functools
+import os
+import threading
+import time
+import traceback
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import FileStorage
+
+from app import cache
+from app.ingest import ingest_files, expand_uploads, get_process_pool, spool_file, submit_task
+from app.models import db, IngestJob, Lightcurve, Periodogram
+from app.sat_utils import calc_lsp_periodograms, period_options
+
+_executor = None
+_executor_lock = threading.Lock()
+_progress = {}  # job id -> (processed files, added LCs) of jobs running in this process (for SQLite)
+_progress_lock = threading.Lock()
+
+
+def get_executor(app):
+    """
+    Worker pool of this process (created on first use, i.e. after gunicorn fork)
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config['INGEST_WORKERS'],
+                                           thread_name_prefix="ingest")
+    return _executor
+
+
+def submit_ingest_job(files, user_id=None):
+    """
+    Queue uploaded files for ingest, archives are queued as their entries
+    Args:
+        files: list of FileStorage (or other objects with .filename and .stream)
+        user_id: id of user who uploads files
+    Returns:
+        IngestJob (already finished if INGEST_WORKERS = 0)
+    Raises:
+        ArchiveError if archive can not be read (no job is created)
+    """
+    spool_dir = current_app.config['INGEST_SPOOL_DIR']
+    os.makedirs(spool_dir, exist_ok=True)
+    spooled = []
+
+    def spool_uploads():
+        for name, stream in expand_uploads(files):
+            spooled.append(spool_file(stream, spool_dir, prefix="upload_"))
+            yield name, spooled[-1]
+
+    try:
+        job = IngestJob.create(spool_uploads(), user_id=user_id)
+    except Exception:
+        _remove_spooled(spooled)
+        raise
+    app = current_app._get_current_object()
+    app.logger.info(f"Ingest job {job.id} queued ({job.n_files} files)")
+    if app.config['INGEST_WORKERS'] > 0:
+        get_executor(app).submit(_run_in_app_context, app, job.id)
+    else:
+        run_ingest_job(job.id)
+    return job
+
+
+def _remove_spooled(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _run_in_app_context(app, job_id):
+    with app.app_context():
+        try:
+            run_ingest_job(job_id)
+        except Exception as e:  # job stays queued or running, see run_queued_jobs
+            app.logger.error(f"Ingest job {job_id} is not processed. Error: {e}")
+            app.logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+        finally:
+            db.session.remove()
+
+
+def _analyse_in_app_context(app):
+    with app.app_context():
+        try:
+            analyse_pending()
+        except Exception as e:  # LCs stay pending (or running, see Lightcurve.requeue_running)
+            app.logger.error(f"Period analysis is not finished. Error: {e}")
+            app.logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+        finally:
+            db.session.remove()
+
+
+def run_ingest_job(job_id):
+    """
+    Process files of queued job (parsing and analysis in worker processes, see app/ingest.py).
+    LCs, satellites and file results of job are committed together (one transaction of ingest_files),
+    so job which is not finished (worker died) is run again from the start of its pending files.
+    Job counters (n_done, n_lcs) are written meanwhile outside of the transaction (IngestJob.store_progress),
+    the job row is not changed in the session until the end, so the writes do not wait for the transaction
+    Returns: IngestJob or None if job is not queued (e.g. taken by other worker)
+    """
+    logger = current_app.logger
+    if not IngestJob.claim(job_id):
+        return None
+    job = IngestJob.get_by_id(job_id)
+    interval = current_app.config['INGEST_PROGRESS_INTERVAL']
+    processed = []  # spooled files, deleted after commit
+    # counters of committed files (job left running by dead worker can have written progress of more)
+    committed = [job_file for job_file in job.files if job_file.status is not None]
+    base = len(committed), sum(job_file.n_lcs for job_file in committed)
+    counters = {"n_done": base[0], "n_lcs": base[1], "stored": time.monotonic()}
+
+    def on_file(index, res):
+        job_file = pending[index]
+        job_file.status = res["status"]
+        job_file.n_lcs = res["lcs"]
+        job_file.message = res["message"]
+        processed.append(job_file.path)
+        job_file.path = None  # not needed anymore
+        counters["n_done"] += 1
+        counters["n_lcs"] += res["lcs"]
+        with _progress_lock:
+            _progress[job_id] = (counters["n_done"], counters["n_lcs"])
+        if time.monotonic() - counters["stored"] >= interval:
+            try:
+                IngestJob.store_progress(job_id, counters["n_done"], counters["n_lcs"])
+            except Exception as e:  # progress only, job goes on
+                logger.warning(f"Progress of ingest job {job_id} is not stored. Error: {e}")
+            counters["stored"] = time.monotonic()
+
+    def open_files():
+        # files are opened one by one, when ingest_files takes them
+        for job_file in pending:
+            with open(job_file.path, "rb") as f:
+                yield FileStorage(stream=f, filename=job_file.file_name)
+
+    try:
+        pending = [job_file for job_file in job.files if job_file.status is None]
+        ingest_files(open_files(), on_file=on_file)
+        _remove_spooled(processed)
+        job.n_done, job.n_lcs = counters["n_done"], counters["n_lcs"]
+        job.status = IngestJob.DONE
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Ingest job {job_id} failed. Error: {e}")
+        logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+        job.n_done, job.n_lcs = base  # progress written meanwhile is rolled back
+        job.status = IngestJob.FAILED
+        job.error = str(e)
+        # failed job is not run again
+        _remove_spooled(job_file.path for job_file in job.files if job_file.path)
+        for job_file in job.files:
+            job_file.path = None
+    finally:
+        with _progress_lock:
+            _progress.pop(job_id, None)
+    job.finished = datetime.utcnow()
+    db.session.commit()
+    if job.n_lcs:
+        cache.clear()
+    logger.info(f"Ingest job {job_id} {job.status}: {job.n_done} of {job.n_files} files, {job.n_lcs} LC(s) added")
+    if job.n_lcs:
+        submit_analysis()
+    return job
+
+
+def job_progress(job):
+    """
+    Job as dict (IngestJob.to_dict), progress of job which runs in this process is taken from memory
+    (up to date, on SQLite it is not written to DB until the job is finished)
+    """
+    data = job.to_dict()
+    with _progress_lock:
+        progress = _progress.get(job.id)
+    if progress is not None and job.status == IngestJob.RUNNING:
+        data["n_done"], data["n_lcs"] = progress
+    return data
+
+
+def run_queued_jobs(requeue_running=False, started_before=None):
+    """
+    Run all queued jobs in the calling thread (jobs left after restart of app)
+    Args:
+        requeue_running: run also jobs left running by dead worker (see IngestJob.requeue_running)
+        started_before: requeue only jobs started before this time
+    Returns: list of processed jobs
+    """
+    if requeue_running:
+        IngestJob.requeue_running(started_before)
+    ids = [job.id for job in IngestJob.query.filter_by(status=IngestJob.QUEUED).order_by(IngestJob.id)]
+    return [job for job in map(run_ingest_job, ids) if job is not None]
+
+
+def submit_analysis():
+    """
+    Queue period analysis of pending LCs (runs in the calling thread if INGEST_WORKERS = 0)
+    """
+    app = current_app._get_current_object()
+    if app.config['INGEST_WORKERS'] > 0:
+        get_executor(app).submit(_analyse_in_app_context, app)
+    else:
+        analyse_pending()
+
+
+def analyse_pending(processes=None, limit=None):
+    """
+    Calculate periods of pending LCs (oldest first) in worker processes and store their periodograms.
+    Every LC is claimed (pending -> running) before analysis, so several analysers do not
+    take the same LC; result is committed per LC. Period set by hand meanwhile is kept
+    Args:
+        processes: number of worker processes, INGEST_PROCESSES by default
+        limit: max number of LCs
+    Returns:
+        list of (LC id, analysis status), status is Lightcurve.DONE or Lightcurve.FAILED
+    """
+    logger = current_app.logger
+    if processes is None:
+        processes = current_app.config['INGEST_PROCESSES']
+    ids = Lightcurve.pending_analysis_ids(limit)
+    if not ids:
+        return []
+    pool = get_process_pool(processes) if processes > 1 and len(ids) > 1 else None
+    calc_period = functools.partial(calc_lsp_periodograms, **period_options(current_app.config))
+    analysing = deque()  # (id, future of period and periodograms), LCs are loaded one by one
+    results = []
+
+    def store_next():
+        lc_id, future = analysing.popleft()
+        try:
+            period, periodograms = future.result()
+        except Exception as e:
+            logger.error(f"Period analysis of LC {lc_id} failed. Error: {e}")
+            logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
+            status = Lightcurve.FAILED
+            Lightcurve.set_analysis_status(lc_id, status, Lightcurve.RUNNING)
+        else:
+            status = Lightcurve.DONE
+            try:
+                # status and periodograms in one transaction
+                if Lightcurve.set_analysis_status(lc_id, status, Lightcurve.RUNNING, commit=False,
+                                                  lsp_period=period):
+                    # not for LC deleted meanwhile (or with period set by hand, LSP plot calculates it)
+                    for periodogram in periodograms:
+                        Periodogram.store(lc_id, periodogram)
+                db.session.commit()
+            except IntegrityError:  # periodogram stored by LSP plot meanwhile (see get_periodogram)
+                db.session.rollback()
+                logger.warning(f"Periodograms of LC {lc_id} are stored already, only its period is saved")
+                Lightcurve.set_analysis_status(lc_id, status, Lightcurve.RUNNING, lsp_period=period)
+        results.append((lc_id, status))
+
+    for lc_id in ids:
+        if not Lightcurve.claim_analysis(lc_id):
+            continue  # taken by other analyser
+        try:
+            lc = Lightcurve.get_by_id(lc_id, arrays=True)
+            future = submit_task(pool, calc_period, lc.date_time, lc.mag, lc.mag_err, lc.dt)
+        except Exception as e:
+            future = Future()
+            future.set_exception(e)
+        analysing.append((lc_id, future))
+        if len(analysing) > processes:
+            store_next()
+    while analysing:
+        store_next()
+
+    if results:
+        cache.clear()
+    logger.info(f"Period analysis of {len(results)} LC(s): "
+                f"{sum(status == Lightcurve.FAILED for _, status in results)} failed")
+    return results
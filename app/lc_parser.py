@@ -0,0 +1,310 @@
+"""
+One-pass parser of LC photometry files (.phc and .phX).
+
+File is read line by line only once (from bytes or directly from upload stream,
+without decoded copy of the whole file): header lines are parsed while they come,
+data lines are collected in chunks, every chunk is split into tokens once and
+its columns are converted with NumPy into preallocated (growable) arrays.
+
+Formats:
+    phc    - Uzhhorod two-band (B, V) file: 7 header lines, time column is UT only
+    ut     - .phX with "Date UT" time columns and mag_err (13 columns and file name)
+    jd     - .phX with JD time column (12 columns and file name)
+    nomerr - old .phX with "Date UT" time columns and without mag_err
+"""
+import io
+
+import numpy as np
+
+FMT_PHC, FMT_UT, FMT_JD, FMT_NOMERR = "phc", "ut", "jd", "nomerr"
+
+PHC_HEADER_LINES = 7
+CHUNK_LINES = 4096
+
+# data columns: (name, index in row)
+PHC_COLUMNS = (("flux_b", 1), ("flux_v", 2), ("fon_b", 3), ("fon_v", 4), ("mag_b", 5), ("mag_v", 6),
+               ("az", 7), ("el", 8), ("rg", 9))
+PH_COLUMNS = {
+    FMT_UT: (("flux", 6), ("flux_err", 7), ("mag", 8), ("mag_err", 9), ("az", 10), ("el", 11), ("rg", 12)),
+    FMT_JD: (("flux", 5), ("flux_err", 6), ("mag", 7), ("mag_err", 8), ("az", 9), ("el", 10), ("rg", 11)),
+    FMT_NOMERR: (("flux", 5), ("flux_err", 6), ("mag", 7), ("az", 8), ("el", 9), ("rg", 10)),
+}
+
+JD_UNIX_EPOCH = 2440587.5  # JD of 1970-01-01 00:00 UTC
+UNIX_EPOCH = np.datetime64("1970-01-01", "us")
+US_PER_DAY = 86400 * 10 ** 6
+ROLLOVER = np.timedelta64(2, "h")  # phc: time earlier than start by this is the next day
+
+UT_COLUMNS = 13  # without file name column
+JD_COLUMNS = 13  # with file name column
+
+
+class ColumnBuffer:
+    """
+    Preallocated columns (float by default), capacity is doubled when it is full
+    """
+    def __init__(self, ncols, capacity=CHUNK_LINES, dtype=float):
+        self.data = np.empty((ncols, capacity), dtype=dtype)
+        self.size = 0
+
+    def append(self, columns):
+        n = len(columns[0])
+        if self.size + n > self.data.shape[1]:
+            capacity = max(2 * self.data.shape[1], self.size + n)
+            data = np.empty((len(self.data), capacity), dtype=self.data.dtype)
+            data[:, :self.size] = self.data[:, :self.size]
+            self.data = data
+        for row, col in zip(self.data, columns):
+            row[self.size:self.size + n] = col
+        self.size += n
+
+    def columns(self):
+        return self.data[:, :self.size]
+
+
+def _value(line, sep="="):
+    return line.split(sep, 1)[1].strip()
+
+
+def _detect_ph_format(tokens):
+    """
+    Format of .phX file by the first data row
+    """
+    if "-" in tokens[0]:  # Date UT ...
+        return FMT_UT if len(tokens) >= UT_COLUMNS else FMT_NOMERR
+    if len(tokens) == JD_COLUMNS:
+        return FMT_JD
+    raise ValueError(f"Unknown LC data format ({len(tokens)} columns)")
+
+
+def _read_data(lines, first_tokens, columns, time_columns, fmt, date=None):
+    """
+    Read data lines in chunks, time columns are decoded chunk by chunk too
+    Args:
+        lines: iterator over remaining data lines (empty lines and lines starting with # are skipped)
+        first_tokens: tokens of the first data line (already read for format detection)
+        columns: ((name, index), ...) of numeric columns
+        time_columns: indexes of time columns
+        fmt, date: see decode_times
+    Returns:
+        dict {name: float array}, datetime64[us] array (phc: without day rollover, see decode_times)
+    """
+    ncols = len(first_tokens)
+    num_idx = [i for _, i in columns]
+    buffer = ColumnBuffer(len(num_idx))
+    time_buffer = ColumnBuffer(1, dtype="datetime64[us]")
+
+    def convert(chunk):
+        tokens = " ".join(chunk).split()
+        if len(tokens) != ncols * len(chunk):
+            bad = [line for line in chunk if len(line.split()) != ncols][0]
+            raise ValueError(f"Bad LC data line (expected {ncols} columns): {bad.strip()}")
+        # every column is a strided slice of the flat token list
+        buffer.append([np.array(tokens[i::ncols], dtype=float) for i in num_idx])
+        time_buffer.append([_decode_chunk(fmt, [tokens[i::ncols] for i in time_columns], date)])
+
+    chunk = [" ".join(first_tokens)]
+    for line in lines:
+        stripped = line.lstrip()
+        if not stripped or stripped[0] == "#":  # empty and comment lines
+            continue
+        chunk.append(line)
+        if len(chunk) == CHUNK_LINES:
+            convert(chunk)
+            chunk = []
+    if chunk:
+        convert(chunk)
+
+    data = dict(zip([name for name, _ in columns], buffer.columns()))
+    return data, time_buffer.columns()[0]
+
+
+def _decode_chunk(fmt, times, date=None):
+    if fmt == FMT_JD:
+        days = np.array(times[0], dtype=float) - JD_UNIX_EPOCH  # exact for JDs of last centuries
+        whole = np.floor(days)
+        us = np.round((days - whole) * US_PER_DAY).astype("timedelta64[us]")
+        return UNIX_EPOCH + whole.astype("timedelta64[D]") + us
+    if fmt == FMT_PHC:
+        return np.array([date + "T" + x for x in times[0]], dtype="datetime64[us]")
+    return np.array([d + "T" + t for d, t in zip(times[0], times[1])], dtype="datetime64[us]")
+
+
+def _rollover(lctime):
+    """
+    phc: add DAY to times after 00:00:00
+    """
+    return np.where(lctime[0] - lctime < ROLLOVER, lctime, lctime + np.timedelta64(1, "D"))
+
+
+def decode_times(fmt, times, date=None):
+    """
+    Time columns (strings) -> datetime64[us] array (UTC), without Python datetime objects
+    Args:
+        fmt: file format
+        times: list of time string lists: [UT] for phc, [Date, UT] for ut/nomerr, [JD] for jd
+        date: date of LC start (phc files have only UT in data lines)
+    """
+    lctime = _decode_chunk(fmt, times, date)
+    return _rollover(lctime) if fmt == FMT_PHC else lctime
+
+
+def _read_phc_header(lines):
+    """
+    Header of .phc file, lines: iterator of text lines (stays at first data line)
+    """
+    res = {"format": FMT_PHC}
+    res["start"] = next(lines).strip()
+    res["end"] = next(lines).strip()
+    for _ in range(PHC_HEADER_LINES - 2):
+        line = next(lines)
+        if line[:9] == "COSPAR ID":
+            res["cospar"] = _value(line)
+        if line[:8] == "NORAD ID":
+            res["norad"] = int(_value(line))
+        if line[:4] == "NAME":
+            name = _value(line)
+            res["name"] = name[2:] if name[:2] == "0 " else name  # delete leading zero in TLE name line
+        if line[:2] == "dt":
+            res["dt"] = _value(line)
+    return res
+
+
+def read_phc(lines):
+    """
+    Parse .phc file
+    Args:
+        lines: iterable of text lines (with line ends)
+    Returns:
+        dict {"format", "norad", "name", "cospar", "dt", "start", "end", "time", <data columns>}
+    """
+    lines = iter(lines)
+    res = _read_phc_header(lines)
+    first = next(line for line in lines if line.strip() and line.lstrip()[0] != "#").split()
+    data, lctime = _read_data(lines, first, PHC_COLUMNS, (0,), FMT_PHC, date=res["start"].split()[0])
+    res.update(data)
+    res["time"] = _rollover(lctime)
+    return res
+
+
+def _read_ph_header(lines, file_ext):
+    """
+    Header of .phX file, lines: iterator of text lines
+    Returns: header dict, tokens of first data line (None if there are no data lines)
+    """
+    # Default values
+    res = {"site": "Derenivka", "band": file_ext[3:]}
+    next(lines)  # "# TLE:"
+    res["tle"] = next(lines)[2:] + next(lines)[2:] + next(lines)[2:]
+    res["start"] = next(lines).strip()[2:].strip()[:-1]
+    res["end"] = next(lines).strip()[2:].strip()[:-1]
+
+    for line in lines:
+        if line[:1] != "#":
+            if line.strip():
+                return res, line.split()
+            continue
+        l = line.rstrip("\r\n").split(" = ")
+        if l[0] == "# COSPAR":
+            res["cospar"] = l[1]
+        if l[0] == "# NORAD ":
+            res["norad"] = int(l[1])
+        if l[0] == "# NAME  ":
+            res["name"] = l[1][2:] if l[1][:2] == "0 " else l[1]  # delete leading zero in TLE name line
+        if l[0] == "# dt":
+            res["dt"] = l[1]
+        if l[0] == "# SITE_NAME  ":
+            res["site"] = l[1]
+        if l[0] == "# Filter":
+            res["band"] = l[1]
+    return res, None
+
+
+def read_ph(lines, file_ext):
+    """
+    Parse .phX file (X is filter)
+    Args:
+        lines: iterable of text lines (with line ends)
+        file_ext: extension of file, filter is taken from it if there is no Filter in header
+    Returns:
+        dict {"format", "norad", "name", "cospar", "dt", "start", "end", "tle", "site", "band", "time",
+              <data columns>}
+    """
+    lines = iter(lines)
+    res, first = _read_ph_header(lines, file_ext)
+    if first is None:
+        raise ValueError("No data lines in LC file")
+
+    fmt = _detect_ph_format(first)
+    time_columns = (0,) if fmt == FMT_JD else (0, 1)
+    data, lctime = _read_data(lines, first, PH_COLUMNS[fmt], time_columns, fmt)
+    res.update(data)
+    res["format"] = fmt
+    res["time"] = lctime
+    return res
+
+
+def text_lines(file_content):
+    """
+    Lazy iterator of text lines of bytes, str or binary stream (e.g. FileStorage.stream).
+    File is decoded line by line, so there is no decoded copy of the whole file
+    """
+    if isinstance(file_content, str):
+        return io.StringIO(file_content)
+    if isinstance(file_content, (bytes, bytearray, memoryview)):
+        file_content = io.BytesIO(file_content)
+    # not TextIOWrapper: it closes the stream of caller when it is garbage collected
+    return (line.decode("UTF-8") for line in file_content)
+
+
+def parse_lc_file(file_content, file_ext):
+    """
+    Read LC file (.phc or .phX), no DB access
+    Args:
+        file_content: bytes (or str) of file or binary stream
+        file_ext: file extension (".phc", ".phV", ...)
+    Returns:
+        dict {"norad", "name", "cospar", "lcs": [kwargs of add_lc without db and sat_id, ...]}
+    Raises exception if file has bad format
+    """
+    lines = text_lines(file_content)
+
+    if file_ext == ".phc":
+        r = read_phc(lines)
+        common = dict(lc_st=r["start"], lc_end=r["end"], dt=r["dt"], lctime=r["time"],
+                      az=r["az"], el=r["el"], rg=r["rg"], site="Uzhhorod")
+        lcs = [dict(band="B", flux=r["flux_b"], mag=r["mag_b"], **common),
+               dict(band="V", flux=r["flux_v"], mag=r["mag_v"], **common)]
+    elif file_ext[:3] == ".ph":  # .phX where X is [B, V, R, C or others!]
+        r = read_ph(lines, file_ext)
+        lcs = [dict(band=r["band"], lc_st=r["start"], lc_end=r["end"],
+                    dt=r["dt"], tle=r["tle"], lctime=r["time"],
+                    flux=r["flux"], flux_err=r["flux_err"],
+                    mag=r["mag"], mag_err=r.get("mag_err"),
+                    az=r["az"], el=r["el"], rg=r["rg"],
+                    site=r["site"])]
+    else:
+        raise ValueError(f"Unknown LC file extension '{file_ext}'")
+    return {"norad": r["norad"], "name": r["name"], "cospar": r["cospar"], "lcs": lcs}
+
+
+def parse_lc_header(file_content, file_ext):
+    """
+    Read only header of LC file (data lines are not read), to find LCs which are in DB already
+    Args:
+        file_content: bytes of file or binary stream
+        file_ext: file extension (".phc", ".phV", ...)
+    Returns:
+        dict {"norad", "lcs": [{"band", "lc_st"}, ...]} - same LCs as parse_lc_file returns
+    Raises exception if header has bad format
+    """
+    lines = text_lines(file_content)
+    if file_ext == ".phc":
+        r = _read_phc_header(lines)
+        bands = ["B", "V"]
+    elif file_ext[:3] == ".ph":
+        r, _ = _read_ph_header(lines, file_ext)
+        bands = [r["band"]]
+    else:
+        raise ValueError(f"Unknown LC file extension '{file_ext}'")
+    return {"norad": r["norad"], "lcs": [{"band": band, "lc_st": r["start"]} for band in bands]}
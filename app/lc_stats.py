@@ -0,0 +1,58 @@
+"""
+Summary statistics of Lightcurve arrays.
+
+Calculated once at ingest (and by migration for old LCs) and kept in
+lightcurve_stats table, so plots, tables and API do not decode LC arrays.
+NaN values are ignored.
+"""
+import numpy as np
+
+STATS_FIELDS = ('n_points', 'duration',
+                'mag_min', 'mag_max', 'mag_median', 'mag_std', 'amplitude',
+                'mag_err_median', 'mag_err_max',
+                'el_min', 'el_max', 'rg_min', 'rg_max')
+
+
+def _finite(arr):
+    if arr is None:
+        return None
+    arr = np.asarray(arr, dtype=float)
+    arr = arr[np.isfinite(arr)]
+    return arr if arr.size else None
+
+
+def calc_lc_stats(date_time, mag, mag_err=None, el=None, rg=None):
+    """
+    Args:
+        date_time: epoch seconds
+        mag, mag_err, el, rg: LC arrays (mag_err, el, rg are optional)
+    Returns:
+        dict {field: value} with keys STATS_FIELDS (None if array is missing)
+    """
+    stats = dict.fromkeys(STATS_FIELDS)
+    mag = np.asarray(mag, dtype=float)
+    stats['n_points'] = int(mag.size)
+
+    t = _finite(date_time)
+    if t is not None:
+        stats['duration'] = float(t.max() - t.min())
+
+    m = _finite(mag)
+    if m is not None:
+        stats['mag_min'] = float(m.min())
+        stats['mag_max'] = float(m.max())
+        stats['mag_median'] = float(np.median(m))
+        stats['mag_std'] = float(m.std())
+        stats['amplitude'] = stats['mag_max'] - stats['mag_min']
+
+    err = _finite(mag_err)
+    if err is not None:
+        stats['mag_err_median'] = float(np.median(err))
+        stats['mag_err_max'] = float(err.max())
+
+    for name, arr in (('el', el), ('rg', rg)):
+        arr = _finite(arr)
+        if arr is not None:
+            stats[f'{name}_min'] = float(arr.min())
+            stats[f'{name}_max'] = float(arr.max())
+    return stats
@@ -0,0 +1,258 @@
+"""
+Binary storage of Lightcurve arrays.
+
+Time is stored as UTC epoch seconds (naive datetimes are treated as UTC).
+Arrays are written with the payload codec (encode_array):
+
+    header: b"LCZ", version, encoding, compression, decimals, number of values (<3sBBBBI)
+    body:   byte-shuffled values, compressed; with compression 'none' - values as they are
+
+Encodings (the first suitable is used):
+    decimal - values with at most 6 decimal digits (text photometry, times in ms/us)
+              as deltas of integers value * 10**decimals, lossless (not used without compression)
+    float32 - if error of every value is within LC_CODEC_MAX_ERROR (off by default)
+    float64
+float64 body without compression is read with np.frombuffer, without copy
+(LC_CODEC_COMPRESSION = 'none' keeps zero-copy reads for all arrays).
+Blobs without header are packed little-endian float64 (format before the codec),
+they are read without copy too (see codec_header), flask lc-recompress converts them.
+"""
+import hashlib
+import lzma
+import struct
+import zlib
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+LC_DTYPE = np.dtype('<f8')
+EPOCH = np.datetime64('1970-01-01T00:00:00', 'us')
+
+CODEC_MAGIC = b'LCZ'
+CODEC_VERSION = 2  # 1 - body is shuffled with every compression
+CODEC_HEADER = struct.Struct('<3sBBBBI')
+MAX_DECIMALS = 6
+
+ENC_FLOAT64, ENC_FLOAT32, ENC_DECIMAL = 0, 1, 2
+ENC_DTYPES = {ENC_FLOAT64: np.dtype('<f8'), ENC_FLOAT32: np.dtype('<f4'), ENC_DECIMAL: np.dtype('<i8')}
+
+COMPRESSION = {
+    'none': (0, lambda data, level: data, lambda data: data),
+    'zlib': (1, lambda data, level: zlib.compress(data, level), zlib.decompress),
+    'lzma': (2, lambda data, level: lzma.compress(data, preset=level), lzma.decompress),
+}
+DECOMPRESS = {code: decompress for code, _, decompress in COMPRESSION.values()}
+
+# defaults, app.config LC_CODEC_* values are set with configure_codec() in create_app
+CODEC_SETTINGS = {'compression': 'zlib', 'level': 6, 'max_error': None}
+
+
+def to_epoch(lctime):
+    """
+    Convert LC times to float64 array of epoch seconds
+    Args:
+        lctime: list of datetime, array of datetime64 or array of epoch seconds
+    Returns:
+        np.ndarray of float64 (seconds since 1970-01-01 UTC)
+    """
+    if lctime is None:
+        return None
+    arr = np.asarray(lctime)
+    if arr.dtype.kind == 'M':  # datetime64
+        return (arr.astype('datetime64[us]') - EPOCH) / np.timedelta64(1, 's')
+    if arr.dtype.kind == 'O':  # datetime objects (naive, UTC)
+        if arr.size and isinstance(arr.flat[0], datetime):
+            arr = arr.astype('datetime64[us]')
+            return (arr - EPOCH) / np.timedelta64(1, 's')
+    return arr.astype(LC_DTYPE)
+
+
+def epoch_to_datetime64(epoch):
+    """
+    Epoch seconds -> np.datetime64[us] array (for plots and text output)
+    """
+    epoch = np.asarray(epoch, dtype=LC_DTYPE)
+    return EPOCH + np.round(epoch * 1e6).astype('timedelta64[us]')
+
+
+def pack_array(arr):
+    """
+    Array -> bytes (little-endian float64)
+    """
+    return np.ascontiguousarray(arr, dtype=LC_DTYPE).tobytes()
+
+
+def unpack_array(blob):
+    """
+    bytes -> read-only float64 array (zero-copy view on the blob)
+    """
+    return np.frombuffer(blob, dtype=LC_DTYPE)
+
+
+def configure_codec(compression=None, level=None, max_error=None):
+    """
+    Set codec used for new blobs
+    Args:
+        compression: 'zlib', 'lzma' or 'none'
+        level: compression level (zlib 0-9, lzma preset 0-9)
+        max_error: max absolute error allowed for float32 storage (None - always float64)
+    """
+    if compression is not None:
+        if compression not in COMPRESSION:
+            raise ValueError(f"Unknown LC codec compression '{compression}'")
+        CODEC_SETTINGS['compression'] = compression
+    if level is not None:
+        CODEC_SETTINGS['level'] = int(level)
+    CODEC_SETTINGS['max_error'] = max_error
+
+
+def _shuffle(arr):
+    """ Group bytes by significance (all 1st bytes, all 2nd bytes, ...), it helps compression a lot """
+    return np.ascontiguousarray(arr.view(np.uint8).reshape(arr.size, arr.itemsize).T).tobytes()
+
+
+def _unshuffle(data, dtype, n):
+    return np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, n).T.copy().view(dtype).ravel()
+
+
+def _as_decimal(arr):
+    """
+    Return (decimals, integers) if arr == integers / 10**decimals exactly, else None
+    """
+    if not np.all(np.isfinite(arr)):
+        return None
+    limit = 2 ** 53  # integers exactly representable by float64
+    for decimals in range(MAX_DECIMALS + 1):
+        scale = 10 ** decimals
+        scaled = np.round(arr * scale)
+        if np.any(np.abs(scaled) >= limit):
+            return None
+        if np.array_equal(scaled / scale, arr):
+            return decimals, scaled.astype(np.int64)
+    return None
+
+
+def encode_array(arr, compression=None, level=None, max_error=None):
+    """
+    Array -> codec blob
+    Args:
+        arr: values (float64 or convertible)
+        compression, level, max_error: see configure_codec, CODEC_SETTINGS are used if not set
+    """
+    compression = compression or CODEC_SETTINGS['compression']
+    level = CODEC_SETTINGS['level'] if level is None else level
+    if max_error is None:
+        max_error = CODEC_SETTINGS['max_error']
+
+    arr = np.ascontiguousarray(arr, dtype=LC_DTYPE)
+    encoding, decimals, values = ENC_FLOAT64, 0, arr
+    # deltas and shuffle only help compression
+    as_decimal = _as_decimal(arr) if compression != 'none' else None
+    if as_decimal is not None:
+        decimals, ints = as_decimal
+        # near-uniform times and smooth magnitudes give small deltas
+        encoding, values = ENC_DECIMAL, np.diff(ints, prepend=np.int64(0))
+    elif max_error is not None:
+        values32 = arr.astype(np.float32)
+        err = np.abs(values32 - arr)
+        if np.all((err <= max_error) | np.isnan(arr)):
+            encoding, values = ENC_FLOAT32, values32
+
+    code, compress, _ = COMPRESSION[compression]
+    values = values.astype(ENC_DTYPES[encoding], copy=False)
+    header = CODEC_HEADER.pack(CODEC_MAGIC, CODEC_VERSION, encoding, code, decimals, arr.size)
+    if compression == 'none':
+        return header + values.tobytes()
+    return header + compress(_shuffle(values), level)
+
+
+def codec_header(blob):
+    """
+    Header fields (magic, version, encoding, compression, decimals, n) of codec blob,
+    None for raw float64 blob. Raw blob can start with b"LCZ" too (bytes of its first value),
+    so the whole header is checked, and blob of 8*k bytes with bad header is raw
+    Raises:
+        ValueError if blob is not raw and its header is not supported (e.g. newer codec version)
+    """
+    if len(blob) < CODEC_HEADER.size or bytes(blob[:len(CODEC_MAGIC)]) != CODEC_MAGIC:
+        return None
+    header = CODEC_HEADER.unpack_from(blob)
+    magic, version, encoding, code, decimals, n = header
+    valid = (1 <= version <= CODEC_VERSION and encoding in ENC_DTYPES and code in DECOMPRESS
+             and decimals <= MAX_DECIMALS and (decimals == 0 or encoding == ENC_DECIMAL))
+    if valid and code == COMPRESSION['none'][0]:
+        valid = len(blob) == CODEC_HEADER.size + n * ENC_DTYPES[encoding].itemsize
+    if valid:
+        return header
+    if len(blob) % LC_DTYPE.itemsize == 0:
+        return None
+    raise ValueError(f"Unsupported LC blob (codec version {version}, encoding {encoding}, compression {code})")
+
+
+def decode_array(blob):
+    """
+    Codec blob (or raw float64 blob) -> float64 array
+    """
+    header = codec_header(blob)
+    if header is None:
+        return unpack_array(blob)
+    magic, version, encoding, code, decimals, n = header
+    dtype = ENC_DTYPES[encoding]
+    if code == COMPRESSION['none'][0] and version >= 2:
+        values = np.frombuffer(blob, dtype=dtype, count=n, offset=CODEC_HEADER.size)
+    else:
+        try:
+            data = DECOMPRESS[code](bytes(blob[CODEC_HEADER.size:]))
+        except (zlib.error, lzma.LZMAError):
+            data = None
+        if data is None or len(data) != n * dtype.itemsize:
+            # header is valid, body is not: raw float64 blob (first value starts with b"LCZ")
+            if len(blob) % LC_DTYPE.itemsize == 0:
+                return unpack_array(blob)
+            raise ValueError(f"Bad LC blob (codec version {version}, {n} values, {len(blob)} bytes)")
+        values = _unshuffle(data, dtype, n)
+    if encoding == ENC_DECIMAL:
+        return np.cumsum(values) / 10 ** decimals
+    return values.astype(LC_DTYPE, copy=False)
+
+
+def arrays_digest(*arrays):
+    """
+    sha256 hex digest of arrays as they are stored (float64 blobs).
+    Missing (None) array and empty array give different digests
+    """
+    h = hashlib.sha256()
+    for arr in arrays:
+        if arr is None:
+            h.update(b'\x00')
+        else:
+            blob = pack_array(arr)
+            h.update(b'\x01' + len(blob).to_bytes(8, 'little') + blob)
+    return h.hexdigest()
+
+
+class Float64Array(TypeDecorator):
+    """ Numeric LC array stored with payload codec, read as float64 """
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_array(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return decode_array(value)
+
+
+class EpochArray(Float64Array):
+    """ LC time array. Accepts datetime values, returns epoch seconds """
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return encode_array(to_epoch(value))
@@ -1,18 +1,18 @@
 import os
+import sqlite3
 
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from skyfield import almanac
-from sqlalchemy import and_
+from sqlalchemy import and_, event
+from sqlalchemy.engine import Engine
 
 from datetime import datetime, timedelta, timezone, date
 import ephem
-from scipy.signal import find_peaks
-from astropy.timeseries import LombScargle
-import pandas as pd
 
-from app.period.find_period import find_period
 from app.star_util import t2phases, phase2str
+from app.lc_storage import Float64Array, EpochArray, epoch_to_datetime64, arrays_digest, to_epoch
+from app.lc_stats import calc_lc_stats, STATS_FIELDS
 from flask import current_app
 
 from spacetrack import SpaceTrackClient
@@ -24,6 +24,21 @@ from io import BytesIO
 db = SQLAlchemy()
 
 
+# pysqlite starts transactions itself and breaks SAVEPOINT (used by batch ingest, see app/ingest.py).
+# Let SQLAlchemy emit BEGIN instead:
+# https://docs.sqlalchemy.org/en/14/dialects/sqlite.html#serializable-isolation-savepoints-transactional-ddl
+@event.listens_for(Engine, "connect")
+def sqlite_connect(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.isolation_level = None
+
+
+@event.listens_for(Engine, "begin")
+def sqlite_begin(conn):
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN")
+
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(20), nullable=False, unique=True)
@@ -211,12 +226,18 @@ class Observation(db.Model):
 class Satellite(db.Model):
     """ Additional clas to lightcurve class"""
     id = db.Column(db.Integer, primary_key=True)
-    norad = db.Column(db.Integer, nullable=False)
+    norad = db.Column(db.Integer, nullable=False, index=True)
     cospar = db.Column(db.String(15), nullable=False)
     name = db.Column(db.String(35), nullable=False)
     updated = db.Column(db.DateTime, nullable=True)
     # lcs = db.relationship('Lightcurve', backref='satellite', cascade='all, delete, delete-orphan')
 
+    # LC counters. Updated together with LC insert/delete, rebuild with `flask lc-repair-stats`
+    lc_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    first_lc_time = db.Column(db.DateTime, nullable=True)
+    last_lc_time = db.Column(db.DateTime, nullable=True)
+    band_counts = db.Column(db.JSON, nullable=True)  # {"B": 10, "V": 12, ...}
+
     @classmethod
     def count_sat(cls, start=None, stop=None):
         q = db.session.query(cls).order_by(cls.norad)
@@ -267,6 +288,18 @@ class Satellite(db.Model):
         sat = db.session.query(cls).filter_by(norad=norad).first()
         return sat
 
+    @classmethod
+    def get_or_create(cls, norad, name, cospar):
+        """
+        Return Satellite by norad or add new one to session (flushed, so it has id)
+        """
+        sat = cls.get_by_norad(norad=norad)
+        if sat is None:
+            sat = cls(name=name, norad=norad, cospar=cospar)
+            db.session.add(sat)
+            db.session.flush()
+        return sat
+
     @classmethod
     def get_by_cospar(cls, cospar):
         """
@@ -291,37 +324,139 @@ class Satellite(db.Model):
         return: list of deleted satellites, or empty list
         """
         deleted = []
-        sats = db.session.query(cls).order_by(cls.norad).all()
+        # do not trust counters here, check real LCs
+        sats = db.session.query(cls).filter(
+            ~db.exists().where(Lightcurve.sat_id == cls.id)
+        ).order_by(cls.norad).all()
         for sat in sats:
-            # print(f"{sat.norad} \n {sat.get_lcs()} \n {not sat.get_lcs()}")
-            # if not sat.get_lcs():
-            if sat.count_lcs() == 0:
-                # delete satellite
-                # print(f"Delete sat_rec with NORAD={sat.norad}")
-                db.session.delete(sat)
-                db.session.commit()
-                deleted.append(sat.norad)
+            # print(f"Delete sat_rec with NORAD={sat.norad}")
+            db.session.delete(sat)
+            deleted.append(sat.norad)
+        db.session.commit()
         return deleted
 
+    @classmethod
+    def rebuild_lc_stats(cls):
+        """
+        Recalculate LC counters of all Satellites with two GROUP BY queries
+        return: number of updated satellites
+        """
+        totals = db.session.query(Lightcurve.sat_id,
+                                  db.func.count(Lightcurve.id),
+                                  db.func.min(Lightcurve.ut_start),
+                                  db.func.max(Lightcurve.ut_start)
+                                  ).group_by(Lightcurve.sat_id).all()
+        per_band = db.session.query(Lightcurve.sat_id, Lightcurve.band,
+                                    db.func.count(Lightcurve.id)
+                                    ).group_by(Lightcurve.sat_id, Lightcurve.band).all()
+        bands = {}
+        for sat_id, band, n in per_band:
+            bands.setdefault(sat_id, {})[band] = n
+        stats = {sat_id: (n, first, last) for sat_id, n, first, last in totals}
+
+        mappings = []
+        for (sat_id,) in db.session.query(cls.id).all():
+            n, first, last = stats.get(sat_id, (0, None, None))
+            mappings.append({"id": sat_id, "lc_count": n,
+                             "first_lc_time": first, "last_lc_time": last,
+                             "band_counts": bands.get(sat_id, {})})
+        db.session.bulk_update_mappings(cls, mappings)
+        db.session.commit()
+        return len(mappings)
+
+    def add_lc_stats(self, ut_start, band):
+        """
+        Count new LC. Called before commit of LC, so it is in the same transaction
+        """
+        self.lc_count = (self.lc_count or 0) + 1
+        if self.first_lc_time is None or ut_start < self.first_lc_time:
+            self.first_lc_time = ut_start
+        if self.last_lc_time is None or ut_start > self.last_lc_time:
+            self.last_lc_time = ut_start
+        band_counts = dict(self.band_counts or {})
+        band_counts[band] = band_counts.get(band, 0) + 1
+        self.band_counts = band_counts  # new dict, so change of JSON column is detected
+
+    def remove_lc_stats(self, lc):
+        """
+        Uncount deleted LC (lc must be already deleted in the session and flushed)
+        """
+        self.lc_count = max((self.lc_count or 0) - 1, 0)
+        band_counts = dict(self.band_counts or {})
+        if band_counts.get(lc.band, 0) > 1:
+            band_counts[lc.band] -= 1
+        else:
+            band_counts.pop(lc.band, None)
+        self.band_counts = band_counts
+        if lc.ut_start in (self.first_lc_time, self.last_lc_time):
+            self.first_lc_time, self.last_lc_time = db.session.query(
+                db.func.min(Lightcurve.ut_start), db.func.max(Lightcurve.ut_start)
+            ).filter(Lightcurve.sat_id == self.id).one()
+
     def get_lcs(self):
-        lcs = db.session.query(Lightcurve).filter(Lightcurve.sat.has(norad=self.norad)).all()
+        lcs = db.session.query(Lightcurve).filter(Lightcurve.sat_id == self.id).order_by(Lightcurve.ut_start).all()
         return lcs
 
     def count_lcs(self):
-        n = db.session.query(Lightcurve).filter(Lightcurve.sat.has(norad=self.norad)).count()
-        return n
+        return self.lc_count
 
     def get_last_lc_time(self):
-        qry = db.session.query(Lightcurve).filter(Lightcurve.sat.has(norad=self.norad))
-        lc = qry.order_by(Lightcurve.ut_start.desc()).first()
-        return lc.ut_start
+        return self.last_lc_time
 
     def update_updated(self):
         self.updated = self.get_last_lc_time()
         db.session.commit()
 
 
+class ObservationGeometry(db.Model):
+    """
+    Time and geometry arrays of observation (date_time, az, el, rg).
+    All bands of one observation (e.g. B and V of PHC file) have the same arrays,
+    so they are stored once and referenced by the LCs. Row is addressed by
+    sha256 digest of its arrays (see get_or_create)
+    """
+    __tablename__ = 'observation_geometry'
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), nullable=False, unique=True)
+    date_time = db.Column(EpochArray, nullable=False)  # epoch seconds, UTC
+    az = db.Column(Float64Array, nullable=True)
+    el = db.Column(Float64Array, nullable=True)
+    rg = db.Column(Float64Array, nullable=True)
+
+    @classmethod
+    def get_or_create(cls, date_time, az=None, el=None, rg=None):
+        """
+        Return stored geometry with the same arrays or new one (added to session)
+        """
+        date_time = to_epoch(date_time)
+        digest = arrays_digest(date_time, az, el, rg)
+        geometry = db.session.query(cls).filter_by(digest=digest).first()
+        if geometry is None:
+            geometry = cls(digest=digest, date_time=date_time, az=az, el=el, rg=rg)
+            db.session.add(geometry)
+        return geometry
+
+    @classmethod
+    def delete_unused(cls, id):
+        """
+        Delete geometry if no LC references it
+        """
+        used = db.session.query(Lightcurve.id).filter(Lightcurve.geometry_id == id).first()
+        if used is None:
+            db.session.query(cls).filter_by(id=id).delete(synchronize_session=False)
+
+
 class Lightcurve(db.Model):
+    __table_args__ = (
+        # LCs of satellite ordered by time; LC of satellite with given start time
+        db.Index('ix_lightcurve_sat_id_ut_start', 'sat_id', 'ut_start'),
+        # duplicate check in add_lc (sat, band, start time)
+        db.Index('ix_lightcurve_sat_id_band_ut_start', 'sat_id', 'band', 'ut_start'),
+        # report by dates
+        db.Index('ix_lightcurve_ut_start', 'ut_start'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     # sat_id = db.Column(db.Integer, db.ForeignKey('satellite.id'))
 
@@ -336,28 +471,73 @@ class Lightcurve(db.Model):
     dt = db.Column(db.Float, nullable=False)
     band = db.Column(db.String(5), nullable=False)
 
-    date_time = db.Column(db.PickleType, nullable=False)
+    # Heavy arrays are not loaded until accessed (or undefer_group('arrays') is used).
+    # Access to any of them loads the whole group with one query.
+    # date_time, az, el, rg are shared by bands of the same observation (see ObservationGeometry)
+    geometry_id = db.Column(db.Integer, db.ForeignKey('observation_geometry.id'), nullable=False, index=True)
+    geometry = db.relationship('ObservationGeometry')
 
-    flux = db.Column(db.PickleType, nullable=False)
-    flux_err = db.Column(db.PickleType, nullable=True)
-    mag = db.Column(db.PickleType, nullable=False)
-    mag_err = db.Column(db.PickleType, nullable=True)
+    flux = db.deferred(db.Column(Float64Array, nullable=False), group='arrays')
+    flux_err = db.deferred(db.Column(Float64Array, nullable=True), group='arrays')
+    mag = db.deferred(db.Column(Float64Array, nullable=False), group='arrays')
+    mag_err = db.deferred(db.Column(Float64Array, nullable=True), group='arrays')
 
-    az = db.Column(db.PickleType, nullable=True)
-    el = db.Column(db.PickleType, nullable=True)
-    rg = db.Column(db.PickleType, nullable=True)
+    n_points = db.Column(db.Integer, nullable=True)
 
     site = db.Column(db.String(50), nullable=True)
     lsp_period = db.Column(db.Float, nullable=True)
 
+    # period analysis runs after LC is stored (see analyse_pending in app/jobs.py)
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    analysis_status = db.Column(db.String(10), nullable=False, default=PENDING, server_default=DONE, index=True)
+    analysis_updated = db.Column(db.DateTime, nullable=True)  # time of last change of analysis_status
+
+    # LCs of one satellite started within SYNCH_LC_WINDOW (other bands of the same pass)
+    # share the group id. It is the id of the first LC of the group
+    observation_group_id = db.Column(db.Integer, nullable=True, index=True)
+    SYNCH_LC_WINDOW = 300  # sec
+
+    # summary statistics (one-to-one), loaded together with LC
+    stats = db.relationship('LightcurveStats', uselist=False, lazy='joined',
+                            backref='lc', cascade='all, delete-orphan')
+    # stored Lomb-Scargle periodograms (see Periodogram)
+    periodograms = db.relationship('Periodogram', backref='lc', cascade='all, delete-orphan')
+
+    @property
+    def date_time(self):
+        """ LC times, epoch seconds (UTC) """
+        return self.geometry.date_time
+
+    @property
+    def az(self):
+        return self.geometry.az
+
+    @property
+    def el(self):
+        return self.geometry.el
+
+    @property
+    def rg(self):
+        return self.geometry.rg
+
+    @property
+    def ut_times(self):
+        """
+        LC times as np.datetime64 array (UTC)
+        """
+        return epoch_to_datetime64(self.date_time)
+
     @classmethod
     def get_by_lc_start(cls, norad, ut_start, bands=False):
         """
         Return all LC with start_time and NORAD
         """
-        # https://stackoverflow.com/questions/8561470/sqlalchemy-filtering-by-relationship-attribute
-        # cls.sat.has(norad=norad),
-        lcs = db.session.query(cls).filter_by(ut_start=ut_start).filter(cls.sat.has(norad=norad)).all()
+        # join by sat_id, so both satellite.norad and (sat_id, ut_start) indexes are used
+        lcs = db.session.query(cls).join(Satellite, cls.sat_id == Satellite.id).filter(
+            Satellite.norad == norad, cls.ut_start == ut_start).all()
         if bands:
             bands = [lc.band for lc in lcs]
             return lcs, bands
@@ -366,29 +546,91 @@ class Lightcurve(db.Model):
 
         # return lc
 
+    @classmethod
+    def get_start_bands(cls, norad, ut_starts):
+        """
+        Set of (ut_start, band) of Satellite LCs with any of start times, one indexed query
+        """
+        rows = db.session.query(cls.ut_start, cls.band).join(Satellite, cls.sat_id == Satellite.id).filter(
+            Satellite.norad == norad, cls.ut_start.in_(list(ut_starts)))
+        return set(rows)
+
     @classmethod
     def report_lcs(cls, date_from, date_to):
         # start_date = date(year, month, 1)
         # end_date = date(year, month + 1, 1) - timedelta(days=1)
 
-        lcs = db.session.query(cls).filter(
+        lcs = db.session.query(cls).options(db.joinedload(cls.sat)).filter(
             and_(cls.ut_start >= date_from,
                  cls.ut_start <= date_to)
         )
         return lcs.all()
 
     @classmethod
-    def get_by_id(cls, id):
+    def delete_by_id(cls, id):
+        """
+        Delete LC and update counters of its Satellite in one transaction
+        """
         lc = db.session.query(cls).filter_by(id=id).first()
+        if lc is None:
+            return False
+        sat = lc.sat
+        db.session.delete(lc)
+        db.session.flush()
+        ObservationGeometry.delete_unused(lc.geometry_id)
+        sat.remove_lc_stats(lc)
+        UploadedFile.forget(sat.norad, lc.ut_start)
+        db.session.commit()
+        return True
+
+    @classmethod
+    def get_by_id(cls, id, arrays=False):
+        """
+        Return LC by id
+        arrays: load LC arrays (date_time, mag, ...) in the same query
+        """
+        q = db.session.query(cls)
+        if arrays:
+            q = q.options(db.undefer_group('arrays'), db.joinedload(cls.geometry))
+        lc = q.filter_by(id=id).first()
         return lc
 
     @classmethod
-    def get_synch_lc(cls, id, diff_in_sec):
+    def get_synch_lc(cls, id, diff_in_sec=None):
+        """
+        Return LCs of the same satellite started within diff_in_sec from LC with given id (LC itself included)
+        If diff_in_sec is not set, observation group of LC is used (fallback to SYNCH_LC_WINDOW)
+        """
         lc = db.session.query(cls).filter_by(id=id).first()
-        lcs = db.session.query(cls).filter_by(sat_id=lc.sat_id)
-        # print(lcs)
-        lcs2 = [x for x in lcs if abs((x.ut_start-lc.ut_start).total_seconds()) < diff_in_sec ]
-        return lcs2
+        q = db.session.query(cls).options(db.undefer_group('arrays'), db.joinedload(cls.geometry))
+        if diff_in_sec is None and lc.observation_group_id is not None:
+            q = q.filter(cls.observation_group_id == lc.observation_group_id)
+        else:
+            window = cls.synch_window(lc.ut_start, diff_in_sec)
+            q = q.filter(cls.sat_id == lc.sat_id, *window)
+        return q.order_by(cls.ut_start, cls.band).all()
+
+    @classmethod
+    def synch_window(cls, ut_start, diff_in_sec=None):
+        """
+        Filter conditions: ut_start is closer than diff_in_sec to given time
+        """
+        diff = timedelta(seconds=diff_in_sec or cls.SYNCH_LC_WINDOW)
+        return cls.ut_start > ut_start - diff, cls.ut_start < ut_start + diff
+
+    def assign_observation_group(self):
+        """
+        Set observation_group_id of new LC: group of synchronous LC if any, or own id
+        """
+        group_id = db.session.query(Lightcurve.observation_group_id).filter(
+            Lightcurve.sat_id == self.sat_id,
+            Lightcurve.observation_group_id.isnot(None),
+            *self.synch_window(self.ut_start)
+        ).order_by(Lightcurve.ut_start).limit(1).scalar()
+        if group_id is None:
+            db.session.flush()  # get own id
+            group_id = self.id
+        self.observation_group_id = group_id
 
     @classmethod
     def get_all(cls):
@@ -397,81 +639,374 @@ class Lightcurve(db.Model):
         """
         return db.session.query(cls).order_by(cls.id).all()
 
-    def detect_period(self):
-        if len(self.mag) < 100:
-            return -1
-        d = {'date': self.date_time, 'value': self.mag * -1}
-        df = pd.DataFrame(data=d)
-        try:
-            res = find_period(df,
-                              tol_norm_diff=10 ** (-3),
-                              number_steps=50000,
-                              minimum_number_of_relevant_shifts=2,
-                              minimum_number_of_datapoints_for_correlation_test=100,
-                              minimum_ratio_of_datapoints_for_shift_autocorrelation=0.003,
-                              consider_only_significant_correlation=False,
-                              level_of_significance_for_pearson=1e-7,
-                              )
-        except Exception as e:
-            print("Could not detect period due to {}".format(e))
-            return -1
-
-        if res[-1] > 0.3:
-            return res[0] * 60
-        else:
-            return -1
+    @classmethod
+    def pending_analysis_ids(cls, limit=None):
+        """
+        Ids of LCs waiting for period analysis, oldest first
+        """
+        q = db.session.query(cls.id).filter(cls.analysis_status == cls.PENDING).order_by(cls.id)
+        if limit:
+            q = q.limit(limit)
+        return [id for id, in q]
+
+    @classmethod
+    def set_analysis_status(cls, id, status, from_status, commit=True, **values):
+        """
+        Change analysis status of LC if it is from_status (one status or tuple), commit
+        (commit=False: caller commits it with other changes of the same transaction).
+        Returns True if status is changed (only one worker gets True for the same change)
+        """
+        if isinstance(from_status, str):
+            from_status = (from_status,)
+        n = cls.query.filter(cls.id == id, cls.analysis_status.in_(from_status)) \
+            .update(dict(values, analysis_status=status, analysis_updated=datetime.utcnow()),
+                    synchronize_session=False)
+        if commit:
+            db.session.commit()
+        return n == 1
+
+    @classmethod
+    def claim_analysis(cls, id):
+        """
+        Mark pending LC as running
+        """
+        return cls.set_analysis_status(id, cls.RUNNING, cls.PENDING)
+
+    @classmethod
+    def retry_analysis(cls, id):
+        """
+        Queue LC with failed analysis again
+        """
+        return cls.set_analysis_status(id, cls.PENDING, cls.FAILED)
 
-    def calc_period(self, detected_period=-1):
-        lctime = self.date_time
+    @classmethod
+    def queue_analysis_all(cls):
+        """
+        Queue all analysed LCs (done or failed) for period analysis again. Returns number of LCs
+        """
+        n = cls.query.filter(cls.analysis_status.in_((cls.DONE, cls.FAILED))) \
+            .update({cls.analysis_status: cls.PENDING, cls.analysis_updated: datetime.utcnow()},
+                    synchronize_session=False)
+        db.session.commit()
+        return n
 
-        lctime = [x.timestamp() for x in lctime]
+    @classmethod
+    def requeue_running(cls):
+        """
+        Queue again LCs left running (e.g. after restart of app). Returns number of LCs
+        """
+        n = cls.query.filter(cls.analysis_status == cls.RUNNING) \
+            .update({cls.analysis_status: cls.PENDING, cls.analysis_updated: datetime.utcnow()},
+                    synchronize_session=False)
+        db.session.commit()
+        return n
 
-        # try to detect Period with find_period function and use +/-0.2 boundaries
-        det_p = detected_period
-        if det_p != -1:
-            min_p = det_p - (0.2 * det_p)
-            max_freq = 1 / min_p
+    def set_period(self, period):
+        """
+        Set period by hand (no commit), running analysis does not overwrite it
+        """
+        self.lsp_period = period
+        self.analysis_status = self.DONE
+        self.analysis_updated = datetime.utcnow()
 
-            max_p = det_p + (0.2 * det_p)
-            min_freq = 1 / max_p
-        else:  # if period not detected use clear LS method and wide boundaries
+    def to_dict(self):
+        """
+        LC metadata and statistics (no arrays)
+        """
+        return {"id": self.id, "sat_id": self.sat_id,
+                "ut_start": self.ut_start.isoformat(), "ut_end": self.ut_end.isoformat(),
+                "dt": self.dt, "band": self.band, "site": self.site,
+                "lsp_period": self.lsp_period,
+                "analysis_status": self.analysis_status,
+                "analysis_updated": self.analysis_updated.isoformat() if self.analysis_updated else None,
+                "observation_group_id": self.observation_group_id,
+                "stats": self.stats.to_dict() if self.stats is not None else None}
+
+
+class LightcurveStats(db.Model):
+    """
+    Summary statistics of LC arrays. Filled once in add_lc (see app/lc_stats.py)
+    """
+    __tablename__ = 'lightcurve_stats'
+
+    lc_id = db.Column(db.Integer, db.ForeignKey('lightcurve.id', ondelete='CASCADE'), primary_key=True)
+    n_points = db.Column(db.Integer, nullable=False)
+    duration = db.Column(db.Float, nullable=True)  # sec
+
+    mag_min = db.Column(db.Float, nullable=True)
+    mag_max = db.Column(db.Float, nullable=True)
+    mag_median = db.Column(db.Float, nullable=True)
+    mag_std = db.Column(db.Float, nullable=True)
+    amplitude = db.Column(db.Float, nullable=True)
+    mag_err_median = db.Column(db.Float, nullable=True)
+    mag_err_max = db.Column(db.Float, nullable=True)
+
+    el_min = db.Column(db.Float, nullable=True)
+    el_max = db.Column(db.Float, nullable=True)
+    rg_min = db.Column(db.Float, nullable=True)
+    rg_max = db.Column(db.Float, nullable=True)
 
-            if self.dt < 1:
-                max_freq = 0.83  # 1.2 sec
-            else:
-                max_freq = 1 / (2 * self.dt)
+    @classmethod
+    def from_arrays(cls, date_time, mag, mag_err=None, el=None, rg=None):
+        """
+        Calculate statistics of LC arrays (date_time in epoch seconds)
+        """
+        return cls(**calc_lc_stats(date_time, mag, mag_err=mag_err, el=el, rg=rg))
 
-            min_freq = 1 / ((lctime[-1] - lctime[0]) / 2)
+    def to_dict(self):
+        return {name: getattr(self, name) for name in STATS_FIELDS}
+
+
+class Periodogram(db.Model):
+    """
+    Lomb-Scargle periodogram of LC by frequency grid (range, samples per peak) and normalization.
+    Written by period analysis (see analyse_pending in app/jobs.py), read by LSP plot,
+    calculated again only for other parameters (see get_periodogram in app/sat_utils.py).
+    Periodogram of the whole frequency range of LC is marked by full_range, so it is found
+    without LC arrays (its range is not computed again from them)
+    """
+    __tablename__ = 'periodogram'
+    __table_args__ = (
+        db.UniqueConstraint('lc_id', 'min_freq', 'max_freq', 'samples_per_peak', 'normalization',
+                            name='uq_periodogram_lc_id_grid'),
+    )
+    KEY_FIELDS = ('min_freq', 'max_freq', 'samples_per_peak', 'normalization')
 
-        if self.mag_err is not None:
-            ls = LombScargle(lctime, self.mag, self.mag_err)
-        else:
-            ls = LombScargle(lctime, self.mag)
+    id = db.Column(db.Integer, primary_key=True)
+    lc_id = db.Column(db.Integer, db.ForeignKey('lightcurve.id', ondelete='CASCADE'), nullable=False, index=True)
+    min_freq = db.Column(db.Float, nullable=False)  # Hz
+    max_freq = db.Column(db.Float, nullable=False)
+    samples_per_peak = db.Column(db.Integer, nullable=False)
+    normalization = db.Column(db.String(16), nullable=False)
+    full_range = db.Column(db.Boolean, nullable=False, default=False)  # range of lsp_frequency_range
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    frequency = db.deferred(db.Column(Float64Array, nullable=False), group='arrays')
+    power = db.deferred(db.Column(Float64Array, nullable=False), group='arrays')
+    fap_probability = db.Column(db.Float, nullable=False)
+    fap_level = db.Column(db.Float, nullable=False)  # power of fap_probability
+    peaks = db.deferred(db.Column(Float64Array, nullable=False), group='arrays')  # indices of peaks above fap_level
 
-        frequency, power = ls.autopower(
-            # nyquist_factor=0.5,
-            minimum_frequency=min_freq,
-            maximum_frequency=max_freq,
-            samples_per_peak=30,
-            normalization='standard')
+    @classmethod
+    def get(cls, lc_id, min_freq, max_freq, samples_per_peak, normalization):
+        """
+        Stored periodogram with arrays or None
+        """
+        return cls.query.options(db.undefer_group('arrays')).filter_by(
+            lc_id=lc_id, min_freq=min_freq, max_freq=max_freq,
+            samples_per_peak=samples_per_peak, normalization=normalization).first()
 
-        periods = 1.0 / frequency
+    @classmethod
+    def get_full_range(cls, lc_id, samples_per_peak, normalization):
+        """
+        Stored periodogram of the whole frequency range of LC with arrays or None
+        """
+        return cls.query.options(db.undefer_group('arrays')).filter_by(
+            lc_id=lc_id, full_range=True,
+            samples_per_peak=samples_per_peak, normalization=normalization).first()
 
-        probabilities = [0.0001]  # 0.01 %
-        fap = ls.false_alarm_level(probabilities)
-        peaks, _ = find_peaks(power, height=fap[0])
+    @classmethod
+    def store(cls, lc_id, periodogram):
+        """
+        Add periodogram of LC (dict of fields, see calc_periodogram in app/sat_utils.py) to session (no commit).
+        Periodogram with the same parameters (or full range one, if periodogram is full range) is replaced
+        """
+        cls.query.filter_by(lc_id=lc_id, **{name: periodogram[name] for name in cls.KEY_FIELDS}) \
+            .delete(synchronize_session=False)
+        if periodogram.get("full_range"):
+            cls.query.filter_by(lc_id=lc_id, full_range=True, samples_per_peak=periodogram["samples_per_peak"],
+                                normalization=periodogram["normalization"]).delete(synchronize_session=False)
+        row = cls(lc_id=lc_id, **periodogram)
+        db.session.add(row)
+        return row
+
+    @property
+    def peak_index(self):
+        return self.peaks.astype(int)
+
+
+class IngestJob(db.Model):
+    """
+    Upload of LC files, processed in background (see app/jobs.py)
+    """
+    __tablename__ = 'ingest_job'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
 
-        if not peaks.any():
-            self.lsp_period = None
-        else:
-            zipped_lists = zip(power[peaks], periods[peaks])
-            sorted_pairs = sorted(zipped_lists, reverse=True)
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+    status = db.Column(db.String(10), nullable=False, default=QUEUED, index=True)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started = db.Column(db.DateTime, nullable=True)
+    finished = db.Column(db.DateTime, nullable=True)
+    n_files = db.Column(db.Integer, nullable=False, default=0)
+    n_done = db.Column(db.Integer, nullable=False, default=0)  # processed files
+    n_lcs = db.Column(db.Integer, nullable=False, default=0)  # added LCs
+    error = db.Column(db.Text, nullable=True)
+
+    files = db.relationship('IngestJobFile', backref='job', order_by='IngestJobFile.id',
+                            cascade='all, delete-orphan')
+
+    @classmethod
+    def create(cls, files, user_id=None):
+        """
+        Add queued job. Files are kept on disk until they are processed
+        (files can be generator which spools archive entries, see app.jobs.submit_ingest_job).
+        Nothing is added if files raises exception
+        Args:
+            files: iterable of (file name, path of spooled file)
+            user_id: id of user who uploaded files
+        """
+        job = cls(user_id=user_id, status=cls.QUEUED, n_files=0, n_done=0, n_lcs=0)
+        db.session.add(job)
+        try:
+            db.session.flush()
+            for name, path in files:
+                db.session.add(IngestJobFile(job_id=job.id, file_name=name, path=path))
+                job.n_files += 1
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return job
 
-            # Return period with higher power
-            self.lsp_period = sorted_pairs[0][1]
+    @classmethod
+    def get_by_id(cls, id):
+        return cls.query.get(id)
 
+    @classmethod
+    def get_by_user(cls, user_id, limit=20):
+        return cls.query.filter_by(user_id=user_id).order_by(cls.id.desc()).limit(limit).all()
+
+    @classmethod
+    def claim(cls, id):
+        """
+        Mark queued job as running. Only one worker gets True for the job
+        """
+        n = cls.query.filter_by(id=id, status=cls.QUEUED) \
+            .update({cls.status: cls.RUNNING, cls.started: datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        return n == 1
+
+    @classmethod
+    def requeue_running(cls, started_before=None):
+        """
+        Queue again jobs left running (worker died: restart of app, OOM kill, ...).
+        Processed files of job are kept, run_ingest_job takes only the rest.
+        started_before: only jobs started before this time (others can still run in live workers)
+        Returns number of jobs
+        """
+        q = cls.query.filter(cls.status == cls.RUNNING)
+        if started_before is not None:
+            q = q.filter(cls.started < started_before)
+        n = q.update({cls.status: cls.QUEUED}, synchronize_session=False)
         db.session.commit()
-        db.session.refresh(self)
+        return n
+
+    @classmethod
+    def store_progress(cls, id, n_done, n_lcs):
+        """
+        Write counters of running job in a short transaction of another connection, so every app process
+        reads them, while LCs and file results of job wait for one commit (see app/jobs.py).
+        Job row must not be changed in the session meanwhile (the write would wait for its commit).
+        SQLite has one writer and the open session blocks it, nothing is written there (returns False)
+        """
+        if db.engine.dialect.name == "sqlite":
+            return False
+        with db.engine.begin() as conn:
+            conn.execute(cls.__table__.update().where(cls.__table__.c.id == id)
+                         .values(n_done=n_done, n_lcs=n_lcs))
+        return True
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "created": self.created.isoformat() if self.created else None,
+            "started": self.started.isoformat() if self.started else None,
+            "finished": self.finished.isoformat() if self.finished else None,
+            "n_files": self.n_files,
+            "n_done": self.n_done,
+            "n_lcs": self.n_lcs,
+            "error": self.error,
+            "files": [f.to_dict() for f in self.files],
+        }
+
+
+class IngestJobFile(db.Model):
+    """
+    File of ingest job. Spooled file (path) is kept on disk until the file is processed
+    """
+    __tablename__ = 'ingest_job_file'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('ingest_job.id', ondelete='CASCADE'), nullable=False, index=True)
+    file_name = db.Column(db.String(255), nullable=False)
+    path = db.Column(db.String(1024), nullable=True)  # spooled file, None when it is processed
+    status = db.Column(db.String(10), nullable=True)  # see app/ingest.py (added, duplicate, error, skipped)
+    n_lcs = db.Column(db.Integer, nullable=False, default=0)
+    message = db.Column(db.Text, nullable=True)
+
+    def to_dict(self):
+        return {"file": self.file_name, "status": self.status, "lcs": self.n_lcs, "message": self.message}
+
+
+class UploadedFile(db.Model):
+    """
+    LC file already stored in DB, by SHA-256 of file content (see app/ingest.py).
+    Record is deleted with LC of file (by NORAD and start time), so file can be uploaded again
+    """
+    __tablename__ = 'uploaded_file'
+    __table_args__ = (
+        db.Index('ix_uploaded_file_norad_ut_start', 'norad', 'ut_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    file_name = db.Column(db.String(255), nullable=False)  # name of first upload
+    size = db.Column(db.Integer, nullable=False)
+    n_lcs = db.Column(db.Integer, nullable=False, default=0)  # LCs added from file
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    norad = db.Column(db.Integer, nullable=True)  # LCs of file
+    ut_start = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def get_by_hash(cls, sha256):
+        return cls.query.filter_by(sha256=sha256).first()
+
+    @classmethod
+    def known_hashes(cls, hashes):
+        """
+        Subset of hashes which are in DB
+        """
+        hashes = list(hashes)
+        known = set()
+        for i in range(0, len(hashes), 500):  # limit of SQL parameters
+            known.update(h for h, in db.session.query(cls.sha256).filter(cls.sha256.in_(hashes[i:i + 500])))
+        return known
+
+    @classmethod
+    def record(cls, sha256, file_name, size, n_lcs=0, norad=None, ut_start=None):
+        """
+        Add file to session (no commit), if it is not there yet
+        """
+        if cls.get_by_hash(sha256) is None:
+            db.session.add(cls(sha256=sha256, file_name=file_name[:255], size=size, n_lcs=n_lcs,
+                               norad=norad, ut_start=ut_start))
+
+    @classmethod
+    def forget(cls, norad, ut_start):
+        """
+        Delete records of files with LCs of Satellite started at ut_start (no commit)
+        """
+        cls.query.filter_by(norad=norad, ut_start=ut_start).delete(synchronize_session=False)
 
 
 class SatForView(db.Model):
@@ -2,6 +2,9 @@ import numpy as np
 import functools
 from scipy.signal import find_peaks
 from scipy import stats
+from scipy import fft as sp_fft
+from scipy.interpolate import splrep, splev
+from numpy.lib.stride_tricks import sliding_window_view
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.svm import SVR
 
@@ -28,17 +31,25 @@ def calculate_autocorrelation(x,i,level_of_significance_for_pearson,consider_onl
         else:
             return r,p,r,i
 
-def autocor(x,list_of_lags,level_of_significance_for_pearson,consider_only_significant_correlation):
+AUTOCORRELATION_METHODS = ('fft', 'pearsonr')
+
+def autocor(x,list_of_lags,level_of_significance_for_pearson,consider_only_significant_correlation,method='pearsonr'):
     '''
     This function calculates the autocorrelation function for a time series given as vector x and the shifts given as indices in list_of_lags.
     The parameters consider_only_significant_correlation and level_of_significance_for_pearson decide if and which results are considered depending on their significance p.
     It returns the correlation coefficients as r_list, their significance as p_list, the autocorrelation function as func and the shift indices as lag_list
+    The method 'pearsonr' calls scipy.stats.pearsonr for every shift, 'fft' calculates all shifts at once (see autocor_fft)
     :param x: list
     :param list_of_lags: list of positive integers
     :param level_of_significance_for_pearson: float between 0 and 1
     :param consider_only_significant_correlation: Boolean or interger in {0,1}
+    :param method: string, one of AUTOCORRELATION_METHODS
     :return: list of floats, list of floats, list of floats, list of positive integers
     '''
+    if method == 'fft':
+        return autocor_fft(x,list_of_lags,level_of_significance_for_pearson,consider_only_significant_correlation)
+    if method != 'pearsonr':
+        raise ValueError(f"Unknown autocorrelation method {method}, expected one of {AUTOCORRELATION_METHODS}")
     list_of_results=list(zip(*list(map(functools.partial(calculate_autocorrelation,x,level_of_significance_for_pearson=level_of_significance_for_pearson,consider_only_significant_correlation=consider_only_significant_correlation),list_of_lags))))
     r_list=list(list_of_results[0])
     p_list=list(list_of_results[1])
@@ -46,6 +57,55 @@ def autocor(x,list_of_lags,level_of_significance_for_pearson,consider_only_signi
     lag_list=list(list_of_results[3])
     return r_list, p_list, func, lag_list
 
+def autocor_fft(x,list_of_lags,level_of_significance_for_pearson,consider_only_significant_correlation):
+    '''
+    Same as autocor with scipy.stats.pearsonr, but in O(N log N) for all shifts: the lagged products sum(x[i:] * x[:-i])
+    are taken from one FFT of the (zero padded) series, the sums and sums of squares of both parts from cumulative sums.
+    The Pearson coefficient of every shift is normalised by the mean and variance of its own parts, the p-values
+    are calculated at once with the distribution used by pearsonr (beta distribution of r for n-2 degrees of freedom).
+    Constant parts give 0 as in calculate_autocorrelation (NaN of pearsonr).
+    :param x: list
+    :param list_of_lags: list of positive integers
+    :param level_of_significance_for_pearson: float between 0 and 1
+    :param consider_only_significant_correlation: Boolean or interger in {0,1}
+    :return: list of floats, list of floats, list of floats, list of positive integers
+    '''
+    x = np.asarray(x, dtype=float)
+    lags = np.asarray(list_of_lags, dtype=int).reshape(-1)
+    if lags.size == 0:
+        return [], [], [], []
+    size = x.size
+    # Pearson coefficient does not depend on offset, centered series keeps the sums small
+    x = x - x.mean()
+    n_fft = sp_fft.next_fast_len(2 * size - 1, real=True)
+    spectrum = sp_fft.rfft(x, n_fft)
+    lagged_products = sp_fft.irfft(spectrum * np.conj(spectrum), n_fft)[:lags.max() + 1]
+    cum = np.concatenate(([0.], np.cumsum(x)))
+    cum_sq = np.concatenate(([0.], np.cumsum(x * x)))
+
+    # parts x[i:] (a) and x[:-i] (b) of n points
+    n = size - lags
+    sum_a, sum_b = cum[size] - cum[lags], cum[n]
+    sum_sq_a, sum_sq_b = cum_sq[size] - cum_sq[lags], cum_sq[n]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        var_a = sum_sq_a - sum_a ** 2 / n
+        var_b = sum_sq_b - sum_b ** 2 / n
+        r = np.clip((lagged_products[lags] - sum_a * sum_b / n) / np.sqrt(var_a * var_b), -1., 1.)
+        dof = n / 2. - 1
+        p = 2 * stats.beta.sf(np.abs(r), dof, dof, loc=-1, scale=2)
+    p[n == 2] = 1.
+    # variance of constant part is a rounding error of the sums
+    tol = 64 * np.finfo(float).eps
+    constant = (n < 2) | (var_a <= tol * sum_sq_a) | (var_b <= tol * sum_sq_b)
+    r[constant], p[constant] = 0., 0.
+
+    func = r.copy()
+    if consider_only_significant_correlation:
+        func[p > level_of_significance_for_pearson] = 0.
+    zero = lags == 0
+    r[zero], p[zero], func[zero] = 1., 0., 1.
+    return r.tolist(), p.tolist(), func.tolist(), lags.tolist()
+
 def shift_diff(i, corfunc):
     '''
     This function calculates the L^1 norm of the difference of the original autocorrelation function and the shifted version. 
@@ -61,19 +121,183 @@ def shift_diff(i, corfunc):
         w2 = np.array(corfunc)[:-i]
         return float(sum(abs(w1 - w2)) / w1.size)
 
-def fit_model(df_data_aggregated):
+def shift_diffs(number_of_shifts, corfunc, block_elements=2**20):
+    '''
+    Batched shift_diff for all shifts 0..number_of_shifts-1 (same values up to rounding), O(N) memory:
+    shifts are taken in blocks of about block_elements compared points. For a block of shifts i0..i1-1
+    the first N-i1+1 points of corfunc are compared for all shifts at once (strided view, no copies of corfunc),
+    the remaining points of every shift (less than the block size) are added from a small triangular block.
+    :param number_of_shifts: positive integer
+    :param corfunc: list of floats between -1 and  1
+    :param block_elements: positive integer, max size of temporary array
+    :return: 1-D array of positive floats
+    '''
+    c = np.asarray(corfunc, dtype=float)
+    size = c.size
+    diffs = np.zeros(max(number_of_shifts, 0))
+    c_pad = np.concatenate((c, np.zeros(size)))
+    i0 = 1
+    while i0 < number_of_shifts:
+        block = max(1, min(number_of_shifts - i0, block_elements // (size - i0)))
+        i1 = i0 + block
+        common = size - i1 + 1
+        buf = np.subtract(sliding_window_view(c, common)[i0:i1], c[:common])
+        np.abs(buf, out=buf)
+        sums = buf.sum(axis=1)
+        if block > 1:
+            # rest of shift i0+j: points common..N-i0-j-1, i.e. block-1-j points
+            tail = np.abs(sliding_window_view(c_pad[common + i0:], block - 1)[:block] - c[common:common + block - 1])
+            tail[np.arange(block - 1)[None, :] >= (block - 1 - np.arange(block))[:, None]] = 0
+            sums += tail.sum(axis=1)
+        diffs[i0:i1] = sums / (size - np.arange(i0, i1))
+        i0 = i1
+    return diffs
+
+def sum_shifted_functions(shifts, corfunc):
+    '''
+    sum_shifted_function for several shifts at once (cumulative sums of |corfunc|, O(N))
+    :param shifts: list of positive integers
+    :param corfunc: list of floats between -1 and  1
+    :return: 1-D array of positive floats
+    '''
+    cum = np.concatenate(([0.], np.cumsum(np.abs(np.asarray(corfunc, dtype=float)))))
+    size = cum.size - 1
+    n = size - np.asarray(shifts, dtype=int)
+    return (cum[size] - cum[size - n]) / n + cum[n] / n
+
+def tolerance_sweep(diffs, sum_of_norms, number_steps):
+    '''
+    Event driven version of the loop over tolerances np.linspace(0, 1, number_steps + 1) in find_period (Step 5 a)):
+    shift k is relevant for tolerance tol if diffs[k] <= tol < sum_of_norms[k], so the set of relevant shifts changes
+    only at the first tolerance >= diffs[k] (shift enters) and the first tolerance >= sum_of_norms[k] (shift leaves).
+    Only these tolerances are visited, in increasing order; the set is the same as in the loop at every tolerance.
+    Work is O(P log P) for P shifts (sorting of events), instead of P * number_steps comparisons.
+    :param diffs: list of positive floats
+    :param sum_of_norms: list of positive floats
+    :param number_steps: positive integer
+    :return: generator of (tolerance, Boolean mask of relevant shifts, number of relevant shifts), mask is updated in place
+    '''
+    tolerances = np.linspace(0, 1, number_steps + 1)
+    diffs = np.asarray(diffs, dtype=float)
+    sum_of_norms = np.asarray(sum_of_norms, dtype=float)
+    enter = np.searchsorted(tolerances, diffs, side='left')
+    leave = np.searchsorted(tolerances, sum_of_norms, side='left')
+    # NaN is never relevant (comparisons are False)
+    valid = np.flatnonzero(~np.isnan(diffs) & ~np.isnan(sum_of_norms) & (enter < leave))
+    events = np.concatenate((enter[valid], leave[valid]))
+    shifts = np.concatenate((valid, valid))
+    change = np.concatenate((np.ones(valid.size, dtype=int), -np.ones(valid.size, dtype=int)))
+    order = np.argsort(events, kind='stable')
+    events, shifts, change = events[order], shifts[order], change[order]
+
+    relevant = np.zeros(diffs.size, dtype=bool)
+    count = 0
+    start = 0
+    while start < events.size and events[start] < tolerances.size:
+        stop = np.searchsorted(events, events[start], side='right')
+        relevant[shifts[start:stop]] = change[start:stop] > 0
+        count += int(change[start:stop].sum())
+        yield tolerances[events[start]], relevant, count
+        start = stop
+
+class PhaseBinnedModel:
+    '''
+    Model of a periodic time series by the phase of a date in the period: mean (or median) of the values in bins of the phase.
+    The mean is calculated in O(N) via np.bincount, the median by sorting once; empty bins are filled by periodic linear interpolation.
+    With smoothing, the bin values are replaced by a periodic smoothing spline (scipy.interpolate.splrep), its residual is about smoothing*bins
+    in units of the noise of the bin values.
+    It has fit(X, y) and predict(X) as the sklearn regressors, so fit_model can use it instead of the RandomForestRegressor.
+    :param period: positive float, period in units of X (None - range of X of fit)
+    :param bins: positive integer, number of phase bins (None - square root of the number of datapoints, between 8 and 200)
+    :param statistic: string, 'mean' or 'median'
+    :param smoothing: positive float or None (no spline)
+    '''
+    def __init__(self, period=None, bins=None, statistic='mean', smoothing=None):
+        if statistic not in ('mean', 'median'):
+            raise ValueError(f"Unknown statistic {statistic}, expected 'mean' or 'median'")
+        self.period = period
+        self.bins = bins
+        self.statistic = statistic
+        self.smoothing = smoothing
+
+    def _phase(self, X):
+        return (np.asarray(X, dtype=float).reshape(-1) - self.offset_) % self.period_ / self.period_
+
+    def fit(self, X, y):
+        '''
+        :param X: 2-D array of floats with one column (date modulo period)
+        :param y: 1-D array of floats
+        :return: self
+        '''
+        x = np.asarray(X, dtype=float).reshape(-1)
+        y = np.asarray(y, dtype=float).reshape(-1)
+        if self.period:
+            self.offset_, self.period_ = 0., float(self.period)
+        else:
+            self.offset_, self.period_ = x.min(), (np.ptp(x) or 1.) * (1 + 1e-9)
+        bins = self.bins or int(np.clip(np.sqrt(x.size), 8, 200))
+        idx = np.minimum((self._phase(x) * bins).astype(int), bins - 1)
+        counts = np.bincount(idx, minlength=bins)
+        filled = counts > 0
+        values = np.zeros(bins)
+        if self.statistic == 'mean':
+            values[filled] = np.bincount(idx, weights=y, minlength=bins)[filled] / counts[filled]
+        else:
+            sorted_y = y[np.lexsort((y, idx))]
+            starts = np.cumsum(counts) - counts
+            values[filled] = (sorted_y[(starts + (counts - 1) // 2)[filled]] + sorted_y[(starts + counts // 2)[filled]]) / 2
+        centers = (np.arange(bins) + 0.5) / bins
+        if not filled.all():
+            values[~filled] = np.interp(centers[~filled], centers[filled], values[filled], period=1)
+        self.values_ = values
+        self.tck_ = None
+        sigma = np.sqrt(np.mean((y - values[idx]) ** 2))
+        if self.smoothing and sigma > 0:
+            # periodic spline: the first bin is repeated after one period, bins are weighted by their number of datapoints
+            w = np.sqrt(np.maximum(counts, 1)) / sigma
+            self.tck_ = splrep(np.append(centers, centers[0] + 1), np.append(values, values[0]), w=np.append(w, w[0]),
+                               per=1, s=self.smoothing * bins)
+        return self
+
+    def predict(self, X):
+        '''
+        :param X: 2-D array of floats with one column (date modulo period)
+        :return: 1-D array of floats
+        '''
+        phase = self._phase(X)
+        if self.tck_ is not None:
+            start = 0.5 / self.values_.size
+            return splev((phase - start) % 1 + start, self.tck_)
+        return self.values_[np.minimum((phase * self.values_.size).astype(int), self.values_.size - 1)]
+
+# Models of fit_model: name -> function of the suggested period returning an object with fit(X, y) and predict(X)
+PERIOD_MODELS = {
+    'random_forest': lambda period: RandomForestRegressor(random_state=0),  # fixed seed: same period for the same LC (serial or parallel ingest)
+    'phase_mean': lambda period: PhaseBinnedModel(period, statistic='mean'),
+    'phase_median': lambda period: PhaseBinnedModel(period, statistic='median'),
+    'phase_spline': lambda period: PhaseBinnedModel(period, statistic='mean', smoothing=1.),
+}
+
+def fit_model(df_data_aggregated, model='random_forest', period=None):
     '''
     This function uses the phase of a date in a suggested period as input in order to fit a model. 
     The model will later also test how well besaid period fits the original time series.
-    Disclaimer: Here the sklearn.ensemble.RandomForestRegressor() is used, but any model can be used instead.
+    Disclaimer: By default the sklearn.ensemble.RandomForestRegressor() is used, but any model can be used instead:
+    model is a name of PERIOD_MODELS or a function of the period returning an object with fit(X, y) and predict(X).
     :param df_data_aggregated: pd.DataFrame
-    :return: list of 1-D lists of floats, RandomForestRegressor object
+    :param model: string or callable
+    :param period: positive float, suggested period (in units of date_modulo)
+    :return: list of 1-D lists of floats, fitted model object
     '''
     # The routine to fit a model based on the periodic information/phase of a date concerning the period to the original time series to test the hypothesis how well the suggested period fits the original time series
     X = df_data_aggregated["date_modulo"].to_numpy().reshape(df_data_aggregated["date_modulo"].size, 1)
     y = df_data_aggregated["value"].to_numpy().reshape(df_data_aggregated["value"].size)
-   
-    mlp = RandomForestRegressor()
+
+    if not callable(model):
+        if model not in PERIOD_MODELS:
+            raise ValueError(f"Unknown model {model}, expected one of {tuple(PERIOD_MODELS)}")
+        model = PERIOD_MODELS[model]
+    mlp = model(period)
 
     mlp.fit(X, y)
     y_model = mlp.predict(X).reshape(X.size, 1)
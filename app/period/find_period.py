@@ -1,3 +1,4 @@
+import time
 import traceback
 import pandas as pd
 import numpy as np
@@ -17,6 +18,9 @@ minimum_number_of_datapoints_for_correlation_test=300,
 minimum_ratio_of_datapoints_for_shift_autocorrelation=0.3,
 consider_only_significant_correlation=1,
 level_of_significance_for_pearson=0.01,
+autocorrelation_method='fft',
+model='random_forest',
+time_budget=None,
 # output_flag=1,
 # plot_tolerances=1,
 reference_time = pd.Timestamp('2017-01-01T12'),):
@@ -35,7 +39,11 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
     the minimum significance level for our correlation criterion level_of_significance_for_pearson,
     the output flag setting plotting to on/off output_flag,
     the output flag allowing tolerances to be plotted plot_tolerances,
-    a reference time for shift/phase calculation and relevant when fitting the model reference_time.
+    a reference time for shift/phase calculation and relevant when fitting the model reference_time,
+    the autocorrelation backend autocorrelation_method ('fft' - all shifts at once in O(N log N), 'pearsonr' - scipy.stats.pearsonr for every shift),
+    the model fitted for every suggested period model (name of PERIOD_MODELS or function of the period, see fit_model),
+    the latency budget in seconds time_budget (None - no limit): it is checked after the autocorrelation, after the shift differences and before every model fit, a started step is not interrupted;
+    out of the budget no further steps are run and the result is the best period tested so far, or no period (-1) if none was tested yet.
     The returns are the resulting period res_period, the fitted model res_model if a period was found and a performance criterion res_criteria
 
     :param path: string
@@ -46,11 +54,18 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
     :param minimum_ratio_of_datapoints_for_shift_autocorrelation: positive float
     :param consider_only_significant_correlation: Boolean
     :param level_of_significance_for_pearson: positive float
+    :param autocorrelation_method: string, one of AUTOCORRELATION_METHODS
+    :param model: string (one of PERIOD_MODELS) or callable
+    :param time_budget: positive float or None
     :param output_flag: Boolean
     :param plot_tolerances: Boolean
-    :return: positive float, RandomForestRegressor (optional), positive float
+    :return: positive float, fitted model (optional), positive float
     '''
 
+    start_time = time.perf_counter()
+
+    def out_of_budget():
+        return time_budget is not None and time.perf_counter() - start_time > time_budget
     # Load data
     # df_data = pd.read_csv(path, parse_dates=["date"])
     df_data = data
@@ -62,8 +77,11 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
                     df_data["value"],
                     list(range(0,int((df_data["value"].size)-minimum_number_of_datapoints_for_correlation_test))),
                     level_of_significance_for_pearson,
-                    consider_only_significant_correlation
+                    consider_only_significant_correlation,
+                    method=autocorrelation_method,
     )
+    if out_of_budget():
+        return Results(-1, None, 0)
 
     # Test the datapoints for equidistance
     lag_len = 0
@@ -82,8 +100,10 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
 
     try:
         # Calculate the difference between the unshifted and shifted autocorrelation function for each shift and determine which ones are relevant based on their local minima (Step 3 & 4 in Algorithm 1 in the paper)
-        diffs = [shift_diff(i, corfunc) for i in list(range(0,int(np.array(corfunc).size-np.array(corfunc).size*minimum_ratio_of_datapoints_for_shift_autocorrelation)))]
+        diffs = shift_diffs(int(len(corfunc)-len(corfunc)*minimum_ratio_of_datapoints_for_shift_autocorrelation), corfunc)
         relevant_diffs, peaks, stop_calculation = get_relevant_diffs(diffs)
+        if out_of_budget():
+            return Results(-1, None, 0)
 
         list_relv_pos=[]
         size_list_relv_pos=len(list_relv_pos)
@@ -97,21 +117,25 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
         list_models=[]
         # stop calculation if no local minima (in addition to at 0) are found (stop_calculation=1)
         if stop_calculation == 0:
-            sum_of_shifted_correlation_function = [sum_shifted_function(i, corfunc) for i in list(peaks)]
+            sum_of_shifted_correlation_function = sum_shifted_functions(peaks, corfunc)
             df_diffs_lag = pd.DataFrame({'lags': peaks, 'diffs': relevant_diffs, 'sum_of_norms': sum_of_shifted_correlation_function})
 
-            # Step by step extend the set of considered shifts (Step 5 in Algorithm 1 in the paper)
-            for tol_for_zero in np.linspace(0,1,number_steps+1):
+            corfunc_values = np.array(corfunc)
+            lags = df_diffs_lag['lags'].to_numpy()
+            # Step by step extend the set of considered shifts (Step 5 in Algorithm 1 in the paper),
+            # tolerances of np.linspace(0,1,number_steps+1) are visited only where the set changes (see tolerance_sweep)
+            for tol_for_zero, vec_bool, number_relv_pos in tolerance_sweep(df_diffs_lag['diffs'], df_diffs_lag['sum_of_norms'], number_steps):
                 # Filter for shifts smaller or equal to our criterion tol_for_zero (Step 5 a) in the paper)
-                vec_bool=(df_diffs_lag['diffs']<=tol_for_zero) & (df_diffs_lag['sum_of_norms']>tol_for_zero)
-                list_relv_pos=(df_diffs_lag['lags'][vec_bool]).to_list()
-                
-                if len(list_relv_pos) >= minimum_number_of_relevant_shifts and len(list_relv_pos)>size_list_relv_pos:
+                if number_relv_pos >= minimum_number_of_relevant_shifts and number_relv_pos>size_list_relv_pos:
+                    list_relv_pos = lags[vec_bool].tolist()
                     size_list_relv_pos = len(list_relv_pos)
-                    correlationvalues_at_relevant_peaks = np.array(corfunc)[np.array(list_relv_pos)]
+                    correlationvalues_at_relevant_peaks = corfunc_values[np.array(list_relv_pos)]
                     # If we have no (further) relevant shifts, we can abort (Step 5 b) in Algorithm 1 in the paper)
                     all_relv_pos_with_positive_correlation = sum((correlationvalues_at_relevant_peaks <= 0).astype(int)) <= 0
                     if all_relv_pos_with_positive_correlation==True:
+                        # Out of the latency budget: the best of the already tested periods is the result
+                        if out_of_budget():
+                            break
                         list_tolerances.append(tol_for_zero)
                         # Get the time difference between the shifts (Step 5 c) in Algorithm 1 in the paper)...
                         relv_time_diff=((df_data["date"].iloc[list_relv_pos]-df_data["date"].iloc[0]) / pd.Timedelta('1 minutes')).to_list()
@@ -127,7 +151,7 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
                         
                 
                         
-                        model_data,mlp = fit_model(df_data)
+                        model_data,mlp = fit_model(df_data, model=model, period=suggested_period_in_unit_of_duration_lag)
 
                         # Subtract the model data from the original and determine the autocorrelation function as a performance measure (Step 5 f) & g) in Algorithm 1 in the paper)
                         signal_data=df_data["value"].to_numpy().reshape(df_data["value"].size, 1)
@@ -140,7 +164,7 @@ reference_time = pd.Timestamp('2017-01-01T12'),):
                         #     correlationvalues_signalModel_at_relevant_peaks=np.array(corfunc_diff)[np.array(list_relv_pos)]
                         # else:
                         #
-                        r_list_diff, p_list_diff, cor_func_diff, lag_list_diff = autocor(df_data_difference_signal_model["value"], list_relv_pos, level_of_significance_for_pearson,consider_only_significant_correlation)
+                        r_list_diff, p_list_diff, cor_func_diff, lag_list_diff = autocor(df_data_difference_signal_model["value"], list_relv_pos, level_of_significance_for_pearson,consider_only_significant_correlation,method=autocorrelation_method)
                         correlationvalues_signalModel_at_relevant_peaks=np.array(cor_func_diff)
                         #
                         reduction_of_correlation = 1 - abs(correlationvalues_signalModel_at_relevant_peaks[1:]).mean() / abs(correlationvalues_at_relevant_peaks[1:]).mean()
@@ -4,7 +4,7 @@ import shutil
 import numpy as np
 from datetime import datetime, timedelta
 import time
-import traceback
+import warnings
 
 from bokeh.colors.groups import black
 from bokeh.layouts import gridplot
@@ -21,13 +21,16 @@ from sklearn.preprocessing import minmax_scale
 from pdmpy import pdm
 
 import pandas as pd
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
 from .period.find_period import find_period
 
 from dateutil import parser
 from matplotlib import pyplot as plt
 from statsmodels.tsa.tsatools import detrend as remove_trend
 
-from app.models import Satellite, Lightcurve, User
+from app.models import Satellite, Lightcurve, LightcurveStats, ObservationGeometry, Periodogram, User, db
+from app.lc_storage import to_epoch
 
 
 def del_files_in_folder(folder):
@@ -65,452 +68,97 @@ def add_lc(db, sat_id, band,
            flux, mag,
            site,
            az, el, rg, flux_err=None, mag_err=None,
-           tle=None):
+           tle=None, commit=True, lsp_period=None, calc_period=True):
+    """
+    Add LC of Satellite to DB
+    lctime: datetime64 array (as from app.lc_parser), epoch seconds or list of datetime
+    commit: commit the session, otherwise only flush (batch ingest commits once, see app/ingest.py)
+    calc_period: LC is stored with analysis status pending, period is calculated later by
+                 analyser (see analyse_pending in app/jobs.py)
+    lsp_period: known Period, used if calc_period is False
+    Returns added LC or None if LC with the same start time and band is already in DB
+    """
     # check if we already have such LC
     sat = Satellite.get_by_id(id=sat_id)
     # print("     Start processing...")
     # print(f"     Band is {band}")
-    lcs, bands = Lightcurve.get_by_lc_start(norad=sat.norad, ut_start=lc_st, bands=True)
+    ut_start = parser.parse(lc_st)
     dt = float(dt)
-    sat = Satellite.get_by_id(sat_id)
 
-    if band in bands:
+    if lc_in_db(sat.norad, ut_start, band):
         # if we already have LC with same ut_start and Band return None
         return None
+
+    # "flux_err" and "mag_err" are optional (None for PHC files and old PHX format)
+    epoch = to_epoch(lctime)
+    lc = Lightcurve(sat_id=sat_id,
+                    band=band, dt=dt,
+                    ut_start=ut_start,
+                    ut_end=parser.parse(lc_end),
+                    geometry=ObservationGeometry.get_or_create(epoch, az=az, el=el, rg=rg),
+                    flux=flux, flux_err=flux_err,
+                    mag=mag, mag_err=mag_err,
+                    n_points=len(mag),
+                    site=site)
+    lc.stats = LightcurveStats.from_arrays(epoch, mag, mag_err=mag_err, el=el, rg=rg)
+    if tle is not None:
+        lc.tle = tle
+
+    if calc_period:
+        lc.analysis_status = Lightcurve.PENDING
+    else:
+        lc.lsp_period = lsp_period
+        lc.analysis_status = Lightcurve.DONE
+    lc.analysis_updated = datetime.utcnow()
+    db.session.add(lc)
+    lc.assign_observation_group()
+    sat.updated = datetime.utcnow()  # lc.ut_start
+    sat.add_lc_stats(lc.ut_start, lc.band)
+    db.session.add(sat)
+    if commit:
+        db.session.commit()
     else:
+        db.session.flush()
+    # print(f"commit with {band} and {lc_st}")
+    return lc
 
-        # we have "flux_err" and "mag_err"
-        if flux_err is not None and mag_err is not None:
-            lc = Lightcurve(sat_id=sat_id,
-                            band=band, dt=dt,
-                            ut_start=parser.parse(lc_st),
-                            ut_end=parser.parse(lc_end),
-                            date_time=lctime,
-                            flux=flux, flux_err=flux_err,
-                            mag=mag, mag_err=mag_err,
-                            az=az, el=el, rg=rg,
-                            site=site)
-            if tle is not None:
-                lc.tle = tle
-
-            lc.lsp_period = lsp_calc(lc=lc)
-            db.session.add(lc)
-            sat.updated = datetime.utcnow()  # lc.ut_start
-            db.session.add(sat)
-            db.session.commit()
 
-        # we have "flux_err" only. No "mag_err"
-        elif flux_err is not None and (mag_err is None):
-            lc = Lightcurve(sat_id=sat_id,
-                            band=band, dt=dt,
-                            ut_start=parser.parse(lc_st),
-                            ut_end=parser.parse(lc_end),
-                            date_time=lctime,
-                            flux=flux, flux_err=flux_err,
-                            mag=mag, mag_err=None,
-                            az=az, el=el, rg=rg,
-                            site=site)
-            if tle is not None:
-                lc.tle = tle
-            lc.lsp_period = lsp_calc(lc=lc)
-            db.session.add(lc)
-            sat.updated = datetime.utcnow()  # lc.ut_start
-            db.session.add(sat)
-            db.session.commit()
+def lc_in_db(norad, ut_start, band):
+    """
+    Check if LC of Satellite with the same start time (datetime or string) and band is in DB
+    """
+    if isinstance(ut_start, str):
+        ut_start = parser.parse(ut_start)
+    lcs, bands = Lightcurve.get_by_lc_start(norad=norad, ut_start=ut_start, bands=True)
+    return band in bands
 
-        # We have "mag_err" only No "flux_err"
-        elif mag_err is not None and (flux_err is None):
-            lc = Lightcurve(sat_id=sat_id,
-                            band=band, dt=dt,
-                            ut_start=parser.parse(lc_st),
-                            ut_end=parser.parse(lc_end),
-                            date_time=lctime,
-                            flux=flux, flux_err=None,
-                            mag=mag, mag_err=mag_err,
-                            az=az, el=el, rg=rg,
-                            site=site)
-            if tle is not None:
-                lc.tle = tle
-            lc.lsp_period = lsp_calc(lc=lc)
-            db.session.add(lc)
-            sat.updated = datetime.utcnow()  # lc.ut_start
-            db.session.add(sat)
-            db.session.commit()
 
-        # We have no "mag_err" neither "flux_err"
-        elif (mag_err is None) and (flux_err is None):
-            lc = Lightcurve(sat_id=sat_id,
-                            band=band, dt=dt,
-                            ut_start=parser.parse(lc_st),
-                            ut_end=parser.parse(lc_end),
-                            date_time=lctime,
-                            flux=flux, flux_err=None,
-                            mag=mag, mag_err=None,
-                            az=az, el=el, rg=rg,
-                            site=site)
-            if tle is not None:
-                lc.tle = tle
-            lc.lsp_period = lsp_calc(lc=lc)
-            db.session.add(lc)
-            sat.updated = datetime.utcnow()  # lc.ut_start
-            db.session.add(sat)
-            db.session.commit()
-            # print(f"commit with {band} and {lc_st}")
-
-
-def process_lc_file(file, file_ext, db, app):
-    file_content = file.read()
-    file_name = file.filename
-    # fext = file_ext
-    if file_ext == ".phc":
-        with io.StringIO(file_content.decode("UTF-8")) as fs:
-            sat_st = fs.readline().strip("\n").strip("\r")
-            sat_st_date = sat_st.split()[0]
-            sat_end = fs.readline().strip("\n").strip("\r")
-            for line in fs:
-                # line = line.decode("UTF-8")
-                if line[:9] == "COSPAR ID":
-                    cospar = line.split("=")[1].strip().strip("\n").strip("\r")
-                if line[:8] == "NORAD ID":
-                    norad = int(line.split("=")[1].strip())
-                if line[:4] == "NAME":
-                    name = line.split("=")[1].strip().strip("\n").strip("\r")
-                    if name[:2] == "0 ":
-                        name = name[2:]  # delete leading zero in TLE name line
-                if line[:2] == "dt":
-                    dt = line.split("=")[1].strip().strip("\n").strip("\r")
-            fs.seek(0)
-            try:
-                # leave LOADTXT here, because format has no '#' comments. Only hardcode skiprows will work
-                impB, impV, fonB, fonV, mB, mV, az, el, rg = \
-                    np.loadtxt(fs, unpack=True, skiprows=7,
-                               usecols=(1, 2, 3, 4, 5, 6, 7, 8, 9)
-                               )
-                fs.seek(0)
-                lctime = np.loadtxt(fs, unpack=True, skiprows=7, usecols=(0,),
-                                    dtype={'names': ('time',), 'formats': ('S15',)})
-
-                lctime = [
-                    datetime.strptime(sat_st_date + " " + x.decode('UTF-8'), "%Y-%m-%d %H:%M:%S.%f")
-                    for x in lctime[0]]  # lctime is array in list, so we need lctime[0]
-                t0 = lctime[0]
-                lctime = [x if t0 - x < timedelta(hours=2) else x + timedelta(days=1) for x in
-                          lctime]  # add DAY after 00:00:00
-
-                sat = Satellite.get_by_norad(norad=norad)
-
-                if sat is None:
-                    sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                    db.session.add(sat)
-                    db.session.commit()
-
-                # print(f"Add LC. file = {file}")
-
-                add_lc(db=db, sat_id=sat.id, band="B",
-                       lc_st=sat_st, lc_end=sat_end,
-                       dt=dt, lctime=lctime,
-                       flux=impB, mag=mB,
-                       az=az, el=el, rg=rg,
-                       site="Uzhhorod")
-
-                add_lc(db=db, sat_id=sat.id, band="V",
-                       lc_st=sat_st, lc_end=sat_end,
-                       dt=dt, lctime=lctime,
-                       flux=impV, mag=mV,
-                       az=az, el=el, rg=rg,
-                       site="Uzhhorod")
-                return True
-
-            except Exception as e:
-                app.logger.warning(f"error: {e}\nBed format PHC in file = {file_name}")
-                # return {'error': e, "message": f"bed format PHC in file = {file_content}"}
-                # print(e)
-                # print("bed format PHC in file =", file)
-                pass
-
-    elif file_ext[:3] == ".ph":  # .phX where X is [B, V, R, C or others!]
-        with io.StringIO(file_content.decode("UTF-8")) as fs:
-            fs.readline()
-            # fs.readline()
-            # fs.readline()
-            # fs.readline()
-            tle = fs.readline()[2:] + fs.readline()[2:] + fs.readline()[2:]
-
-            sat_st = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
-            # sat_st_date = sat_st.split()[0]
-
-            sat_end = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
-
-            # Default values
-            site_name = "Derenivka"
-            filt = file_ext[3:]  # Get filter from file extension if not available in header
-
-            # Check header
-            for line in fs:
-                l = line.split(" = ")
-                if l[0] == "# COSPAR":
-                    cospar = l[1].strip("\n").strip("\r")
-                if l[0] == "# NORAD ":
-                    norad = int(l[1])
-                if l[0] == "# NAME  ":
-                    name = l[1].strip("\n").strip("\r")
-                    if name[:2] == "0 ":
-                        name = name[2:]  # delete leading zero in TLE name line
-                if l[0] == "# dt":
-                    dt = l[1].strip("\n").strip("\r")
-                if l[0] == "# SITE_NAME  ":
-                    site_name = l[1].strip("\n").strip("\r")
-                if l[0] == "# Filter":
-                    filt = l[1].strip("\n").strip("\r")
-            fs.seek(0)
-
-            cols = np.genfromtxt(fs, skip_header=True, unpack=True)
-            # print(len(cols))
-            fs.seek(0)
-
-            try:  # ##################################
-
-                fs.seek(0)
-
-                if len(cols) == 14: # UT format
-                    flux, flux_err, m, merr, az, el, rg = np.genfromtxt(fs, skip_header=True,
-                                                                        usecols=(6, 7, 8, 9, 10, 11, 12,),
-                                                                        unpack=True)
-                    fs.seek(0)
-                    lcd, lct = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0, 1,),
-                                           dtype=None, encoding="utf-8")
-                    lctime = list(zip(lcd, lct))
-                    lctime = [x[0] + " " + x[1] for x in lctime]
-                    lctime = [datetime.strptime(x, "%Y-%m-%d %H:%M:%S.%f") for x in lctime]
-
-                elif len(cols) == 13: # JD format
-                    flux, flux_err, m, merr, az, el, rg = np.genfromtxt(fs, skip_header=True,
-                                                                        usecols=(5, 6, 7, 8, 9, 10, 11,),
-                                                                        unpack=True)
-                    fs.seek(0)
-                    lc_jd = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0,),
-                                             dtype=None, encoding="utf-8")
-                    lctime = Time(lc_jd, format='jd', scale='utc').datetime
-
-                sat = Satellite.get_by_norad(norad=norad)
-                if not sat:  # sat == []
-                    sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                    db.session.add(sat)
-                    db.session.commit()
-                    sat = Satellite.get_by_norad(norad=norad)
-
-                add_lc(db=db, sat_id=sat.id, band=filt,
-                       lc_st=sat_st, lc_end=sat_end,
-                       dt=dt, tle=tle, lctime=lctime,
-                       flux=flux, flux_err=flux_err,
-                       mag=m, mag_err=merr,
-                       az=az, el=el, rg=rg,
-                       site=site_name)
-                return True
-
-            except Exception as e:
-                # if str(e) == "list index out of range":   # no merr
-                # print(e.__class__.__name__)
-                # print(type(e.__class__.__name__))
-                # print(e.__class__ is IndexError)
-                if e.__class__ is IndexError:  # no merr
-                    # print("No m_err")
-                    fs.seek(0)
-                    flux, flux_err, m, az, el, rg = np.genfromtxt(fs, skip_header=True,
-                                                                  usecols=(5, 6, 7, 8, 9, 10,),
-                                                                  unpack=True)
-                    # flux, flux_err, m, az, el, rg = np.loadtxt(fs, unpack=True, skiprows=11,
-                    #                                            usecols=(5, 6, 7, 8, 9, 10))
-                    fs.seek(0)
-                    lcd, lct = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0, 1,),
-                                             dtype=None, encoding="utf-8")
-                    # lctime = [x + " " + t for x in lcd for t in lct]
-                    lctime = list(zip(lcd, lct))
-                    lctime = [x[0] + " " + x[1] for x in lctime]
-                    lctime = [datetime.strptime(x, "%Y-%m-%d %H:%M:%S.%f") for x in lctime]
-
-                    sat = Satellite.get_by_norad(norad=norad)
-                    if sat is None:
-                        sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                        db.session.add(sat)
-                        db.session.commit()
-
-                    add_lc(db=db, sat_id=sat.id, band=filt,
-                           lc_st=sat_st, lc_end=sat_end,
-                           dt=dt, tle=tle, lctime=lctime,
-                           flux=flux, flux_err=flux_err,
-                           mag=m, mag_err=None,
-                           az=az, el=el, rg=rg,
-                           site=site_name)
-                else:
-                    app.logger.error(f"Error: {e}")
-                    app.logger.error(f"Bed format PHX in file = {file_name}")
-                    # return {'error': e, "message": f"Bed format PHX in file= {file_content}"}
-                    # print(e.__class__.__name__)
-                    # print("Error = ", e, e.__class__.__name__)
-                    # print("Bed format PHR in file")
-                    app.logger.error(f"Full Error with Traceback:\n{traceback.format_exc()}")
-
-                    # If error occurs there is a chance that we have satellite without LCs
-                    # This will delete such records
-                    app.logger.info("Fixing possible 'Satellite without LCs' issue...")
-                    Satellite.clear_empty_records()
-                    app.logger.info("Done.")
-                pass
-
-
-def process_lc_files(lc_flist, db):
-    for file in lc_flist:
-        # read the file if its file
-        if not os.path.isdir(file):
-            _, fext = os.path.splitext(file)
-            if file.endswith(".phc"):
-                with open(file, "r") as fs:
-                    sat_st = fs.readline().strip("\n").strip("\r")
-                    sat_st_date = sat_st.split()[0]
-                    sat_end = fs.readline().strip("\n").strip("\r")
-                    for line in fs:
-                        # line = line.decode("UTF-8")
-                        if line[:9] == "COSPAR ID":
-                            cospar = line.split("=")[1].strip().strip("\n").strip("\r")
-                        if line[:8] == "NORAD ID":
-                            norad = int(line.split("=")[1].strip())
-                        if line[:4] == "NAME":
-                            name = line.split("=")[1].strip().strip("\n").strip("\r")
-                        if line[:2] == "dt":
-                            dt = line.split("=")[1].strip().strip("\n").strip("\r")
-                    fs.seek(0)
-                    try:
-                        impB, impV, fonB, fonV, mB, mV, az, el, rg = \
-                            np.loadtxt(fs, unpack=True, skiprows=7,
-                                       usecols=(1, 2, 3, 4, 5, 6, 7, 8, 9)
-                                       )
-                        fs.seek(0)
-                        lctime = np.loadtxt(fs, unpack=True, skiprows=7, usecols=(0,),
-                                            dtype={'names': ('time',), 'formats': ('S15',)})
-
-                        lctime = [
-                            datetime.strptime(sat_st_date + " " + x[0].decode('UTF-8'), "%Y-%m-%d %H:%M:%S.%f")
-                            for x in lctime]
-                        t0 = lctime[0]
-                        lctime = [x if t0 - x < timedelta(hours=2) else x + timedelta(days=1) for x in
-                                  lctime]  # add DAY after 00:00:00
-
-                        sat = Satellite.get_by_norad(norad=norad)
-
-                        if sat is None:
-                            sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                            db.session.add(sat)
-                            db.session.commit()
-
-                        # print(f"Add LC. file = {file}")
-
-                        add_lc(db=db, sat_id=sat.id, band="B",
-                               lc_st=sat_st, lc_end=sat_end,
-                               dt=dt, lctime=lctime,
-                               flux=impB, mag=mB,
-                               az=az, el=el, rg=rg)
-
-                        add_lc(db=db, sat_id=sat.id, band="V",
-                               lc_st=sat_st, lc_end=sat_end,
-                               dt=dt, lctime=lctime,
-                               flux=impV, mag=mV,
-                               az=az, el=el, rg=rg)
-
-                    except Exception as e:
-                        print(e)
-                        print("bed format PHC in file =", file)
-                        pass
-
-            elif fext[:3] == ".ph":  # .ph R B V C and others!
-                with open(file) as fs:
-                    fs.readline()
-                    # fs.readline()
-                    # fs.readline()
-                    # fs.readline()
-                    tle = fs.readline()[2:] + fs.readline()[2:] + fs.readline()[2:]
-
-                    sat_st = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
-                    sat_st_date = sat_st.split()[0]
-
-                    sat_end = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
-
-                    for line in fs:
-                        l = line.split(" = ")
-                        if l[0] == "# COSPAR":
-                            cospar = l[1].strip("\n").strip("\r")
-                        if l[0] == "# NORAD ":
-                            norad = int(l[1])
-                        if l[0] == "# NAME  ":
-                            name = l[1].strip("\n").strip("\r")
-                        if l[0] == "# dt":
-                            dt = l[1].strip("\n").strip("\r")
-                    fs.seek(0)
-                    # read TLE
-                    try:  # ##################################
-                        flux, flux_err, m, merr, az, el, rg = np.loadtxt(fs, unpack=True, skiprows=11,
-                                                                         usecols=(6, 7, 8, 9, 10, 11, 12))
-                        fs.seek(0)
-                        lctime = np.loadtxt(fs, unpack=True, skiprows=11, usecols=(1,),
-                                            dtype={'names': ('time',), 'formats': ('S14',)})
-                        lctime = [
-                            datetime.strptime(sat_st_date + " " + x[0].decode('UTF-8'), "%Y-%m-%d %H:%M:%S.%f")
-                            for x in lctime]
-                        t0 = lctime[0]
-                        lctime = [x if t0 - x < timedelta(hours=2) else x + timedelta(days=1) for x in
-                                  lctime]  # add DAY after 00:00:00
-
-                        sat = Satellite.get_by_norad(norad=norad)
-                        if not sat:  # sat == []
-                            sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                            db.session.add(sat)
-                            db.session.commit()
-                            sat = Satellite.get_by_norad(norad=norad)
-
-                        add_lc(db=db, sat_id=sat.id, band=fext[3:],
-                               lc_st=sat_st, lc_end=sat_end,
-                               dt=dt, tle=tle, lctime=lctime,
-                               flux=flux, flux_err=flux_err,
-                               mag=m, mag_err=merr,
-                               az=az, el=el, rg=rg)
-
-                    except Exception as e:
-                        # if str(e) == "list index out of range":   # no merr
-                        # print(e.__class__.__name__)
-                        # print(type(e.__class__.__name__))
-                        # print(e.__class__ is IndexError)
-                        if e.__class__ is IndexError:  # no merr
-                            # print("No m_err")
-                            fs.seek(0)
-                            flux, flux_err, m, az, el, rg = np.loadtxt(fs, unpack=True, skiprows=11,
-                                                                       usecols=(5, 6, 7, 8, 9, 10))
-                            fs.seek(0)
-                            lctime = np.loadtxt(fs, unpack=True, skiprows=11, usecols=(1,),
-                                                dtype={'names': ('time',), 'formats': ('S14',)})
-                            lctime = [
-                                datetime.strptime(sat_st_date + " " + x[0].decode('UTF-8'), "%Y-%m-%d %H:%M:%S.%f")
-                                for x in lctime]
-                            t0 = lctime[0]
-                            lctime = [x if t0 - x < timedelta(hours=2) else x + timedelta(days=1) for x in
-                                      lctime]  # add DAY after 00:00:00
-
-                            sat = Satellite.get_by_norad(norad=norad)
-                            if sat is None:
-                                sat = Satellite(name=name, norad=norad, cospar=cospar)  # add satellite
-                                db.session.add(sat)
-                                db.session.commit()
-
-                            add_lc(db=db, sat_id=sat.id, band=fext[3:],
-                                   lc_st=sat_st, lc_end=sat_end,
-                                   dt=dt, tle=tle, lctime=lctime,
-                                   flux=flux, flux_err=flux_err,
-                                   mag=m, mag_err=None,
-                                   az=az, el=el, rg=rg)
-                        else:
-                            # print(e.__class__.__name__)
-                            print("Error = ", e, e.__class__.__name__)
-                            print("Bed format PHR in file =", file)
-                        pass
+def lcs_in_db(norad, lcs):
+    """
+    Check which LCs of Satellite are in DB, by one query
+    lcs: list of dicts with "lc_st" (start time, string or datetime) and "band", as from parse_lc_file
+    Returns list of bool
+    """
+    starts = [parser.parse(lc["lc_st"]) if isinstance(lc["lc_st"], str) else lc["lc_st"] for lc in lcs]
+    in_db = Lightcurve.get_start_bands(norad, set(starts))
+    return [(ut_start, lc["band"]) in in_db for ut_start, lc in zip(starts, lcs)]
+
+
+def store_lc_file(parsed, db, commit=True):
+    """
+    Add Satellite (if new) and LCs of parsed file (see parse_lc_file) to DB
+    commit: commit the session, otherwise only flush (caller commits)
+    Returns list of added LCs (LCs which are already in DB are skipped)
+    """
+    sat = Satellite.get_or_create(norad=parsed["norad"], name=parsed["name"], cospar=parsed["cospar"])
+    added = []
+    for lc_data in parsed["lcs"]:
+        lc = add_lc(db=db, sat_id=sat.id, commit=False, **lc_data)
+        if lc is not None:
+            added.append(lc)
+    if commit:
+        db.session.commit()
+    return added
 
 
 def plot_periods_bokeh(sat_id):
@@ -567,28 +215,50 @@ def plot_periods_bokeh(sat_id):
     return sat, periods_fig
 
 
+def lc_mag_limits(lc):
+    """
+    Plot limits of LC: (mag_min, mag_max, mag_err_max) from lc.stats, or from LC arrays
+    if LC has no statistics (no stats row, or no finite mag values when they were calculated).
+    mag_err_max is None if LC has no mag errors
+    """
+    stats = lc.stats
+    if stats is not None and stats.mag_min is not None and stats.mag_max is not None:
+        return stats.mag_min, stats.mag_max, stats.mag_err_max
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # all values are NaN
+        mag_min, mag_max = float(np.nanmin(lc.mag)), float(np.nanmax(lc.mag))
+        mag_err_max = float(np.nanmax(lc.mag_err)) if lc.mag_err is not None else None
+    if not (np.isfinite(mag_min) and np.isfinite(mag_max)):
+        mag_min, mag_max = 0., 0.
+    if mag_err_max is not None and not np.isfinite(mag_err_max):
+        mag_err_max = None
+    return mag_min, mag_max, mag_err_max
+
+
 def plot_lc_bokeh(lc_id):
     color = {"B": "blue",
              "V": "green",
              "R": "red",
              "C": "black"}
-    lc = Lightcurve.get_by_id(id=lc_id)
+    lc = Lightcurve.get_by_id(id=lc_id, arrays=True)
     dt = str(lc.dt).strip('\n')
+    ut = lc.ut_times
 
-    # source = ColumnDataSource(data=dict(base=lc.date_time, mag=lc.mag))
+    # source = ColumnDataSource(data=dict(base=ut, mag=lc.mag))
 
     tools = 'pan,wheel_zoom,box_zoom,reset,save'
     title = f"Satellite Name:{lc.sat.name}, NORAD:{lc.sat.norad}, COSPAR:{lc.sat.cospar}" + ", " + \
             "\n" + \
             f"LC start={lc.ut_start}  dt={dt}  Filter={lc.band} Observatory={lc.site}"
-    if lc.mag_err is None:
+    mag_min, mag_max, mag_err_max = lc_mag_limits(lc)
+    if mag_err_max is None:
         dm = 0.1
     else:
-        dm = max(lc.mag_err)
+        dm = mag_err_max
 
     plot = figure(title=title, plot_height=400, plot_width=800,
                   x_axis_type='datetime', min_border=10,
-                  y_range=(max(lc.mag) + dm, min(lc.mag) - dm),
+                  y_range=(mag_max + dm, mag_min - dm),
                   tools=tools
                   )
 
@@ -599,26 +269,22 @@ def plot_lc_bokeh(lc_id):
     plot.yaxis.axis_label = u'm\u209B\u209c [mag]'  # m_st
     plot.xaxis.axis_label = r"UT"
 
-    source = ColumnDataSource(dict(x=lc.date_time, mag=lc.mag))
+    source = ColumnDataSource(dict(x=ut, mag=lc.mag))
 
     if lc.mag_err is None:
-        plot.line(lc.date_time, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
-        # plot.scatter(lc.date_time, lc.mag, color=f"{color[lc.band]}", marker="x")
+        plot.line(ut, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
+        # plot.scatter(ut, lc.mag, color=f"{color[lc.band]}", marker="x")
         glyph = Scatter(x="x", y="mag", size=5, marker="x", line_color=f"{color[lc.band]}")
         plot.add_glyph(source, glyph)
     else:
-        plot.line(lc.date_time, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
-        # plot.scatter(lc.date_time, lc.mag, color=f"{color[lc.band]}", marker="x")
+        plot.line(ut, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
+        # plot.scatter(ut, lc.mag, color=f"{color[lc.band]}", marker="x")
         glyph = Scatter(x="x", y="mag", size=5, marker="x", line_color=f"{color[lc.band]}")
         plot.add_glyph(source, glyph)
 
-        base, lower, upper = [], [], []
-        for i in range(0, len(lc.mag)):
-            base.append(lc.date_time[i])
-            lower.append(lc.mag[i] - lc.mag_err[i])
-            upper.append(lc.mag[i] + lc.mag_err[i])
-
-        source_error = ColumnDataSource(data=dict(base=base, lower=lower, upper=upper))
+        source_error = ColumnDataSource(data=dict(base=ut,
+                                                  lower=lc.mag - lc.mag_err,
+                                                  upper=lc.mag + lc.mag_err))
         plot.add_layout(
             Whisker(source=source_error, base="base", upper="upper", lower="lower",
                     line_color=f"{color[lc.band]}",
@@ -672,7 +338,7 @@ def plot_lc_bokeh(lc_id):
                 y_axis_location="left", x_axis_type='datetime')
     p2.output_backend = "svg"
     p2.yaxis.axis_label = r"elevation [deg]"
-    p2.line(lc.date_time, lc.el, color='black', line_width=0.5)
+    p2.line(ut, lc.el, color='black', line_width=0.5)
     p2.xaxis.ticker.desired_num_ticks = 10
     p2.xaxis.formatter = DatetimeTickFormatter(seconds=["%H:%M:%S"],
                                                minutes=["%H:%M:%S"],
@@ -683,7 +349,7 @@ def plot_lc_bokeh(lc_id):
                 y_axis_location="left", x_axis_type='datetime')
     p3.output_backend = "svg"
     p3.yaxis.axis_label = r"Azimuth [deg]"
-    p3.line(lc.date_time, lc.az, color='black', line_width=0.5)
+    p3.line(ut, lc.az, color='black', line_width=0.5)
     p3.xaxis.ticker.desired_num_ticks = 10
     p3.xaxis.formatter = DatetimeTickFormatter(seconds=["%H:%M:%S"],
                                                minutes=["%H:%M:%S"],
@@ -701,8 +367,8 @@ def plot_lc_multi_bokeh(lc_id):
              "V": "green",
              "R": "red",
              "C": "black"}
-    lc_selected = Lightcurve.get_by_id(id=lc_id)
-    lcs = Lightcurve.get_synch_lc(lc_id, diff_in_sec=300) # list of synch LCs
+    lc_selected = Lightcurve.get_by_id(id=lc_id, arrays=True)
+    lcs = Lightcurve.get_synch_lc(lc_id)  # list of synch LCs (observation group)
 
     bands = ",".join([lc.band for lc in lcs])
     dts = ";".join([str(lc.dt) for lc in lcs])
@@ -720,19 +386,15 @@ def plot_lc_multi_bokeh(lc_id):
     #         "\n" + \
     #         f"LC start={lc_selected.ut_start}  dt={dts}  Filter={bands} Observatory={lc_selected.site}"
 
-    list_ar = []
-    for i in range(0, len(lcs)):
-        list_ar.append(lcs[i].mag)
-
-    all_mag = np.concatenate(list_ar, axis=0)
+    limits = [lc_mag_limits(lc) for lc in lcs]
+    max_mag = max(mag_max for _, mag_max, _ in limits)
+    min_mag = min(mag_min for mag_min, _, _ in limits)
 
-    max_mag = max(all_mag)
-    min_mag = min(all_mag)
-
-    if lc_selected.mag_err is None:
+    mag_err_max = lc_mag_limits(lc_selected)[2]
+    if mag_err_max is None:
         dm = 0.1
     else:
-        dm = max(lc_selected.mag_err)
+        dm = mag_err_max
 
     title = title1 + "\n" + title2
     p1 = figure(title=title, plot_height=400, plot_width=800,
@@ -748,26 +410,23 @@ def plot_lc_multi_bokeh(lc_id):
     p1.xaxis.axis_label = r"UT"
 
     for lc in lcs:
-        source = ColumnDataSource(dict(x=lc.date_time, mag=lc.mag))
+        ut = lc.ut_times
+        source = ColumnDataSource(dict(x=ut, mag=lc.mag))
 
         if lc.mag_err is None:
-            p1.line(lc.date_time, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
-            # plot.scatter(lc.date_time, lc.mag, color=f"{color[lc.band]}", marker="x")
+            p1.line(ut, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
+            # plot.scatter(ut, lc.mag, color=f"{color[lc.band]}", marker="x")
             glyph = Scatter(x="x", y="mag", size=5, marker="x", line_color=f"{color[lc.band]}")
             p1.add_glyph(source, glyph)
         else:
-            p1.line(lc.date_time, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
-            # plot.scatter(lc.date_time, lc.mag, color=f"{color[lc.band]}", marker="x")
+            p1.line(ut, lc.mag, color=f"{color[lc.band]}", line_width=0.5)
+            # plot.scatter(ut, lc.mag, color=f"{color[lc.band]}", marker="x")
             glyph = Scatter(x="x", y="mag", size=5, marker="x", line_color=f"{color[lc.band]}")
             p1.add_glyph(source, glyph)
 
-            base, lower, upper = [], [], []
-            for i in range(0, len(lc.mag)):
-                base.append(lc.date_time[i])
-                lower.append(lc.mag[i] - lc.mag_err[i])
-                upper.append(lc.mag[i] + lc.mag_err[i])
-
-            source_error = ColumnDataSource(data=dict(base=base, lower=lower, upper=upper))
+            source_error = ColumnDataSource(data=dict(base=ut,
+                                                      lower=lc.mag - lc.mag_err,
+                                                      upper=lc.mag + lc.mag_err))
             p1.add_layout(
                 Whisker(source=source_error, base="base", upper="upper", lower="lower",
                         line_color=f"{color[lc.band]}",
@@ -801,7 +460,7 @@ def plot_lc_multi_bokeh(lc_id):
     p2.output_backend = "svg"
     p2.yaxis.axis_label = r"elevation [deg]"
     for lc in lcs:
-        p2.line(lc.date_time, lc.el, color='black', line_width=0.5)
+        p2.line(lc.ut_times, lc.el, color='black', line_width=0.5)
     p2.xaxis.ticker.desired_num_ticks = 10
     p2.xaxis.formatter = DatetimeTickFormatter(seconds=["%H:%M:%S"],
                                                minutes=["%H:%M:%S"],
@@ -813,7 +472,7 @@ def plot_lc_multi_bokeh(lc_id):
     p3.output_backend = "svg"
     p3.yaxis.axis_label = r"Azimuth [deg]"
     for lc in lcs:
-        p3.line(lc.date_time, lc.az, color='black', line_width=0.5)
+        p3.line(lc.ut_times, lc.az, color='black', line_width=0.5)
     p3.xaxis.ticker.desired_num_ticks = 10
     p3.xaxis.formatter = DatetimeTickFormatter(seconds=["%H:%M:%S"],
                                                minutes=["%H:%M:%S"],
@@ -835,66 +494,182 @@ def lsp_calc(lc_id=None, lc=None):
     Returns: None if Aperiodic or Period with the highest Power
     """
     if lc_id:
-        lc = Lightcurve.get_by_id(id=lc_id)
-    lctime = lc.date_time
+        lc = Lightcurve.get_by_id(id=lc_id, arrays=True)
+    return calc_lsp_period(lc.date_time, lc.mag, mag_err=lc.mag_err, dt=lc.dt, **period_options(current_app.config))
 
-    lctime = [x.timestamp() for x in lctime]
-    # lc_mag = remove_trend(lc.mag, order=3)  ???? do we need this ????
 
-    # try to detect Period with find_period function
-    det_p = detect_period(lc.date_time, lc.mag, detrend=True)
-    if det_p != -1:
-        min_p = det_p - (0.2 * det_p)
-        max_freq = 1 / min_p
+LSP_SAMPLES_PER_PEAK = 50
+LSP_NORMALIZATION = 'standard'
+LSP_FAP_PROBABILITY = 0.0001  # 0.01 %
 
-        max_p = det_p + (0.2 * det_p)
-        min_freq = 1 / max_p
-    else:  # if period not detected use clear LS method
-        if lc.dt < 1:
-            max_freq = 0.83  # / (2 * lc.dt)
-        else:
-            max_freq = 1 / (2 * lc.dt)
-        min_freq = 1 / ((lctime[-1] - lctime[0]) / 2)
 
-    if lc.mag_err is not None:
-        ls = LombScargle(lctime, lc.mag, lc.mag_err)
+def lsp_frequency_range(lctime, dt):
+    """
+    Frequency range (Hz) of LSP of the whole LC: (min_freq, max_freq)
+    """
+    if dt < 1:
+        max_freq = 0.83  # / (2 * dt)
     else:
-        ls = LombScargle(lctime, lc.mag)
+        max_freq = 1 / (2 * dt)
+    min_freq = 1 / ((lctime[-1] - lctime[0]) / 2)
+    return float(min_freq), float(max_freq)
+
+
+def calc_periodogram(date_time, mag, mag_err, min_freq, max_freq,
+                     samples_per_peak=LSP_SAMPLES_PER_PEAK, normalization=LSP_NORMALIZATION):
+    """
+    Lomb-Scargle periodogram of LC arrays (no DB access)
+    Returns: dict of Periodogram fields - grid parameters, frequency and power arrays,
+             power of LSP_FAP_PROBABILITY false alarm and indices of peaks above it
+    """
+    lctime = to_epoch(date_time)  # epoch seconds
+    if mag_err is not None:
+        ls = LombScargle(lctime, mag, mag_err, normalization=normalization)
+    else:
+        ls = LombScargle(lctime, mag, normalization=normalization)
 
     frequency, power = ls.autopower(
         # nyquist_factor=0.5,
         minimum_frequency=min_freq,
         maximum_frequency=max_freq,
-        samples_per_peak=50,
-        normalization='standard')
-
-    periods = 1.0 / frequency
+        samples_per_peak=samples_per_peak)
 
-    probabilities = [0.0001]  # 0.01 %
-    fap = ls.false_alarm_level(probabilities)
+    fap = ls.false_alarm_level([LSP_FAP_PROBABILITY])
     peaks, _ = find_peaks(power, height=fap[0])
+    return {"min_freq": float(min_freq), "max_freq": float(max_freq),
+            "samples_per_peak": samples_per_peak, "normalization": normalization,
+            "frequency": frequency, "power": power,
+            "fap_probability": LSP_FAP_PROBABILITY, "fap_level": float(fap[0]), "peaks": peaks}
+
+
+def calc_lsp_periodograms(date_time, mag, mag_err=None, dt=1.0, **options):
+    """
+    Period of LC arrays and periodograms calculated for it
+    (no DB access, can run in worker process, see analyse_pending in app/jobs.py)
+    Args:
+        date_time: epoch seconds or datetime64 array
+        mag, mag_err: magnitudes and their errors (optional)
+        dt: exposure, sec
+        options: of detect_period (model, max_points, time_budget), see period_options()
+
+    Returns: None if Aperiodic or Period with the highest Power,
+             list of periodograms (see calc_periodogram): of the whole frequency range (full_range, shown by
+             lsp_plot_bokeh) and, if detect_period finds period, of +-20 % around it (where the Period is searched)
+    """
+    lctime = to_epoch(date_time)  # epoch seconds
+    # lc_mag = remove_trend(mag, order=3)  ???? do we need this ????
+    periodograms = [dict(calc_periodogram(lctime, mag, mag_err, *lsp_frequency_range(lctime, dt)), full_range=True)]
+
+    # try to detect Period with find_period function, if period not detected use clear LS method
+    det_p = detect_period(lctime, mag, detrend=True, **options)
+    if det_p != -1:
+        min_p = det_p - (0.2 * det_p)
+        max_freq = 1 / min_p
+
+        max_p = det_p + (0.2 * det_p)
+        min_freq = 1 / max_p
+        periodograms.append(calc_periodogram(lctime, mag, mag_err, min_freq, max_freq))
+
+    periodogram = periodograms[-1]
+    periods = 1.0 / periodogram["frequency"]
+    power = periodogram["power"]
+    peaks = periodogram["peaks"]
 
     if not peaks.any():
-        return None
+        return None, periodograms
     else:
         zipped_lists = zip(power[peaks], periods[peaks])
         sorted_pairs = sorted(zipped_lists, reverse=True)
 
         # Return period with higher power
-        return sorted_pairs[0][1]
+        return sorted_pairs[0][1], periodograms
+
+
+def calc_lsp_period(date_time, mag, mag_err=None, dt=1.0, **options):
+    """
+    Period of LC arrays, see calc_lsp_periodograms
+    Returns: None if Aperiodic or Period with the highest Power
+    """
+    return calc_lsp_periodograms(date_time, mag, mag_err=mag_err, dt=dt, **options)[0]
+
+
+def get_periodogram(lc, min_freq=None, max_freq=None,
+                    samples_per_peak=LSP_SAMPLES_PER_PEAK, normalization=LSP_NORMALIZATION):
+    """
+    Stored periodogram of LC, of the whole frequency range by default.
+    It is calculated and stored only if there is no periodogram with these parameters:
+    LC arrays (deferred) are loaded only then
+    """
+    full_range = min_freq is None or max_freq is None
+
+    def get():
+        if full_range:
+            return Periodogram.get_full_range(lc.id, samples_per_peak, normalization)
+        return Periodogram.get(lc.id, float(min_freq), float(max_freq), samples_per_peak, normalization)
+
+    periodogram = get()
+    if periodogram is None:
+        if full_range:
+            min_freq, max_freq = lsp_frequency_range(lc.date_time, lc.dt)
+        periodogram = Periodogram.store(lc.id, dict(
+            calc_periodogram(lc.date_time, lc.mag, lc.mag_err, float(min_freq), float(max_freq),
+                             samples_per_peak=samples_per_peak, normalization=normalization),
+            full_range=full_range))
+        try:
+            db.session.commit()
+        except IntegrityError:  # stored by other request meanwhile
+            db.session.rollback()
+            periodogram = get()
+    return periodogram
 
 
-def detect_period(date_time, mag, detrend=False):
+def bin_lc(date_time, mag, max_points):
+    """
+    Mean of LC in equal time bins over the whole time span, at most max_points (not empty) bins.
+    LCs of up to max_points points (or max_points None) are not changed.
+    date_time: epoch seconds. Returns times (mean of bin) and mags
+    """
+    date_time = np.asarray(date_time, dtype=float)
+    mag = np.asarray(mag, dtype=float)
+    if max_points is None or mag.size <= max_points:
+        return date_time, mag
+    span = date_time[-1] - date_time[0]
+    if not span > 0:  # all points at the same time
+        return date_time[:1], np.array([mag.mean()])
+    idx = np.minimum(((date_time - date_time[0]) * (max_points / span)).astype(int), max_points - 1)
+    counts = np.bincount(idx, minlength=max_points)
+    filled = counts > 0
+    return (np.bincount(idx, weights=date_time, minlength=max_points)[filled] / counts[filled],
+            np.bincount(idx, weights=mag, minlength=max_points)[filled] / counts[filled])
+
+
+def period_options(config):
+    """
+    detect_period options of deployment (PERIOD_* of app config)
+    """
+    return {"model": config['PERIOD_MODEL'], "max_points": config['PERIOD_MAX_POINTS'],
+            "time_budget": config['PERIOD_TIME_BUDGET']}
+
+
+def detect_period(date_time, mag, detrend=False, model='random_forest', max_points=2000, time_budget=None):
+    """
+    Period (sec) by find_period or -1. date_time: epoch seconds or datetime64 array,
+    model: fitted for every suggested period, name of PERIOD_MODELS (app/period/auxiliary_funcs.py),
+    max_points: longer LCs are binned to this resolution over the whole time span (see bin_lc),
+    time_budget: seconds of find_period, after them the best of the tested periods is the result, -1 if none was tested
+                 (None - no limit). Budget is checked between steps of find_period, so without binning
+                 (max_points None) a single step on a long LC can still take longer
+    """
     if detrend:
         mag = remove_trend(mag, order=3)
     if len(mag) < 100:
         return -1
 
-    # for very long LCs - make it shorter. Otherwise, it takes to long to process
-    if len(mag) > 2000:
-        d = {'date': date_time[:2000], 'value': mag[:2000] * -1}
-    else:
-        d = {'date': date_time, 'value': mag * -1}
+    # long LCs take too long to process: analyse the whole LC in bins
+    date_time, mag = bin_lc(to_epoch(date_time), mag, max_points)
+    if len(mag) < 100:
+        return -1
+    d = {'date': pd.to_datetime(date_time, unit='s'), 'value': mag * -1}
 
     df = pd.DataFrame(data=d)
 
@@ -906,6 +681,8 @@ def detect_period(date_time, mag, detrend=False):
                       minimum_ratio_of_datapoints_for_shift_autocorrelation=0.003,
                       consider_only_significant_correlation=False,
                       level_of_significance_for_pearson=1e-7,
+                      model=model,
+                      time_budget=time_budget,
                       )
     # print(res[0]*60, res[-1] > 0.3)
     if res[-1] > 0.3:
@@ -925,37 +702,17 @@ def lsp_plot_bokeh(lc_id, return_lc=False, return_period=False):
     Returns: Bokeh html plot of LSP Periodogram
              Optionally return also LC and Period value
     """
-    lc = Lightcurve.get_by_id(id=lc_id)
-    lctime = lc.date_time
-    lctime = [x.timestamp() for x in lctime]
+    lc = Lightcurve.get_by_id(id=lc_id)  # arrays are loaded only if periodogram is not stored
 
     # if detrend:
     #     lc.mag = remove_trend(lc.mag, order=2)
 
-    if lc.dt < 1:
-        max_freq = 0.83 #/ (2 * lc.dt)
-    else:
-        max_freq = 1 / (2 * lc.dt)
-
-    min_freq = 1 / ((lctime[-1] - lctime[0]) / 2)
+    periodogram = get_periodogram(lc)
+    power = periodogram.power
+    periods = 1.0 / periodogram.frequency
 
-    if lc.mag_err is not None:
-        ls = LombScargle(lctime, lc.mag, lc.mag_err)
-    else:
-        ls = LombScargle(lctime, lc.mag)
-
-    frequency, power = ls.autopower(
-        # nyquist_factor=0.5,
-        minimum_frequency=min_freq,
-        maximum_frequency=max_freq,
-        samples_per_peak=50,
-        normalization='standard')
-
-    periods = 1.0 / frequency
-
-    probabilities = [0.0001]
-    fap = ls.false_alarm_level(probabilities)
-    peaks, _ = find_peaks(power, height=fap[0])
+    fap = [periodogram.fap_level]
+    peaks = periodogram.peak_index
     # print(fap)
     # print(periods)
 
@@ -1051,7 +808,8 @@ def plot_phased_lc(lc, period):
     if period is None:
         return None
     else:
-        t = [x.timestamp() for x in lc.date_time]
+        t = lc.date_time
+        epoch = lc.ut_times[0].astype(datetime)
         mag_norm = norm_lc(lc.mag)
         mag_norm = remove_trend(mag_norm, order=3)
         phase1 = get_phases(t, t[0], period)
@@ -1068,9 +826,9 @@ def plot_phased_lc(lc, period):
 
         # PLOT
         tools = 'pan,wheel_zoom,box_zoom,reset,save'
-        # title = f"Phased LC with \nPeriod={period:.3f} sec and Epoch={lc.date_time[0]}",
+        # title = f"Phased LC with \nPeriod={period:.3f} sec and Epoch={epoch}",
         plot = figure(plot_height=400, plot_width=800, min_border=10, tools=tools)
-        plot.add_layout(Title(text=f"Period={period:.3f} sec and Epoch={lc.date_time[0]}",
+        plot.add_layout(Title(text=f"Period={period:.3f} sec and Epoch={epoch}",
                                align='center'), 'above')
         if len(mag_norm) < 100:
             plot.add_layout(Title(text="Phased LC with Defined Period. N_points < 100, no DPM method",
@@ -1092,7 +850,7 @@ def plot_phased_lc(lc, period):
             # Second plot with Period +/- 3P
             plot2 = figure(plot_height=400, plot_width=800, min_border=10, tools=tools)
 
-            plot2.add_layout(Title(text=f"Period={period2:.3f} sec and Epoch={lc.date_time[0]}",
+            plot2.add_layout(Title(text=f"Period={period2:.3f} sec and Epoch={epoch}",
                                    align='center'), 'above')
             plot2.add_layout(Title(text=r"Phased LC with Period defined by PDM method (in borders +/- 3*P_lsp)",
                                    text_font_size="12pt", align='center'), 'above')
@@ -1112,7 +870,8 @@ def plot_lc(lc_id):
              "V": "g",
              "R": "r",
              "C": "k"}
-    lc = Lightcurve.get_by_id(id=lc_id)
+    lc = Lightcurve.get_by_id(id=lc_id, arrays=True)
+    lc_dt = lc.ut_times.astype(datetime)
 
     plt.gcf()
     plt.clf()
@@ -1123,16 +882,16 @@ def plot_lc(lc_id):
 
     # fig im MAG
     plt.rcParams['figure.figsize'] = [12, 6]
-    dm = max(lc.mag) - min(lc.mag)
-    dm = dm * 0.1
-    plt.axis([min(lc.date_time), max(lc.date_time), max(lc.mag) + dm, min(lc.mag) - dm])
-    # ax.set_xlim([min(lc.date_time), max(lc.date_time)])
+    mag_min, mag_max, _ = lc_mag_limits(lc)
+    dm = (mag_max - mag_min) * 0.1
+    plt.axis([lc_dt[0], lc_dt[-1], mag_max + dm, mag_min - dm])
+    # ax.set_xlim([min(lc_dt), max(lc_dt)])
     # ax.set_ylim([max(lc.mag) + dm, min(lc.mag) - dm])
 
     if lc.mag_err is None:
-        plt.plot(lc.date_time, lc.mag, f"x{color[lc.band]}-", linewidth=0.5, fillstyle="none", markersize=3)
+        plt.plot(lc_dt, lc.mag, f"x{color[lc.band]}-", linewidth=0.5, fillstyle="none", markersize=3)
     else:
-        plt.errorbar(lc.date_time, lc.mag, yerr=lc.mag_err, fmt=f"x{color[lc.band]}-",
+        plt.errorbar(lc_dt, lc.mag, yerr=lc.mag_err, fmt=f"x{color[lc.band]}-",
                      capsize=2, linewidth=0.5, fillstyle="none",
                      markersize=3, ecolor="k")
     # plt
@@ -1148,8 +907,8 @@ def plot_lc(lc_id):
     ax2 = ax.twiny()
     ax2.set_xlim(ax.get_xlim())
     numElems = 6
-    tt_idx = np.round(np.linspace(0, len(lc.date_time) - 1, numElems)).astype(int)
-    Tt2 = np.array(lc.date_time)
+    tt_idx = np.round(np.linspace(0, len(lc_dt) - 1, numElems)).astype(int)
+    Tt2 = np.array(lc_dt)
     Az2 = np.array(lc.az)
     El2 = np.array(lc.el)
 
@@ -1194,16 +953,14 @@ def plot_lc(lc_id):
 
 def calc_period_for_all_lc():
     """
-    Patch Period value if it is None or not calculated at all
-    Returns: Nothing. Patches all periods for all LCs
+    Recalculate Periods (and periodograms) of all LCs: every analysed LC is queued again
+    and analysed by analyse_pending (app/jobs.py) with period options of app config
+    Returns: list of (LC id, analysis status)
     """
-    lcs = Lightcurve.get_all()
-    print("LCs collected. Processing...")
-    for lc in lcs:
-        print(lc.id)
-        if lc.id > 0: # use to define start point
-            det_p = lc.detect_period()
-            lc.calc_period(detected_period=det_p)
+    from app.jobs import analyse_pending
+
+    current_app.logger.info(f"{Lightcurve.queue_analysis_all()} LC(s) queued for period analysis")
+    return analyse_pending()
 
 
 def calc_sat_updated_for_all_sat():
@@ -1211,13 +968,15 @@ def calc_sat_updated_for_all_sat():
     Patch Updated value for all satellites
     Returns: last LC datetime
     """
+    Satellite.rebuild_lc_stats()
     sats = Satellite.get_all()
     for sat in sats:
-        sat.update_updated()
+        sat.updated = sat.last_lc_time
+    db.session.commit()
 
 
 def lc_to_file(lc_id):
-    lc = Lightcurve.get_by_id(lc_id)
+    lc = Lightcurve.get_by_id(lc_id, arrays=True)
 
     lat, lon, elev = None, None, None
     users = User.get_all()
@@ -1249,11 +1008,14 @@ def lc_to_file(lc_id):
 
     xy_txt = "    000.00000  000.00000   0.00000   0.00000        "
 
+    # 'YYYY-MM-DDTHH:MM:SS.mmm' -> 'YYYY-MM-DD HH:MM:SS.mmm'
+    lc_dates = np.char.replace(np.datetime_as_string(lc.ut_times, unit='ms'), 'T', ' ')
+
     if lc.mag_err is not None:
         # phX format
         for (date_time, flux, flux_err, mag, mag_err, az, el, rg) in (
-                zip(lc.date_time, lc.flux, lc.flux_err, lc.mag, lc.mag_err, lc.az, lc.el, lc.rg)):
-            txt += f"{date_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}{xy_txt}{flux:10.4f}  {flux_err:8.4f}"
+                zip(lc_dates, lc.flux, lc.flux_err, lc.mag, lc.mag_err, lc.az, lc.el, lc.rg)):
+            txt += f"{date_time}{xy_txt}{flux:10.4f}  {flux_err:8.4f}"
             txt += f"   {mag:6.3f}  {mag_err:6.3f}    {az:8.3f} {el:8.3f}   {rg:8.3f}   filename.fits\n"
             # fr.write(f"{'{:13.4f}'.format(flux)}  {'{:8.4f}'.format(flux_err)}   {mag:6.3f}  {mag_err:6.3f}    ")
             # fr.write(f"{Az:8.3f} {El:8.3f}   {Rg:8.3f}   {fit_file}\n")
@@ -1262,8 +1024,8 @@ def lc_to_file(lc_id):
         flux_err = 0.0
         mag_err = 0.0
         for (date_time, flux, mag, az, el, rg) in (
-                zip(lc.date_time, lc.flux, lc.mag, lc.az, lc.el, lc.rg)):
-            txt += f"{date_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}{xy_txt}{flux:10.4f}  {flux_err:8.4f}"
+                zip(lc_dates, lc.flux, lc.mag, lc.az, lc.el, lc.rg)):
+            txt += f"{date_time}{xy_txt}{flux:10.4f}  {flux_err:8.4f}"
             txt += f"   {mag:6.3f}  {mag_err:6.3f}    {az:8.3f} {el:8.3f}   {rg:8.3f}   filename.fits\n"
 
     proxy = io.StringIO(txt)
@@ -4,6 +4,7 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from flask import send_file
 from flask_login import login_required, current_user
 from flask_wtf import FlaskForm
+from werkzeug.exceptions import RequestEntityTooLarge
 from pycparser.c_ast import Default
 from wtforms import StringField, MultipleFileField, SubmitField, RadioField, IntegerField
 from wtforms.fields.numeric import DecimalField, FloatField
@@ -11,12 +12,14 @@ from wtforms.validators import Length, DataRequired
 import datetime
 
 from app import cache
+from app.ingest import ERROR, SKIPPED, ArchiveError
+from app.jobs import submit_ingest_job
 from app.models import Satellite, db, Lightcurve
-from app.sat_utils import plot_lc_bokeh, process_lc_file, lsp_plot_bokeh, plot_lc_multi_bokeh, plot_phased_lc, \
+from app.sat_utils import plot_lc_bokeh, lsp_plot_bokeh, plot_lc_multi_bokeh, plot_phased_lc, \
     lc_to_file, plot_periods_bokeh
 
 # FOR PATCH case
-from app.sat_utils import lsp_calc, calc_period_for_all_lc, calc_sat_updated_for_all_sat
+from app.sat_utils import calc_period_for_all_lc, calc_sat_updated_for_all_sat
 
 sat_bp = Blueprint('sat', __name__)
 basedir = os.path.abspath(os.path.dirname(__file__))
@@ -50,6 +53,14 @@ def generate_report(date_from, date_to):
     return text
 
 
+@sat_bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(e):
+    limit = current_app.config['MAX_CONTENT_LENGTH'] / 1024 / 1024
+    current_app.logger.error(f'Upload is rejected: request is bigger than {limit:.0f} MB')
+    flash(f"Upload is too big (max {limit:.0f} MB). Please split files into several uploads", 'error')
+    return redirect(url_for("sat.sat_phot"))
+
+
 @sat_bp.route('/sat_phot.html', methods=['GET', 'POST'])
 @login_required
 def sat_phot():
@@ -74,33 +85,30 @@ def sat_phot():
                                    sats=Satellite.get_all(),
                                    lc_form=lc_form,
                                    report_form=report_form,
+                                   job_id=request.args.get("job", type=int),
                                    user=current_user)
         else:  # POST
             current_app.logger.info(f'POST request in sat_phot()...')
             if lc_form.validate_on_submit() and lc_form.add.data:
                 # print(lc_form.lc_file.data, end="  ")
                 current_app.logger.info(f'Form Valid. Checking files in {lc_form.lc_file.data}')
-                for file in lc_form.lc_file.data:
-                    file_ext = os.path.splitext(file.filename)
-                    file_ext = file_ext[1]
-                    if len(file_ext) > 2:
-                        file_ext = file_ext[:3]
-                    current_app.logger.info(f'Checking file {file.filename} has allowed extension ...')
-                    if file_ext in current_app.config['UPLOAD_EXTENSIONS']:
-                        current_app.logger.info(f'Processing file {file.filename}...')
-                        _, fext = os.path.splitext(file.filename)
-                        process_res = process_lc_file(file=file, file_ext=fext, db=db, app=current_app)
-                        if process_res:
-                            current_app.logger.info(f'File {file.filename} successfully processed')
-                        else:
-                            current_app.logger.warning(f"""File {file.filename} processed with error. 
-                            Skipping this file....""")
-                            flash(f"File {file.filename} processed with error", 'error')
+                # files are parsed, stored and analysed by background worker (see app/jobs.py)
+                try:
+                    job = submit_ingest_job(lc_form.lc_file.data, user_id=current_user.id)
+                except ArchiveError as e:
+                    current_app.logger.error(f'Upload is not queued. Error: {e}')
+                    flash(str(e), 'error')
+                    return redirect(url_for("sat.sat_phot"))
+                if not job.is_finished:
+                    flash(f"{job.n_files} file(s) queued for processing (job {job.id})", 'info')
+                    return redirect(url_for("sat.sat_phot", job=job.id))
+                for res in job.files:
+                    if res.status == ERROR:
+                        flash(f"File {res.file_name} processed with error", 'error')
+                    elif res.status == SKIPPED:
+                        flash(f"Wrong file ext in {res.file_name}", 'info')
                     else:
-                        current_app.logger.warning(f'''Wrong file ext in {file.filename}.
-                                                   Skipping this file....''')
-                        flash(f"Wrong file ext in {file.filename}", 'info')
-                cache.clear()
+                        flash(f"File {res.file_name}: {res.message}", 'info')
                 return redirect(url_for("sat.sat_phot"))
 
             if report_form.validate_on_submit():
@@ -187,7 +195,7 @@ def sat_lc_period_plot(lc_id):
         if per_form.validate_on_submit() and per_form.add.data:
             # update period
             new_per = per_form.per_input.data
-            lc.lsp_period = float(new_per)
+            lc.set_period(float(new_per))
             # db.session.merge(lc)
             db.session.commit()
 
@@ -236,7 +244,9 @@ def get_sat_query(s_value, r_start, r_length, r_form):
             break
         # col_name = request.form.get(f'columns[{col_index}][data]')
         col_name = r_form.get(f'columns[{col_index}][data]')
-        if col_name not in ['cospar', 'name', 'updated']:
+        if col_name == 'LC':
+            col_name = 'lc_count'
+        if col_name not in ['cospar', 'name', 'updated', 'lc_count']:
             col_name = 'norad'
         # descending = request.form.get(f'order[{i}][dir]') == 'desc'
         descending = r_form.get(f'order[{i}][dir]') == 'desc'
@@ -283,7 +293,7 @@ def ajax_file_sat():
                 'norad': '<a href=' + url_for('sat.sat_details', sat_id=sat.id) + '>' + str(sat.norad) + '</a>',
                 'cospar': sat.cospar,
                 'name': sat.name,
-                'LC': sat.count_lcs(),
+                'LC': sat.lc_count,
                 'updated': sat.updated.strftime('%Y-%m-%d %H:%M'),
                 'n2yo': '<a href=' + "https://www.n2yo.com/satellite/?s=" + str(sat.norad) + '> link </a>',
             } for sat in sats]
@@ -375,15 +385,26 @@ def ajax_file_lc(sat_id):
                 dl_img += ' alt="HTML tutorial" style="width:20px;height:13px;">'
                 # dl_img += ' alt="HTML tutorial" style="width:15px;height:2px;">'
 
-                if lc.lsp_period is None:
+                if lc.analysis_status != Lightcurve.DONE:
+                    period = lc.analysis_status  # pending, running or failed
+                elif lc.lsp_period is None:
                     period = "Aperiodic"
                 else:
                     period = lc.lsp_period
 
-                minutes = len(lc.flux) * lc.dt
-                min_sec = f"{int(minutes):>3d}"  # seconds
+                # n_points and LC statistics are set at ingest, arrays are not loaded
+                if lc.n_points is not None:
+                    minutes = lc.n_points * lc.dt
+                    min_sec = f"{int(minutes):>3d}"  # seconds
+                else:
+                    min_sec = "-"
+                # amplitude is None if LC has no finite mag (see calc_lc_stats)
+                if lc.stats is not None and lc.stats.amplitude is not None:
+                    amplitude = "%5.2f" % lc.stats.amplitude
+                else:
+                    amplitude = "-"
 
-                # minutes = ((len(lc.flux) * lc.dt) / 60.0)
+                # minutes = ((lc.n_points * lc.dt) / 60.0)
                 # m1, m2 = divmod(minutes, 1)
                 # m2 = m2 * 60.
                 # if m2 < 10:
@@ -398,6 +419,7 @@ def ajax_file_lc(sat_id):
                     'filter': lc.band,
                     'dt': "%5.3f" % lc.dt,
                     'N': min_sec,
+                    'amp': amplitude,
                     'curve': '<a href=' + txt + ' title="Plot">' + "LC" + '</a>',
                     'period': period,
                     'lsp': '<a href=' + txt_lsp + ' title="Periodogram">' + "LSP" + '</a>',
@@ -438,7 +460,7 @@ def ajax_multi_lc_check():
 
 
 class AddLcForm(FlaskForm):
-    lc_file = MultipleFileField('File(s) Upload')
+    lc_file = MultipleFileField('File(s) Upload')  # LC files and/or archives (.zip, .tar.gz) of them
     add = SubmitField("Submit")
 
 
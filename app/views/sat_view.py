@@ -29,7 +29,7 @@ from io import BytesIO
 
 from app import cache
 from app.models import Satellite, db, Lightcurve, SatForView, User
-from app.sat_utils import plot_lc_bokeh, process_lc_file, lsp_plot_bokeh, plot_lc_multi_bokeh, plot_phased_lc, \
+from app.sat_utils import plot_lc_bokeh, lsp_plot_bokeh, plot_lc_multi_bokeh, plot_phased_lc, \
     lc_to_file, plot_periods_bokeh
 
 sat_view_bp = Blueprint('sat_view', __name__)
@@ -0,0 +1,98 @@
+"""
+Ingest scaling: parsing (app/ingest.py) and period analysis (analyse_pending, app/jobs.py)
+in 1..N worker processes.
+
+A night of observations is made from files of tests/lc_to_upload (or --dir):
+every file is copied --copies times with other NORAD ids, so all LCs are new.
+Each run ingests the whole night into an empty temporary SQLite DB and checks
+that periods are the same as in the serial run.
+
+Usage:
+    python benchmarks/bench_ingest_parallel.py [--dir tests/lc_to_upload] [--copies 4] [--processes 1 2 4]
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("CONFIG_TYPE", "app.config.TestConfig")
+
+NORAD_LINE = re.compile(rb"^(NORAD ID=|# NORAD  = )(\d+)", re.MULTILINE)
+
+
+def make_night(folder, copies):
+    """
+    List of (file name, bytes), copy k of file gets NORAD 90000 + 100 * k + (number of file)
+    """
+    night = []
+    names = sorted(f for f in os.listdir(folder) if os.path.splitext(f)[1][:3] == ".ph")
+    for k in range(copies):
+        for i, name in enumerate(names):
+            with open(os.path.join(folder, name), "rb") as f:
+                content = f.read()
+            norad = 90000 + 100 * k + i
+            content = NORAD_LINE.sub(lambda m: m.group(1) + str(norad).encode(), content)
+            night.append((f"{norad}_{name}", content))
+    return night
+
+
+def run(night, processes):
+    """
+    Ingest night into new DB. Returns: seconds, {(norad, band, ut_start): lsp_period}
+    """
+    from werkzeug.datastructures import FileStorage
+    from app import create_app
+    from app.models import db, Lightcurve
+    from app.ingest import ingest_files
+    from app.jobs import analyse_pending
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app()
+        app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(tmp, "bench.db")
+        with app.app_context():
+            db.create_all()
+            files = [FileStorage(stream=io.BytesIO(content), filename=name) for name, content in night]
+            t0 = time.perf_counter()
+            report = ingest_files(files, processes=processes)
+            analysed = analyse_pending(processes=processes)
+            elapsed = time.perf_counter() - t0
+            errors = [r for r in report if r["status"] == "error"]
+            errors += [lc_id for lc_id, status in analysed if status != Lightcurve.DONE]
+            if errors:
+                raise RuntimeError(f"Ingest errors: {errors}")
+            periods = {(lc.sat.norad, lc.band, lc.ut_start): lc.lsp_period for lc in Lightcurve.get_all()}
+            db.session.remove()
+            db.engine.dispose()
+    return elapsed, periods
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--dir", default="tests/lc_to_upload", help="folder with .ph* and .phc files")
+    argp.add_argument("--copies", type=int, default=4, help="copies of every file in the night")
+    argp.add_argument("--processes", type=int, nargs="*", default=None,
+                      help="numbers of worker processes (default 1, 2, 4, ... up to number of cores)")
+    args = argp.parse_args()
+
+    cores = os.cpu_count() or 1
+    processes = args.processes or sorted({1, cores} | {2 ** k for k in range(1, 8) if 2 ** k < cores})
+    night = make_night(args.dir, args.copies)
+    size = sum(len(content) for _, content in night)
+    print(f"night: {len(night)} files, {size / 1e6:.2f} MB, {cores} cores")
+    print(f"{'processes':>9} {'time, s':>9} {'files/s':>8} {'speedup':>8} {'same periods':>13}")
+
+    base_time, base_periods = None, None
+    for p in processes:
+        elapsed, periods = run(night, p)
+        if base_time is None:
+            base_time, base_periods = elapsed, periods
+        print(f"{p:9d} {elapsed:9.2f} {len(night) / elapsed:8.2f} {base_time / elapsed:8.2f} "
+              f"{str(periods == base_periods):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+LC payload codec benchmark: size, encode and decode throughput.
+
+Data: LCs from tests/lc_to_upload (or --dir) and synthetic long LCs
+(cadence dt with ms jitter, smooth magnitudes with noise, 3 decimals as in .ph files).
+Codecs: raw float64 blob and encode_array without compression, with zlib / lzma, with and without float32.
+
+Usage:
+    python benchmarks/bench_lc_codec.py [--dir tests/lc_to_upload] [--synthetic 20000 200000] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.lc_storage import pack_array, unpack_array, encode_array, decode_array  # noqa: E402
+
+CODECS = {
+    "float64": (pack_array, unpack_array),
+    "none": (lambda a: encode_array(a, compression="none", max_error=None), decode_array),
+    "zlib": (lambda a: encode_array(a, compression="zlib", max_error=None), decode_array),
+    "zlib+f32": (lambda a: encode_array(a, compression="zlib", max_error=5e-4), decode_array),
+    "lzma": (lambda a: encode_array(a, compression="lzma", max_error=None), decode_array),
+    "lzma+f32": (lambda a: encode_array(a, compression="lzma", max_error=5e-4), decode_array),
+}
+
+
+def read_ph(path):
+    """
+    Arrays of .ph* file (UT or JD time), columns are counted from the end of line
+    """
+    rows = [line.split() for line in open(path) if line.strip() and not line.startswith("#")]
+    if len(rows[0]) == 13:  # JD
+        t = (np.array([float(r[0]) for r in rows]) - 2440587.5) * 86400
+    else:
+        t = np.array([f"{r[0]}T{r[1]}" for r in rows], dtype="datetime64[us]")
+        t = (t - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+    cols = np.array([r[-8:-1] for r in rows], dtype=float)
+    names = ("flux", "flux_err", "mag", "mag_err", "az", "el", "rg")
+    return {"date_time": t, **{name: cols[:, i] for i, name in enumerate(names)}}
+
+
+def read_phc(path):
+    """
+    Arrays of .phc file (both bands)
+    """
+    lines = open(path).read().splitlines()
+    day = lines[0].split()[0]
+    rows = [line.split() for line in lines[7:] if line.strip()]
+    t = np.array([f"{day}T{r[0]}" for r in rows], dtype="datetime64[us]")
+    t = (t - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+    t = np.where(t < t[0], t + 86400, t)  # day rollover
+    cols = np.array([r[1:10] for r in rows], dtype=float)
+    names = ("flux_b", "flux_v", "fon_b", "fon_v", "mag_b", "mag_v", "az", "el", "rg")
+    return {"date_time": t, **{name: cols[:, i] for i, name in enumerate(names)}}
+
+
+def synthetic_lc(n, dt=0.1, seed=0):
+    rng = np.random.default_rng(seed)
+    t0 = (np.datetime64(datetime(2025, 1, 30, 17, 36, 50)) - np.datetime64("1970-01-01")) / np.timedelta64(1, "s")
+    t = np.round(t0 + np.arange(n) * dt + rng.integers(0, 3, n) * 1e-3, 3)
+    x = np.arange(n) * dt
+    mag = np.round(7 + 0.8 * np.sin(2 * np.pi * x / 37.) + rng.normal(0, 0.05, n), 3)
+    mag_err = np.round(np.abs(rng.normal(0.012, 0.003, n)), 3)
+    flux = np.round(10 ** (-0.4 * (mag - 16)), 4)
+    az = np.round(249 + x * 0.02, 3)
+    el = np.round(18.5 + x * 0.004, 3)
+    rg = np.round(2091 - x * 2.0, 3)
+    return {"date_time": t, "flux": flux, "mag": mag, "mag_err": mag_err, "az": az, "el": el, "rg": rg}
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(name, lc, repeat):
+    arrays = list(lc.values())
+    raw_size = sum(a.nbytes for a in arrays)
+    n = len(lc["date_time"])
+    print(f"\n{name}: {n} points, {len(arrays)} arrays, {raw_size / 1e6:.3f} MB")
+    print(f"{'codec':10} {'bytes':>10} {'ratio':>7} {'enc MB/s':>10} {'dec MB/s':>10} {'max err':>9}")
+    for codec, (encode, decode) in CODECS.items():
+        blobs = [encode(a) for a in arrays]
+        size = sum(len(b) for b in blobs)
+        t_enc = best_time(lambda: [encode(a) for a in arrays], repeat)
+        t_dec = best_time(lambda: [decode(b) for b in blobs], repeat)
+        err = max(float(np.max(np.abs(decode(b) - a), initial=0)) for a, b in zip(arrays, blobs))
+        print(f"{codec:10} {size:10d} {raw_size / size:7.2f} {raw_size / t_enc / 1e6:10.1f} "
+              f"{raw_size / t_dec / 1e6:10.1f} {err:9.2g}")
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--dir", default="tests/lc_to_upload", help="folder with .ph* and .phc files")
+    argp.add_argument("--synthetic", type=int, nargs="*", default=[20000, 200000],
+                      help="number of points of synthetic LCs")
+    argp.add_argument("--repeat", type=int, default=5, help="repeats, best time is reported")
+    args = argp.parse_args()
+
+    for fname in sorted(os.listdir(args.dir)):
+        path = os.path.join(args.dir, fname)
+        ext = os.path.splitext(fname)[1].lower()
+        if ext == ".phc":
+            bench(fname, read_phc(path), args.repeat)
+        elif ext.startswith(".ph"):
+            bench(fname, read_ph(path), args.repeat)
+    for n in args.synthetic:
+        bench(f"synthetic {n}", synthetic_lc(n), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
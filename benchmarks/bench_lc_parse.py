@@ -0,0 +1,241 @@
+"""
+LC file parse throughput: one-pass parser (app.lc_parser) vs the old multi-pass parser.
+
+Data: files from tests/lc_to_upload (or --dir) and synthetic .phV files
+of --synthetic points (UT format with mag_err), written to a temporary folder.
+
+Usage:
+    python benchmarks/bench_lc_parse.py [--dir tests/lc_to_upload] [--synthetic 20000 200000] [--repeat 5]
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from astropy.time import Time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.lc_parser import parse_lc_file  # noqa: E402
+
+PH_HEADER = """# TLE:
+# 0 COSMOS 2540
+# 1 44517U 19057A   25029.57053304  .00000050  00000-0  81985-4 0  9998
+# 2 44517  99.2328  44.2251 0016558  67.2163 293.0740 13.85936593274116
+# 2025-01-30 17:36:50.8077710
+# 2025-01-30 18:20:00.0000000
+# dt = 0.1
+# Filter = V
+# COSPAR = 19057A
+# NORAD  = 44517
+# NAME   = COSMOS 2540
+# SITE_NAME   = Derenivka
+#  Date       UT              X          Y         Xerr      Yerr             Flux     Flux_err     magV  mag_err     Az(deg)   El(deg)   Rg(Km)    filename
+"""
+
+
+def legacy_parse_lc_file(file_content, file_ext):
+    """
+    Multi-pass parser (header loop + loadtxt/genfromtxt per column group), as it was in app/sat_utils.py
+    Args:
+        file_content: bytes of file
+        file_ext: file extension (".phc", ".phV", ...)
+    Returns:
+        dict {"norad", "name", "cospar", "lcs": [kwargs of add_lc without db and sat_id, ...]}
+    Raises exception if file has bad format
+    """
+    if file_ext == ".phc":
+        with io.StringIO(file_content.decode("UTF-8")) as fs:
+            sat_st = fs.readline().strip("\n").strip("\r")
+            sat_st_date = sat_st.split()[0]
+            sat_end = fs.readline().strip("\n").strip("\r")
+            for line in fs:
+                # line = line.decode("UTF-8")
+                if line[:9] == "COSPAR ID":
+                    cospar = line.split("=")[1].strip().strip("\n").strip("\r")
+                if line[:8] == "NORAD ID":
+                    norad = int(line.split("=")[1].strip())
+                if line[:4] == "NAME":
+                    name = line.split("=")[1].strip().strip("\n").strip("\r")
+                    if name[:2] == "0 ":
+                        name = name[2:]  # delete leading zero in TLE name line
+                if line[:2] == "dt":
+                    dt = line.split("=")[1].strip().strip("\n").strip("\r")
+            fs.seek(0)
+            # leave LOADTXT here, because format has no '#' comments. Only hardcode skiprows will work
+            impB, impV, fonB, fonV, mB, mV, az, el, rg = \
+                np.loadtxt(fs, unpack=True, skiprows=7,
+                           usecols=(1, 2, 3, 4, 5, 6, 7, 8, 9)
+                           )
+            fs.seek(0)
+            lctime = np.loadtxt(fs, unpack=True, skiprows=7, usecols=(0,),
+                                dtype={'names': ('time',), 'formats': ('S15',)})
+
+            lctime = [
+                datetime.strptime(sat_st_date + " " + x.decode('UTF-8'), "%Y-%m-%d %H:%M:%S.%f")
+                for x in lctime[0]]  # lctime is array in list, so we need lctime[0]
+            t0 = lctime[0]
+            lctime = [x if t0 - x < timedelta(hours=2) else x + timedelta(days=1) for x in
+                      lctime]  # add DAY after 00:00:00
+
+            common = dict(lc_st=sat_st, lc_end=sat_end, dt=dt, lctime=lctime,
+                          az=az, el=el, rg=rg, site="Uzhhorod")
+            return {"norad": norad, "name": name, "cospar": cospar,
+                    "lcs": [dict(band="B", flux=impB, mag=mB, **common),
+                            dict(band="V", flux=impV, mag=mV, **common)]}
+
+    elif file_ext[:3] == ".ph":  # .phX where X is [B, V, R, C or others!]
+        with io.StringIO(file_content.decode("UTF-8")) as fs:
+            fs.readline()
+            # fs.readline()
+            # fs.readline()
+            # fs.readline()
+            tle = fs.readline()[2:] + fs.readline()[2:] + fs.readline()[2:]
+
+            sat_st = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
+            # sat_st_date = sat_st.split()[0]
+
+            sat_end = fs.readline().strip("\n").strip("\r")[2:].strip()[:-1]
+
+            # Default values
+            site_name = "Derenivka"
+            filt = file_ext[3:]  # Get filter from file extension if not available in header
+
+            # Check header
+            for line in fs:
+                l = line.split(" = ")
+                if l[0] == "# COSPAR":
+                    cospar = l[1].strip("\n").strip("\r")
+                if l[0] == "# NORAD ":
+                    norad = int(l[1])
+                if l[0] == "# NAME  ":
+                    name = l[1].strip("\n").strip("\r")
+                    if name[:2] == "0 ":
+                        name = name[2:]  # delete leading zero in TLE name line
+                if l[0] == "# dt":
+                    dt = l[1].strip("\n").strip("\r")
+                if l[0] == "# SITE_NAME  ":
+                    site_name = l[1].strip("\n").strip("\r")
+                if l[0] == "# Filter":
+                    filt = l[1].strip("\n").strip("\r")
+            fs.seek(0)
+
+            cols = np.genfromtxt(fs, skip_header=True, unpack=True)
+            # print(len(cols))
+            fs.seek(0)
+
+            try:  # ##################################
+
+                fs.seek(0)
+
+                if len(cols) == 14: # UT format
+                    flux, flux_err, m, merr, az, el, rg = np.genfromtxt(fs, skip_header=True,
+                                                                        usecols=(6, 7, 8, 9, 10, 11, 12,),
+                                                                        unpack=True)
+                    fs.seek(0)
+                    lcd, lct = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0, 1,),
+                                           dtype=None, encoding="utf-8")
+                    lctime = list(zip(lcd, lct))
+                    lctime = [x[0] + " " + x[1] for x in lctime]
+                    lctime = [datetime.strptime(x, "%Y-%m-%d %H:%M:%S.%f") for x in lctime]
+
+                elif len(cols) == 13: # JD format
+                    flux, flux_err, m, merr, az, el, rg = np.genfromtxt(fs, skip_header=True,
+                                                                        usecols=(5, 6, 7, 8, 9, 10, 11,),
+                                                                        unpack=True)
+                    fs.seek(0)
+                    lc_jd = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0,),
+                                             dtype=None, encoding="utf-8")
+                    lctime = Time(lc_jd, format='jd', scale='utc').datetime
+
+            except IndexError:  # no merr
+                fs.seek(0)
+                flux, flux_err, m, az, el, rg = np.genfromtxt(fs, skip_header=True,
+                                                              usecols=(5, 6, 7, 8, 9, 10,),
+                                                              unpack=True)
+                # flux, flux_err, m, az, el, rg = np.loadtxt(fs, unpack=True, skiprows=11,
+                #                                            usecols=(5, 6, 7, 8, 9, 10))
+                fs.seek(0)
+                lcd, lct = np.genfromtxt(fs, skip_header=True, unpack=True, usecols=(0, 1,),
+                                         dtype=None, encoding="utf-8")
+                # lctime = [x + " " + t for x in lcd for t in lct]
+                lctime = list(zip(lcd, lct))
+                lctime = [x[0] + " " + x[1] for x in lctime]
+                lctime = [datetime.strptime(x, "%Y-%m-%d %H:%M:%S.%f") for x in lctime]
+                merr = None
+
+            return {"norad": norad, "name": name, "cospar": cospar,
+                    "lcs": [dict(band=filt, lc_st=sat_st, lc_end=sat_end,
+                                 dt=dt, tle=tle, lctime=lctime,
+                                 flux=flux, flux_err=flux_err,
+                                 mag=m, mag_err=merr,
+                                 az=az, el=el, rg=rg,
+                                 site=site_name)]}
+
+    raise ValueError(f"Unknown LC file extension '{file_ext}'")
+
+
+def synthetic_ph(n, dt=0.1, seed=0):
+    """
+    Text of .phV file (UT format with mag_err) of n points
+    """
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2025, 1, 30, 17, 36, 50)
+    x = np.arange(n) * dt
+    mag = 7 + 0.8 * np.sin(2 * np.pi * x / 37.) + rng.normal(0, 0.05, n)
+    lines = [PH_HEADER]
+    for i in range(n):
+        t = t0 + timedelta(seconds=float(x[i]))
+        lines.append(f"{t:%Y-%m-%d %H:%M:%S.%f}"[:-3] +
+                     f"  {202.139:10.5f}  {422.574:10.5f}  {0.116:8.5f}  {0.143:8.5f}  {10 ** (-0.4 * (mag[i] - 16)):10.3f}  {12.5:8.3f}"
+                     f"  {mag[i]:7.3f}  {0.012:6.3f}  {249 + x[i] * 0.02:8.3f}  {18.5 + x[i] * 0.004:7.3f}"
+                     f"  {2091 - x[i] * 2.0:9.3f}  img{i:06d}.fits\n")
+    return "".join(lines)
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench(name, content, file_ext, repeat):
+    n = sum(len(lc["mag"]) for lc in parse_lc_file(content, file_ext)["lcs"])
+    print(f"\n{name}: {len(content) / 1e6:.3f} MB, {n} points")
+    print(f"{'parser':10} {'time, s':>9} {'MB/s':>8} {'points/s':>11}")
+    for parser, func in (("one-pass", parse_lc_file), ("legacy", legacy_parse_lc_file)):
+        t = best_time(lambda: func(content, file_ext), repeat)
+        print(f"{parser:10} {t:9.4f} {len(content) / t / 1e6:8.2f} {n / t:11.0f}")
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--dir", default="tests/lc_to_upload", help="folder with .ph* and .phc files")
+    argp.add_argument("--synthetic", type=int, nargs="*", default=[20000, 200000],
+                      help="number of points of synthetic LCs")
+    argp.add_argument("--repeat", type=int, default=5, help="repeats, best time is reported")
+    args = argp.parse_args()
+
+    for fname in sorted(os.listdir(args.dir)):
+        file_ext = os.path.splitext(fname)[1]
+        if file_ext[:3] == ".ph":
+            with open(os.path.join(args.dir, fname), "rb") as f:
+                bench(fname, f.read(), file_ext, args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.synthetic:
+            path = os.path.join(tmp, f"synthetic_{n}.phV")
+            with open(path, "w") as f:
+                f.write(synthetic_ph(n))
+            with open(path, "rb") as f:
+                bench(f"synthetic {n}", f.read(), ".phV", args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Compare Lightcurve array storage: PickleType vs packed float64 blobs.
+
+Reads every LC of the archive, encodes its arrays both ways and measures
+row size and decoding (load) time.
+
+Usage:
+    python benchmarks/bench_lc_storage.py --db sqlite:///app/dev.db [--limit 500] [--repeat 5]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+
+import numpy as np
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.lc_storage import to_epoch, pack_array, unpack_array, decode_array, epoch_to_datetime64  # noqa: E402
+
+ARRAY_COLUMNS = ('date_time', 'flux', 'flux_err', 'mag', 'mag_err', 'az', 'el', 'rg')
+GEOMETRY_COLUMNS = ('date_time', 'az', 'el', 'rg')
+
+
+def read_archive(uri, limit=None):
+    """
+    Load arrays of all LCs. Works with both pickled (old) and binary (new) archives.
+    Return: list of dicts {column: np.ndarray (date_time as epoch seconds)}
+    """
+    engine = sa.create_engine(uri)
+    if sa.inspect(engine).has_table("observation_geometry"):
+        # time and geometry arrays are shared between bands
+        cols = ", ".join(f"g.{name}" if name in GEOMETRY_COLUMNS else f"lc.{name}" for name in ARRAY_COLUMNS)
+        query = f"SELECT {cols} FROM lightcurve lc JOIN observation_geometry g ON g.id = lc.geometry_id ORDER BY lc.id"
+    else:
+        cols = ", ".join(ARRAY_COLUMNS)
+        query = f"SELECT {cols} FROM lightcurve ORDER BY id"
+    if limit:
+        query += f" LIMIT {int(limit)}"
+    lcs = []
+    with engine.connect() as conn:
+        for row in conn.execute(sa.text(query)):
+            lc = {}
+            for name, value in zip(ARRAY_COLUMNS, row):
+                if value is None:
+                    continue
+                value = bytes(value)
+                try:
+                    data = pickle.loads(value)
+                except Exception:
+                    data = decode_array(value)
+                lc[name] = to_epoch(data) if name == 'date_time' else np.asarray(data, dtype=float)
+            lcs.append(lc)
+    return lcs
+
+
+def as_pickle(lc):
+    """ Rows as they were stored with PickleType """
+    res = {}
+    for name, arr in lc.items():
+        if name == 'date_time':
+            res[name] = pickle.dumps(list(epoch_to_datetime64(arr).astype(object)))
+        else:
+            res[name] = pickle.dumps(arr)
+    return res
+
+
+def as_blob(lc):
+    return {name: pack_array(arr) for name, arr in lc.items()}
+
+
+def time_decode(rows, decode, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for row in rows:
+            for value in row.values():
+                decode(value)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--db", default=os.getenv("DATABASE_URI", "sqlite:///app/dev.db"), help="archive DB URI")
+    argp.add_argument("--limit", type=int, default=None, help="use only first N LCs")
+    argp.add_argument("--repeat", type=int, default=5, help="repeats of decoding, best time is reported")
+    args = argp.parse_args()
+
+    lcs = read_archive(args.db, args.limit)
+    if not lcs:
+        print("No LCs in archive")
+        return
+    n_points = sum(len(lc['mag']) for lc in lcs)
+
+    pickled = [as_pickle(lc) for lc in lcs]
+    blobs = [as_blob(lc) for lc in lcs]
+
+    size_pickle = sum(len(v) for row in pickled for v in row.values())
+    size_blob = sum(len(v) for row in blobs for v in row.values())
+
+    t_pickle = time_decode(pickled, pickle.loads, args.repeat)
+    t_blob = time_decode(blobs, unpack_array, args.repeat)
+
+    print(f"LCs: {len(lcs)}, points: {n_points}")
+    print(f"{'format':10} {'bytes/row':>12} {'total MB':>10} {'load ms':>10} {'us/LC':>10}")
+    for name, size, t in (("pickle", size_pickle, t_pickle), ("float64", size_blob, t_blob)):
+        print(f"{name:10} {size / len(lcs):12.0f} {size / 1e6:10.2f} {t * 1e3:10.2f} {t / len(lcs) * 1e6:10.1f}")
+    print(f"size ratio: {size_pickle / size_blob:.2f}x, load speed-up: {t_pickle / t_blob:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
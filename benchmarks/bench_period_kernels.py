@@ -0,0 +1,72 @@
+"""
+Kernels of find_period (app/period/auxiliary_funcs.py): L1 differences of the autocorrelation
+function and its shifted versions (shift_diff per shift vs batched shift_diffs) and norms of
+shifted functions (sum_shifted_function vs sum_shifted_functions).
+
+Data: autocorrelation function of synthetic LC (sine with noise) of --sizes points,
+shifts as in detect_period (all but last 0.3 %). Per-shift functions are timed only up to
+--legacy-limit points (they are O(N^2) in Python).
+
+Usage:
+    python benchmarks/bench_period_kernels.py [--sizes 1000 2000 5000 20000] [--repeat 3] [--legacy-limit 5000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.period.auxiliary_funcs import autocor, shift_diff, shift_diffs, \
+    sum_shifted_function, sum_shifted_functions  # noqa: E402
+
+
+def corfunc_of(n, seed=0):
+    """
+    Autocorrelation function (n shifts) of LC of n + 100 points
+    """
+    rng = np.random.default_rng(seed)
+    x = np.sin(2 * np.pi * np.arange(n + 100) / 241.) + rng.normal(0, 0.3, n + 100)
+    return autocor(x, list(range(n)), 1e-7, False, method="fft")[2]
+
+
+def best_time(func, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = func()
+        times.append(time.perf_counter() - t0)
+    return min(times), res
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--sizes", type=int, nargs="*", default=[1000, 2000, 5000, 20000], help="points of LC")
+    argp.add_argument("--repeat", type=int, default=3, help="runs of every kernel (best time is shown)")
+    argp.add_argument("--legacy-limit", type=int, default=5000, help="time per-shift functions up to this size")
+    args = argp.parse_args()
+
+    print(f"{'points':>7} {'kernel':>8} {'per-shift, s':>13} {'batched, s':>11} {'speedup':>8} {'max diff':>9}")
+    for n in args.sizes:
+        corfunc = corfunc_of(n)
+        number_of_shifts = int(n - n * 0.003)
+        shifts = list(range(0, number_of_shifts, 10))
+        kernels = (
+            ("diffs", lambda: np.array([shift_diff(i, corfunc) for i in range(number_of_shifts)]),
+             lambda: shift_diffs(number_of_shifts, corfunc)),
+            ("norms", lambda: np.array([sum_shifted_function(i, corfunc) for i in shifts]),
+             lambda: sum_shifted_functions(shifts, corfunc)),
+        )
+        for name, legacy, batched in kernels:
+            new_time, new = best_time(batched, args.repeat)
+            if n <= args.legacy_limit:
+                old_time, old = best_time(legacy, args.repeat)
+                print(f"{n:7d} {name:>8} {old_time:13.4f} {new_time:11.4f} {old_time / new_time:8.1f} "
+                      f"{np.abs(new - old).max():9.1e}")
+            else:
+                print(f"{n:7d} {name:>8} {'-':>13} {new_time:11.4f} {'-':>8} {'-':>9}")
+
+
+if __name__ == "__main__":
+    main()
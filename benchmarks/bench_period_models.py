@@ -0,0 +1,84 @@
+"""
+Accuracy and latency of the models of fit_model (app/period/auxiliary_funcs.py, PERIOD_MODELS)
+in period detection: detect_period (with de-trending, as calc_lsp_period) of every band of the
+sample files of tests/lc_to_upload (or --dir) and of synthetic LCs (sine with noise) of known period.
+
+Accuracy: period of every model relative to the period of --reference model (random_forest)
+and, for synthetic LCs, to the true period (-1: no period detected).
+
+Usage:
+    python benchmarks/bench_period_models.py [--models random_forest phase_mean] [--periods 34.5 241] [--repeat 1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from app.lc_parser import parse_lc_file  # noqa: E402
+from app.period.auxiliary_funcs import PERIOD_MODELS  # noqa: E402
+from app.sat_utils import detect_period  # noqa: E402
+
+
+def sample_lcs(sample_dir):
+    """
+    List of (name, epoch seconds, mag, true period or None)
+    """
+    lcs = []
+    for name in sorted(os.listdir(sample_dir)):
+        file_ext = os.path.splitext(name)[1]
+        if file_ext[:3] != ".ph":
+            continue
+        with open(os.path.join(sample_dir, name), "rb") as f:
+            parsed = parse_lc_file(f.read(), file_ext)
+        for lc in parsed["lcs"]:
+            lctime = (lc["lctime"] - np.datetime64(0, "s")) / np.timedelta64(1, "s")
+            lcs.append((f"{name} {lc['band']}", lctime, np.asarray(lc["mag"], dtype=float), None))
+    return lcs
+
+
+def synthetic_lcs(periods, n=1500, seed=0):
+    rng = np.random.default_rng(seed)
+    lcs = []
+    for period in periods:
+        t = 1.7e9 + np.arange(n, dtype=float)
+        mag = 5 + 0.5 * np.sin(2 * np.pi * t / period) + 0.2 * np.sin(4 * np.pi * t / period + 1) \
+            + rng.normal(0, 0.1, n)
+        lcs.append((f"synthetic P={period:g} s", t, mag, period))
+    return lcs
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--dir", default="tests/lc_to_upload", help="folder with sample .ph* and .phc files")
+    argp.add_argument("--models", nargs="*", default=list(PERIOD_MODELS), help="models of PERIOD_MODELS")
+    argp.add_argument("--reference", default="random_forest", help="model to compare periods with")
+    argp.add_argument("--periods", type=float, nargs="*", default=[34.5, 97.3, 241.],
+                      help="periods (s) of synthetic LCs")
+    argp.add_argument("--repeat", type=int, default=1, help="runs of every model (best time is shown)")
+    args = argp.parse_args()
+    models = [args.reference] + [m for m in args.models if m != args.reference]
+
+    print(f"{'LC':42} {'model':>14} {'time, s':>8} {'period, s':>11} {'vs ref':>8} {'vs true':>8}")
+    totals = dict.fromkeys(models, 0.)
+    for name, lctime, mag, true_period in sample_lcs(args.dir) + synthetic_lcs(args.periods):
+        ref_period = None
+        for model in models:
+            times = []
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                period = detect_period(lctime, mag, detrend=True, model=model)
+                times.append(time.perf_counter() - t0)
+            totals[model] += min(times)
+            if model == args.reference:
+                ref_period = period
+            vs_ref = f"{period / ref_period - 1:+8.2%}" if period > 0 and ref_period > 0 else f"{'-':>8}"
+            vs_true = f"{period / true_period - 1:+8.2%}" if period > 0 and true_period else f"{'-':>8}"
+            print(f"{name[:42]:42} {model:>14} {min(times):8.3f} {period:11.4f} {vs_ref} {vs_true}", flush=True)
+    print("\nTotal time, s: " + ", ".join(f"{m} {t:.2f}" for m, t in totals.items()))
+
+
+if __name__ == "__main__":
+    main()
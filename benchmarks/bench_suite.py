@@ -0,0 +1,261 @@
+"""
+Benchmark suite of LC ingest and analysis.
+
+Cases (per LC file): parse, add_lc, detect_period, lsp_calc, plot_lc_bokeh, lc_to_file,
+DataTables endpoint of Satellite LCs (/ajaxfile_lc); once per run: DataTables endpoint
+of Satellites (/ajaxfile_sat) with --catalog Satellites in DB.
+
+Data: sample files of tests/lc_to_upload (or --dir) and synthetic .phV (UT format)
+and .phc files of --sizes points. Every file gets its own NORAD and is stored
+in a temporary SQLite DB before timing (without period analysis).
+
+Results (all times, min and median of --repeat runs) are written to JSON (--output),
+--compare prints ratios of medians to results of other run (e.g. of previous commit).
+
+Usage:
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000 1000000] [--repeat 3] [--output bench.json]
+                                     [--compare baseline.json] [--cases parse add_lc]
+With pytest-benchmark (sizes from BENCH_SIZES, "1000 10000" by default):
+    python -m pytest benchmarks/test_bench_suite.py --benchmark-json=bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+os.environ.setdefault("CONFIG_TYPE", "app.config.TestConfig")
+from bench_lc_parse import synthetic_ph  # noqa: E402
+
+SIZES = (1000, 10000, 100000, 1000000)
+ANALYSIS_LIMIT = 100000  # detect_period and lsp_calc of longer LCs are skipped by default
+NORAD_LINE = re.compile(rb"^(NORAD ID=|# NORAD  = )(\d+)", re.MULTILINE)
+
+PHC_HEADER = """2025-01-30 17:19:41
+2025-01-30 17:31:25
+dt=1.0
+COSPAR ID=22011A
+NORAD ID=51511
+NAME=COSMOS2553 (Neitron 1)
+  UT TIME           ImpB-fon     ImpV-fon         FonB       FonV         mB      mV     Az(deg)  El(deg)  Rg(Mm)
+"""
+
+
+def synthetic_phc(n, dt=1.0, seed=0):
+    """
+    Text of .phc file of n points (both bands)
+    """
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2025, 1, 30, 17, 19, 41)
+    x = np.arange(n) * dt
+    mag_b = 4 + 0.6 * np.sin(2 * np.pi * x / 241.) + rng.normal(0, 0.05, n)
+    mag_v = mag_b - 0.4
+    lines = [PHC_HEADER]
+    for i in range(n):
+        t = t0 + timedelta(seconds=float(x[i]))
+        lines.append(f"{t:%H:%M:%S.%f}  {10 ** (-0.4 * (mag_b[i] - 10)):12.3f}  {10 ** (-0.4 * (mag_v[i] - 10)):11.3f}"
+                     f"  {998.751:12.3f}  {1224.452:10.3f}  {mag_b[i]:9.3f}  {mag_v[i]:7.3f}"
+                     f"  {181.151 + x[i] * 1e-3:9.3f}  {28.220 + x[i] * 1e-4:7.3f}  {3198.390 - x[i] * 1e-2:9.3f}\n")
+    return "".join(lines)
+
+
+def make_datasets(sample_dir, sizes):
+    """
+    List of (name, bytes, file extension), NORAD of every file is 90000 + number of file
+    """
+    files = []
+    for name in sorted(os.listdir(sample_dir)):
+        if os.path.splitext(name)[1][:3] == ".ph":
+            with open(os.path.join(sample_dir, name), "rb") as f:
+                files.append((name, f.read()))
+    for n in sizes:
+        files.append((f"synthetic_{n}.phV", synthetic_ph(n).encode()))
+        files.append((f"synthetic_{n}.phc", synthetic_phc(n).encode()))
+    datasets = []
+    for i, (name, content) in enumerate(files):
+        content = NORAD_LINE.sub(lambda m: m.group(1) + str(90000 + i).encode(), content)
+        datasets.append((name, content, os.path.splitext(name)[1]))
+    return datasets
+
+
+class Suite:
+    """
+    App with temporary DB where datasets are stored, and the cases to time
+    """
+    DATA_CASES = ("parse", "add_lc", "detect_period", "lsp_calc", "plot_lc_bokeh", "lc_to_file", "ajaxfile_lc")
+    ANALYSIS_CASES = ("detect_period", "lsp_calc")
+    RUN_CASES = ("ajaxfile_sat",)
+
+    def __init__(self, db_path, datasets, catalog=1000):
+        from app import create_app
+        from app.models import db
+        from app.lc_parser import parse_lc_file
+        from app.sat_utils import store_lc_file
+
+        self.db = db
+        self.app = create_app()
+        self.app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + db_path
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.add_catalog(catalog)
+
+        self.data = {}
+        for name, content, file_ext in datasets:
+            parsed = parse_lc_file(content, file_ext)
+            for lc in parsed["lcs"]:
+                lc.update(calc_period=False)
+            added = store_lc_file(parsed, db)
+            self.data[name] = {"content": content, "ext": file_ext, "parsed": parsed, "lc": parsed["lcs"][0],
+                               "points": len(parsed["lcs"][0]["mag"]),
+                               "lc_id": added[0].id, "sat_id": added[0].sat_id}
+
+    def add_catalog(self, n):
+        """
+        n Satellites without LCs, for Satellite table
+        """
+        from app.models import Satellite
+        now = datetime.utcnow()
+        self.db.session.bulk_insert_mappings(Satellite, [
+            {"norad": 10000 + i, "cospar": f"{2000 + i % 25}{i:03d}A"[:15], "name": f"SAT {i}", "updated": now}
+            for i in range(n)])
+        self.db.session.commit()
+
+    def close(self):
+        self.db.session.remove()
+        self.db.engine.dispose()
+        self.ctx.pop()
+
+    def reset(self):
+        # every run loads LC from DB, as a new request does
+        self.db.session.remove()
+
+    def datatables(self, url):
+        form = {"draw": "1", "start": "0", "length": "25", "search[value]": "",
+                "order[0][column]": "0", "order[0][dir]": "asc", "columns[0][data]": "norad"}
+        response = self.client.post(url, data=form)
+        assert response.status_code == 200 and response.get_json()["aaData"], url
+        return response
+
+    def case(self, case, name=None):
+        """
+        Function to time
+        """
+        from app.models import db
+        from app.lc_parser import parse_lc_file
+        from app.sat_utils import store_lc_file, detect_period, lsp_calc, plot_lc_bokeh, lc_to_file
+
+        if case == "ajaxfile_sat":
+            return lambda: self.datatables("/ajaxfile_sat")
+        d = self.data[name]
+        if case == "parse":
+            return lambda: parse_lc_file(d["content"], d["ext"])
+        if case == "add_lc":
+            parsed = dict(d["parsed"], norad=d["parsed"]["norad"] + 100000)  # new Satellite, LCs are not duplicates
+
+            def add_lc():
+                try:
+                    store_lc_file(parsed, db, commit=False)
+                finally:
+                    db.session.rollback()
+            return add_lc
+        if case == "detect_period":
+            return lambda: detect_period(d["lc"]["lctime"], d["lc"]["mag"])
+        if case == "lsp_calc":
+            return lambda: lsp_calc(lc_id=d["lc_id"])
+        if case == "plot_lc_bokeh":
+            return lambda: plot_lc_bokeh(d["lc_id"])
+        if case == "lc_to_file":
+            return lambda: lc_to_file(d["lc_id"])
+        if case == "ajaxfile_lc":
+            return lambda: self.datatables(f"/ajaxfile_lc/{d['sat_id']}")
+        raise ValueError(f"Unknown case {case}")
+
+    def run(self, case, name=None, repeat=3):
+        func = self.case(case, name)
+        times = []
+        for _ in range(repeat):
+            self.reset()
+            t0 = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - t0)
+        return {"case": case, "data": name, "points": self.data[name]["points"] if name else None,
+                "times": times, "min": min(times), "median": statistics.median(times)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(results, baseline_file):
+    with open(baseline_file) as f:
+        baseline = {(r["case"], r["data"]): r for r in json.load(f)["results"]}
+    print(f"\nCompared to {baseline_file} (median time, new / old):")
+    for r in results:
+        old = baseline.get((r["case"], r["data"]))
+        if old is None:
+            continue
+        ratio = r["median"] / old["median"]
+        mark = "  SLOWER" if ratio > 1.2 else ("  faster" if ratio < 1 / 1.2 else "")
+        print(f"  {r['case']:14} {str(r['data']):40} {old['median']:9.4f} -> {r['median']:9.4f}  x{ratio:5.2f}{mark}")
+
+
+def main():
+    argp = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argp.add_argument("--dir", default="tests/lc_to_upload", help="folder with sample .ph* and .phc files")
+    argp.add_argument("--sizes", type=int, nargs="*", default=list(SIZES), help="points of synthetic files")
+    argp.add_argument("--repeat", type=int, default=3, help="runs of every case")
+    argp.add_argument("--cases", nargs="*", default=None, help="only these cases")
+    argp.add_argument("--analysis-limit", type=int, default=ANALYSIS_LIMIT,
+                      help="detect_period and lsp_calc only for LCs up to this number of points")
+    argp.add_argument("--catalog", type=int, default=1000, help="Satellites in DB (for /ajaxfile_sat)")
+    argp.add_argument("--output", default="bench_results.json", help="JSON file with results")
+    argp.add_argument("--compare", default=None, help="JSON file of other run")
+    args = argp.parse_args()
+    cases = args.cases or list(Suite.DATA_CASES + Suite.RUN_CASES)
+
+    datasets = make_datasets(args.dir, args.sizes)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        suite = Suite(os.path.join(tmp, "bench.db"), datasets, catalog=args.catalog)
+        try:
+            for case in cases:
+                if case in Suite.RUN_CASES:
+                    runs = [None]
+                else:
+                    runs = [name for name, _, _ in datasets
+                            if case not in Suite.ANALYSIS_CASES or suite.data[name]["points"] <= args.analysis_limit]
+                for name in runs:
+                    r = suite.run(case, name, repeat=args.repeat)
+                    results.append(r)
+                    print(f"{case:14} {str(name):40} {str(r['points']):>8} points  "
+                          f"min {r['min']:9.4f} s  median {r['median']:9.4f} s", flush=True)
+        finally:
+            suite.close()
+
+    report = {"commit": git_commit(), "date": datetime.utcnow().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "numpy": np.__version__, "machine": platform.platform(),
+              "cpu_count": os.cpu_count(), "repeat": args.repeat, "results": results}
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nResults are written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""
+Cases of bench_suite.py for pytest-benchmark (not collected by the test suite, see pytest.ini):
+    BENCH_SIZES="1000 10000" python -m pytest benchmarks/test_bench_suite.py --benchmark-json=bench.json
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+from bench_suite import Suite, make_datasets  # noqa: E402
+
+SIZES = [int(n) for n in os.environ.get("BENCH_SIZES", "1000 10000").split()]
+DATASETS = make_datasets(os.path.join(os.path.dirname(__file__), "..", "tests", "lc_to_upload"), SIZES)
+
+
+@pytest.fixture(scope="module")
+def suite(tmp_path_factory):
+    suite = Suite(str(tmp_path_factory.mktemp("bench") / "bench.db"), DATASETS)
+    yield suite
+    suite.close()
+
+
+@pytest.mark.parametrize("name", [name for name, _, _ in DATASETS])
+@pytest.mark.parametrize("case", Suite.DATA_CASES)
+def test_data_case(benchmark, suite, case, name):
+    benchmark.pedantic(suite.case(case, name), setup=suite.reset, rounds=3)
+
+
+@pytest.mark.parametrize("case", Suite.RUN_CASES)
+def test_run_case(benchmark, suite, case):
+    benchmark.pedantic(suite.case(case), setup=suite.reset, rounds=3)
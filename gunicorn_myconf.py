@@ -20,7 +20,9 @@ for env_file in ('.env', '.flaskenv'):
 
 # preload_app = True
 bind = "127.0.0.1:8000"
-workers = 2 #multiprocessing.cpu_count() * 2 + 1
+# set in environment, so every worker sizes its ingest process pool to its share of CPU cores
+# (INGEST_PROCESSES = cpu_count // WEB_CONCURRENCY, see app/__init__.py)
+workers = int(os.environ.setdefault('WEB_CONCURRENCY', '2'))  # multiprocessing.cpu_count() * 2 + 1
 threads = 2
 log_level = 'info'
 # log_level = 'debug'
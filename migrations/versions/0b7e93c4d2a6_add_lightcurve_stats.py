@@ -0,0 +1,73 @@
+"""add lightcurve stats
+
+Revision ID: 0b7e93c4d2a6
+Revises: f2c8d61a4b07
+Create Date: 2026-10-18 14:21:09.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.lc_storage import decode_array
+from app.lc_stats import calc_lc_stats, STATS_FIELDS
+
+
+# revision identifiers, used by Alembic.
+revision = '0b7e93c4d2a6'
+down_revision = 'f2c8d61a4b07'
+branch_labels = None
+depends_on = None
+
+ARRAY_COLUMNS = ('date_time', 'mag', 'mag_err', 'el', 'rg')
+BATCH_SIZE = 200
+
+lightcurve = sa.table('lightcurve',
+                      sa.column('id', sa.Integer),
+                      *[sa.column(name, sa.LargeBinary) for name in ARRAY_COLUMNS])
+
+
+def upgrade():
+    stats_table = op.create_table('lightcurve_stats',
+    sa.Column('lc_id', sa.Integer(), nullable=False),
+    sa.Column('n_points', sa.Integer(), nullable=False),
+    sa.Column('duration', sa.Float(), nullable=True),
+    sa.Column('mag_min', sa.Float(), nullable=True),
+    sa.Column('mag_max', sa.Float(), nullable=True),
+    sa.Column('mag_median', sa.Float(), nullable=True),
+    sa.Column('mag_std', sa.Float(), nullable=True),
+    sa.Column('amplitude', sa.Float(), nullable=True),
+    sa.Column('mag_err_median', sa.Float(), nullable=True),
+    sa.Column('mag_err_max', sa.Float(), nullable=True),
+    sa.Column('el_min', sa.Float(), nullable=True),
+    sa.Column('el_max', sa.Float(), nullable=True),
+    sa.Column('rg_min', sa.Float(), nullable=True),
+    sa.Column('rg_max', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['lc_id'], ['lightcurve.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('lc_id')
+    )
+
+    # backfill from float64 blobs, in batches
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(lightcurve)
+            .where(lightcurve.c.id > last_id)
+            .order_by(lightcurve.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        values = []
+        for row in rows:
+            arrays = {name: decode_array(bytes(row._mapping[name])) if row._mapping[name] is not None else None
+                      for name in ARRAY_COLUMNS}
+            stats = calc_lc_stats(arrays['date_time'], arrays['mag'],
+                                  mag_err=arrays['mag_err'], el=arrays['el'], rg=arrays['rg'])
+            values.append(dict(lc_id=row.id, **{name: stats[name] for name in STATS_FIELDS}))
+            last_id = row.id
+        bind.execute(stats_table.insert(), values)
+
+
+def downgrade():
+    op.drop_table('lightcurve_stats')
@@ -0,0 +1,98 @@
+"""shared observation geometry
+
+Revision ID: 1c5a8e7f3b92
+Revises: 0b7e93c4d2a6
+Create Date: 2026-10-18 15:02:44.118903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.lc_storage import decode_array, arrays_digest
+
+
+# revision identifiers, used by Alembic.
+revision = '1c5a8e7f3b92'
+down_revision = '0b7e93c4d2a6'
+branch_labels = None
+depends_on = None
+
+GEOMETRY_COLUMNS = ('date_time', 'az', 'el', 'rg')
+BATCH_SIZE = 200
+
+lightcurve = sa.table('lightcurve',
+                      sa.column('id', sa.Integer),
+                      sa.column('geometry_id', sa.Integer),
+                      *[sa.column(name, sa.LargeBinary) for name in GEOMETRY_COLUMNS])
+
+geometry = sa.table('observation_geometry',
+                    sa.column('id', sa.Integer),
+                    sa.column('digest', sa.String),
+                    *[sa.column(name, sa.LargeBinary) for name in GEOMETRY_COLUMNS])
+
+
+def _batches(bind, query, id_column):
+    last_id = 0
+    while True:
+        rows = bind.execute(query.where(id_column > last_id).order_by(id_column).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        yield rows
+        last_id = rows[-1].id
+
+
+def upgrade():
+    op.create_table('observation_geometry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('digest', sa.String(length=64), nullable=False),
+    sa.Column('date_time', sa.LargeBinary(), nullable=False),
+    sa.Column('az', sa.LargeBinary(), nullable=True),
+    sa.Column('el', sa.LargeBinary(), nullable=True),
+    sa.Column('rg', sa.LargeBinary(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('digest')
+    )
+    op.add_column('lightcurve', sa.Column('geometry_id', sa.Integer(), nullable=True))
+
+    # move arrays, equal arrays of different LCs (bands) go to the same row
+    bind = op.get_bind()
+    geometry_ids = {}
+    query = sa.select(lightcurve.c.id, *[lightcurve.c[name] for name in GEOMETRY_COLUMNS])
+    for rows in _batches(bind, query, lightcurve.c.id):
+        for row in rows:
+            values = {name: bytes(row._mapping[name]) if row._mapping[name] is not None else None
+                      for name in GEOMETRY_COLUMNS}
+            digest = arrays_digest(*[decode_array(v) if v is not None else None for v in values.values()])
+            if digest not in geometry_ids:
+                bind.execute(geometry.insert().values(digest=digest, **values))
+                geometry_ids[digest] = bind.execute(
+                    sa.select(geometry.c.id).where(geometry.c.digest == digest)).scalar()
+            bind.execute(lightcurve.update().where(lightcurve.c.id == row.id)
+                         .values(geometry_id=geometry_ids[digest]))
+
+    with op.batch_alter_table('lightcurve') as batch_op:
+        batch_op.alter_column('geometry_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_lightcurve_geometry_id', ['geometry_id'], unique=False)
+        batch_op.create_foreign_key('fk_lightcurve_geometry_id_observation_geometry',
+                                    'observation_geometry', ['geometry_id'], ['id'])
+        for name in GEOMETRY_COLUMNS:
+            batch_op.drop_column(name)
+
+
+def downgrade():
+    for name in GEOMETRY_COLUMNS:
+        op.add_column('lightcurve', sa.Column(name, sa.LargeBinary(), nullable=True))
+
+    bind = op.get_bind()
+    query = sa.select(geometry)
+    for rows in _batches(bind, query, geometry.c.id):
+        for row in rows:
+            bind.execute(lightcurve.update().where(lightcurve.c.geometry_id == row.id)
+                         .values(**{name: row._mapping[name] for name in GEOMETRY_COLUMNS}))
+
+    with op.batch_alter_table('lightcurve') as batch_op:
+        batch_op.alter_column('date_time', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.drop_constraint('fk_lightcurve_geometry_id_observation_geometry', type_='foreignkey')
+        batch_op.drop_index('ix_lightcurve_geometry_id')
+        batch_op.drop_column('geometry_id')
+    op.drop_table('observation_geometry')
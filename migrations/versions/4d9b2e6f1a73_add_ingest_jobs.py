@@ -0,0 +1,55 @@
+"""add ingest jobs
+
+Revision ID: 4d9b2e6f1a73
+Revises: 1c5a8e7f3b92
+Create Date: 2026-10-18 15:47:31.260418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d9b2e6f1a73'
+down_revision = '1c5a8e7f3b92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ingest_job',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('started', sa.DateTime(), nullable=True),
+    sa.Column('finished', sa.DateTime(), nullable=True),
+    sa.Column('n_files', sa.Integer(), nullable=False),
+    sa.Column('n_done', sa.Integer(), nullable=False),
+    sa.Column('n_lcs', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingest_job_status'), 'ingest_job', ['status'], unique=False)
+    op.create_index(op.f('ix_ingest_job_user_id'), 'ingest_job', ['user_id'], unique=False)
+    op.create_table('ingest_job_file',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('content', sa.LargeBinary(), nullable=True),
+    sa.Column('status', sa.String(length=10), nullable=True),
+    sa.Column('n_lcs', sa.Integer(), nullable=False),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['ingest_job.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_ingest_job_file_job_id'), 'ingest_job_file', ['job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_ingest_job_file_job_id'), table_name='ingest_job_file')
+    op.drop_table('ingest_job_file')
+    op.drop_index(op.f('ix_ingest_job_user_id'), table_name='ingest_job')
+    op.drop_index(op.f('ix_ingest_job_status'), table_name='ingest_job')
+    op.drop_table('ingest_job')
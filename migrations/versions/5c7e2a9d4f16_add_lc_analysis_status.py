@@ -0,0 +1,31 @@
+"""add lc analysis status
+
+Revision ID: 5c7e2a9d4f16
+Revises: 9b4d1f6e8a25
+Create Date: 2026-10-18 21:12:37.408215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c7e2a9d4f16'
+down_revision = '9b4d1f6e8a25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # periods of existing LCs were calculated at upload
+    with op.batch_alter_table('lightcurve', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('analysis_status', sa.String(length=10), nullable=False, server_default='done'))
+        batch_op.add_column(sa.Column('analysis_updated', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_lightcurve_analysis_status'), ['analysis_status'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('lightcurve', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_lightcurve_analysis_status'))
+        batch_op.drop_column('analysis_updated')
+        batch_op.drop_column('analysis_status')
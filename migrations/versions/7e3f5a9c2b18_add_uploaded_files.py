@@ -0,0 +1,34 @@
+"""add uploaded files
+
+Revision ID: 7e3f5a9c2b18
+Revises: 4d9b2e6f1a73
+Create Date: 2026-10-18 18:05:12.734102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3f5a9c2b18'
+down_revision = '4d9b2e6f1a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('uploaded_file',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('file_name', sa.String(length=255), nullable=False),
+    sa.Column('size', sa.Integer(), nullable=False),
+    sa.Column('n_lcs', sa.Integer(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_uploaded_file_sha256'), 'uploaded_file', ['sha256'], unique=True)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_uploaded_file_sha256'), table_name='uploaded_file')
+    op.drop_table('uploaded_file')
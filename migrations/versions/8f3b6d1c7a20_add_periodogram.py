@@ -0,0 +1,44 @@
+"""add periodogram
+
+Revision ID: 8f3b6d1c7a20
+Revises: 5c7e2a9d4f16
+Create Date: 2026-10-19 09:42:51.183604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f3b6d1c7a20'
+down_revision = '5c7e2a9d4f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # periodograms of existing LCs are calculated on first view of LSP plot
+    op.create_table('periodogram',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lc_id', sa.Integer(), nullable=False),
+    sa.Column('min_freq', sa.Float(), nullable=False),
+    sa.Column('max_freq', sa.Float(), nullable=False),
+    sa.Column('samples_per_peak', sa.Integer(), nullable=False),
+    sa.Column('normalization', sa.String(length=16), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.Column('frequency', sa.LargeBinary(), nullable=False),
+    sa.Column('power', sa.LargeBinary(), nullable=False),
+    sa.Column('fap_probability', sa.Float(), nullable=False),
+    sa.Column('fap_level', sa.Float(), nullable=False),
+    sa.Column('peaks', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['lc_id'], ['lightcurve.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lc_id', 'min_freq', 'max_freq', 'samples_per_peak', 'normalization',
+                        name='uq_periodogram_lc_id_grid')
+    )
+    op.create_index(op.f('ix_periodogram_lc_id'), 'periodogram', ['lc_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_periodogram_lc_id'), table_name='periodogram')
+    op.drop_table('periodogram')
@@ -0,0 +1,30 @@
+"""add uploaded file lc key
+
+Revision ID: 9b4d1f6e8a25
+Revises: 7e3f5a9c2b18
+Create Date: 2026-10-18 19:42:08.163920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d1f6e8a25'
+down_revision = '7e3f5a9c2b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('uploaded_file', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('norad', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('ut_start', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_uploaded_file_norad_ut_start', ['norad', 'ut_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('uploaded_file', schema=None) as batch_op:
+        batch_op.drop_index('ix_uploaded_file_norad_ut_start')
+        batch_op.drop_column('ut_start')
+        batch_op.drop_column('norad')
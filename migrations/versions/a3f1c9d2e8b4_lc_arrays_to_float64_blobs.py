@@ -0,0 +1,73 @@
+"""lc arrays to float64 blobs
+
+Revision ID: a3f1c9d2e8b4
+Revises: 15b5fd757927
+Create Date: 2026-10-18 10:12:40.318214
+
+"""
+import pickle
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+from app.lc_storage import to_epoch, pack_array, decode_array, epoch_to_datetime64
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e8b4'
+down_revision = '15b5fd757927'
+branch_labels = None
+depends_on = None
+
+ARRAY_COLUMNS = ('date_time', 'flux', 'flux_err', 'mag', 'mag_err', 'az', 'el', 'rg')
+BATCH_SIZE = 200
+
+lightcurve = sa.table('lightcurve',
+                      sa.column('id', sa.Integer),
+                      *[sa.column(name, sa.LargeBinary) for name in ARRAY_COLUMNS])
+
+
+def _convert_rows(convert):
+    """
+    Rewrite all array blobs of lightcurve table in batches
+    Columns have the same BLOB/bytea type before and after, so only data is changed.
+    """
+    bind = op.get_bind()
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(lightcurve)
+            .where(lightcurve.c.id > last_id)
+            .order_by(lightcurve.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            values = {name: convert(name, row._mapping[name])
+                      for name in ARRAY_COLUMNS if row._mapping[name] is not None}
+            bind.execute(lightcurve.update().where(lightcurve.c.id == row.id).values(**values))
+            last_id = row.id
+
+
+def _pickle_to_blob(name, value):
+    data = pickle.loads(bytes(value))
+    if name == 'date_time':
+        return pack_array(to_epoch(data))
+    return pack_array(data)
+
+
+def _blob_to_pickle(name, value):
+    data = decode_array(bytes(value))  # raw float64 or codec blob
+    if name == 'date_time':
+        return pickle.dumps(list(epoch_to_datetime64(data).astype(object)))
+    return pickle.dumps(np.array(data))
+
+
+def upgrade():
+    _convert_rows(_pickle_to_blob)
+
+
+def downgrade():
+    _convert_rows(_blob_to_pickle)
@@ -0,0 +1,29 @@
+"""ingest job file path
+
+Revision ID: b7c2e94f0d15
+Revises: 8f3b6d1c7a20
+Create Date: 2026-10-18 11:05:27.640913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2e94f0d15'
+down_revision = '8f3b6d1c7a20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # files of jobs are spooled to disk (INGEST_SPOOL_DIR), run queued jobs (flask ingest-run-queued) before upgrade
+    with op.batch_alter_table('ingest_job_file') as batch_op:
+        batch_op.add_column(sa.Column('path', sa.String(length=1024), nullable=True))
+        batch_op.drop_column('content')
+
+
+def downgrade():
+    with op.batch_alter_table('ingest_job_file') as batch_op:
+        batch_op.add_column(sa.Column('content', sa.LargeBinary(), nullable=True))
+        batch_op.drop_column('path')
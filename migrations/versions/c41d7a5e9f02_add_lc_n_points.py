@@ -0,0 +1,26 @@
+"""add lc n_points
+
+Revision ID: c41d7a5e9f02
+Revises: a3f1c9d2e8b4
+Create Date: 2026-10-18 11:02:15.774930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d7a5e9f02'
+down_revision = 'a3f1c9d2e8b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('lightcurve', sa.Column('n_points', sa.Integer(), nullable=True))
+    # arrays are float64 blobs, so number of points is blob length / 8
+    op.execute("UPDATE lightcurve SET n_points = length(mag) / 8")
+
+
+def downgrade():
+    op.drop_column('lightcurve', 'n_points')
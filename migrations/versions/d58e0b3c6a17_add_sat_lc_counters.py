@@ -0,0 +1,59 @@
+"""add sat lc counters
+
+Revision ID: d58e0b3c6a17
+Revises: c41d7a5e9f02
+Create Date: 2026-10-18 11:46:03.905113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd58e0b3c6a17'
+down_revision = 'c41d7a5e9f02'
+branch_labels = None
+depends_on = None
+
+satellite = sa.table('satellite',
+                     sa.column('id', sa.Integer),
+                     sa.column('lc_count', sa.Integer),
+                     sa.column('first_lc_time', sa.DateTime),
+                     sa.column('last_lc_time', sa.DateTime),
+                     sa.column('band_counts', sa.JSON))
+lightcurve = sa.table('lightcurve',
+                      sa.column('id', sa.Integer),
+                      sa.column('sat_id', sa.Integer),
+                      sa.column('band', sa.String),
+                      sa.column('ut_start', sa.DateTime))
+
+
+def upgrade():
+    op.add_column('satellite', sa.Column('lc_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('satellite', sa.Column('first_lc_time', sa.DateTime(), nullable=True))
+    op.add_column('satellite', sa.Column('last_lc_time', sa.DateTime(), nullable=True))
+    op.add_column('satellite', sa.Column('band_counts', sa.JSON(), nullable=True))
+
+    # fill counters
+    bind = op.get_bind()
+    bands = {}
+    for sat_id, band, n in bind.execute(
+            sa.select(lightcurve.c.sat_id, lightcurve.c.band, sa.func.count(lightcurve.c.id))
+            .group_by(lightcurve.c.sat_id, lightcurve.c.band)):
+        bands.setdefault(sat_id, {})[band] = n
+    totals = bind.execute(
+        sa.select(lightcurve.c.sat_id, sa.func.count(lightcurve.c.id),
+                  sa.func.min(lightcurve.c.ut_start), sa.func.max(lightcurve.c.ut_start))
+        .group_by(lightcurve.c.sat_id)).fetchall()
+    for sat_id, n, first, last in totals:
+        if sat_id is None:
+            continue
+        bind.execute(satellite.update().where(satellite.c.id == sat_id).values(
+            lc_count=n, first_lc_time=first, last_lc_time=last, band_counts=bands.get(sat_id, {})))
+
+
+def downgrade():
+    op.drop_column('satellite', 'band_counts')
+    op.drop_column('satellite', 'last_lc_time')
+    op.drop_column('satellite', 'first_lc_time')
+    op.drop_column('satellite', 'lc_count')
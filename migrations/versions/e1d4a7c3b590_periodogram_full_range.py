@@ -0,0 +1,36 @@
+"""periodogram full range
+
+Revision ID: e1d4a7c3b590
+Revises: b7c2e94f0d15
+Create Date: 2026-10-18 12:31:08.915472
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1d4a7c3b590'
+down_revision = 'b7c2e94f0d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('periodogram') as batch_op:
+        batch_op.add_column(sa.Column('full_range', sa.Boolean(), server_default=sa.false(), nullable=False))
+
+    # stored periodograms of the whole range: max frequency of lsp_frequency_range (app/sat_utils.py)
+    periodogram = sa.table('periodogram', sa.column('lc_id', sa.Integer), sa.column('max_freq', sa.Float),
+                           sa.column('full_range', sa.Boolean))
+    lightcurve = sa.table('lightcurve', sa.column('id', sa.Integer), sa.column('dt', sa.Float))
+    lc_max_freq = sa.select(1.0 / (2 * lightcurve.c.dt)).where(lightcurve.c.id == periodogram.c.lc_id) \
+        .scalar_subquery()
+    op.execute(periodogram.update()
+               .where(sa.or_(periodogram.c.max_freq == 0.83, periodogram.c.max_freq == lc_max_freq))
+               .values(full_range=True))
+
+
+def downgrade():
+    with op.batch_alter_table('periodogram') as batch_op:
+        batch_op.drop_column('full_range')
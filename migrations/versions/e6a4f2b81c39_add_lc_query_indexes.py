@@ -0,0 +1,30 @@
+"""add lc query indexes
+
+Revision ID: e6a4f2b81c39
+Revises: d58e0b3c6a17
+Create Date: 2026-10-18 12:31:48.220561
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a4f2b81c39'
+down_revision = 'd58e0b3c6a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_lightcurve_sat_id_ut_start', 'lightcurve', ['sat_id', 'ut_start'], unique=False)
+    op.create_index('ix_lightcurve_sat_id_band_ut_start', 'lightcurve', ['sat_id', 'band', 'ut_start'], unique=False)
+    op.create_index('ix_lightcurve_ut_start', 'lightcurve', ['ut_start'], unique=False)
+    op.create_index('ix_satellite_norad', 'satellite', ['norad'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_satellite_norad', table_name='satellite')
+    op.drop_index('ix_lightcurve_ut_start', table_name='lightcurve')
+    op.drop_index('ix_lightcurve_sat_id_band_ut_start', table_name='lightcurve')
+    op.drop_index('ix_lightcurve_sat_id_ut_start', table_name='lightcurve')
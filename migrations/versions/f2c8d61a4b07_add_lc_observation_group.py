@@ -0,0 +1,49 @@
+"""add lc observation group
+
+Revision ID: f2c8d61a4b07
+Revises: e6a4f2b81c39
+Create Date: 2026-10-18 13:05:27.618390
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2c8d61a4b07'
+down_revision = 'e6a4f2b81c39'
+branch_labels = None
+depends_on = None
+
+SYNCH_LC_WINDOW = timedelta(seconds=300)  # Lightcurve.SYNCH_LC_WINDOW
+
+lightcurve = sa.table('lightcurve',
+                      sa.column('id', sa.Integer),
+                      sa.column('sat_id', sa.Integer),
+                      sa.column('ut_start', sa.DateTime),
+                      sa.column('observation_group_id', sa.Integer))
+
+
+def upgrade():
+    op.add_column('lightcurve', sa.Column('observation_group_id', sa.Integer(), nullable=True))
+    op.create_index('ix_lightcurve_observation_group_id', 'lightcurve', ['observation_group_id'], unique=False)
+
+    # group LCs of satellite which start within the window from previous one
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(lightcurve.c.id, lightcurve.c.sat_id, lightcurve.c.ut_start)
+        .order_by(lightcurve.c.sat_id, lightcurve.c.ut_start, lightcurve.c.id)
+    ).fetchall()
+    prev_sat, prev_start, group_id = None, None, None
+    for lc_id, sat_id, ut_start in rows:
+        if sat_id != prev_sat or ut_start - prev_start >= SYNCH_LC_WINDOW:
+            group_id = lc_id
+        bind.execute(lightcurve.update().where(lightcurve.c.id == lc_id).values(observation_group_id=group_id))
+        prev_sat, prev_start = sat_id, ut_start
+
+
+def downgrade():
+    op.drop_index('ix_lightcurve_observation_group_id', table_name='lightcurve')
+    op.drop_column('lightcurve', 'observation_group_id')
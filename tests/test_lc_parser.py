@@ -0,0 +1,128 @@
+import io
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from astropy.time import Time
+
+from app.lc_parser import parse_lc_file, parse_lc_header, read_ph, decode_times, ColumnBuffer, \
+    FMT_UT, FMT_NOMERR, FMT_JD, FMT_PHC
+
+LC_DIR = os.path.join(os.path.dirname(__file__), "lc_to_upload")
+
+
+def read_file(name):
+    with open(os.path.join(LC_DIR, name), "rb") as f:
+        return f.read()
+
+
+def test_parse_phc():
+    res = parse_lc_file(read_file("51511_250130_1719.phc"), ".phc")
+    assert res["norad"] == 51511
+    assert res["cospar"] == "22011A"
+    lc_b, lc_v = res["lcs"]
+    assert (lc_b["band"], lc_v["band"]) == ("B", "V")
+    assert len(lc_b["mag"]) == len(lc_b["lctime"]) == 692
+    assert lc_b["lctime"] is lc_v["lctime"]
+    assert lc_b["lctime"].dtype == np.dtype("datetime64[us]")
+    assert lc_b["lctime"][0] == np.datetime64(datetime(2025, 1, 30, 17, 19, 41))
+    assert lc_b["mag"][0] == 4.057 and lc_v["mag"][0] == 3.678
+    assert lc_b["rg"][0] == 3198.390
+
+
+def test_parse_ph_ut():
+    res = parse_lc_file(read_file("result_44517_20250130_UT173650.phV"), ".phV")
+    assert (res["norad"], res["name"], res["cospar"]) == (44517, "COSMOS 2540", "19057A")
+    lc = res["lcs"][0]
+    assert lc["band"] == "V" and lc["site"] == "Derenivka" and lc["dt"] == "0.1"
+    assert len(lc["mag"]) == len(lc["lctime"]) == 2535
+    assert lc["lctime"][0] == np.datetime64(datetime(2025, 1, 30, 17, 36, 50, 807000))
+    assert lc["flux"][0] == 9261.8542 and lc["mag_err"][0] == 0.012 and lc["rg"][0] == 2091.250
+
+
+def test_parse_stream():
+    # upload is parsed from file stream (FileStorage.stream), line by line
+    for name, ext in (("51511_250130_1719.phc", ".phc"), ("result_44517_20250130_UT173650.phV", ".phV")):
+        content = read_file(name)
+        res, res_stream = parse_lc_file(content, ext), parse_lc_file(io.BytesIO(content), ext)
+        assert res_stream["norad"] == res["norad"]
+        for lc, lc_stream in zip(res["lcs"], res_stream["lcs"]):
+            assert lc.keys() == lc_stream.keys()
+            for key, value in lc.items():
+                if isinstance(value, np.ndarray):
+                    assert np.array_equal(value, lc_stream[key])
+                else:
+                    assert value == lc_stream[key]
+    assert parse_lc_header(io.BytesIO(content), ".phV") == parse_lc_header(content, ".phV")
+
+
+def test_parse_ph_no_merr():
+    lines = read_file("result_44517_20250130_UT173650.phV").decode().splitlines(keepends=True)
+    # old files: one position error column and no mag_err column
+    lines = [line if line[:1] == "#" else " ".join(np.delete(line.split(), [5, 9])) + "\n"
+             for line in lines]
+    res = read_ph(lines, ".phV")
+    assert res["format"] == FMT_NOMERR
+    assert "mag_err" not in res
+    assert res["mag"][0] == 6.124 and res["az"][0] == 249.088
+
+
+def test_decode_times():
+    # phc: times after midnight belong to the next day
+    res = decode_times(FMT_PHC, [["23:59:59.500", "00:00:00.500", "00:00:01.000"]], date="2025-01-30")
+    assert list(res.astype(datetime)) == [datetime(2025, 1, 30, 23, 59, 59, 500000),
+                                          datetime(2025, 1, 31, 0, 0, 0, 500000),
+                                          datetime(2025, 1, 31, 0, 0, 1)]
+    res = decode_times(FMT_UT, [["2025-01-30", "2025-01-31"], ["23:59:59.9", "00:00:00.123456"]])
+    assert list(res.astype(datetime)) == [datetime(2025, 1, 30, 23, 59, 59, 900000),
+                                          datetime(2025, 1, 31, 0, 0, 0, 123456)]
+    # JD: same as astropy (to microsecond)
+    jd = ["2460746.230093974", "2460746.230095131", "2460746.5", "2460747.499999999"]
+    res = decode_times(FMT_JD, [jd])
+    expected = Time(np.array(jd, dtype=float), format="jd", scale="utc").datetime
+    assert list(res.astype(datetime)) == list(expected)
+    with pytest.raises(ValueError):
+        decode_times(FMT_UT, [["2025-01-30"], ["25:61:00.0"]])
+
+
+def test_parse_lc_header():
+    for name in ("51511_250130_1719.phc", "result_44517_20250130_UT173650.phV"):
+        content = read_file(name)
+        ext = os.path.splitext(name)[1]
+        header, res = parse_lc_header(content, ext), parse_lc_file(content, ext)
+        assert header["norad"] == res["norad"]
+        assert header["lcs"] == [{"band": lc["band"], "lc_st": lc["lc_st"]} for lc in res["lcs"]]
+    # data lines are not read
+    assert parse_lc_header(read_file("51511_250130_1719.phc") + b"broken line\n", ".phc")["norad"] == 51511
+
+
+def test_parse_bad_line():
+    lines = read_file("result_44517_20250130_UT173650.phV").decode().splitlines(keepends=True)
+    assert read_ph(lines, ".phV")["format"] == FMT_UT
+    lines[-1] = lines[-1].split("  ", 1)[0] + "\n"
+    with pytest.raises(ValueError):
+        read_ph(lines, ".phV")
+    with pytest.raises(ValueError):
+        parse_lc_file(b"", ".txt")
+
+
+def test_parse_comment_lines():
+    for name, ext in (("51511_20250311_UT173120_OES30.phV", ".phV"), ("51511_250130_1719.phc", ".phc")):
+        expected = parse_lc_file(read_file(name), ext)
+        lines = read_file(name).splitlines(keepends=True)
+        lines[-10:-10] = [b"# comment\n", b"  # indented comment\n"]
+        res = parse_lc_file(b"".join(lines), ext)
+        for lc, lc_expected in zip(res["lcs"], expected["lcs"]):
+            assert np.array_equal(lc["mag"], lc_expected["mag"])
+            assert np.array_equal(lc["lctime"], lc_expected["lctime"])
+
+
+def test_column_buffer_grows():
+    buffer = ColumnBuffer(2, capacity=3)
+    for i in range(5):
+        buffer.append([np.arange(4) + 4 * i, -np.arange(4)])
+    cols = buffer.columns()
+    assert cols.shape == (2, 20)
+    assert np.array_equal(cols[0], np.arange(20))
@@ -0,0 +1,85 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from app.lc_storage import to_epoch, epoch_to_datetime64, pack_array, unpack_array, \
+    encode_array, decode_array, CODEC_MAGIC, CODEC_VERSION, CODEC_HEADER
+
+
+def test_pack_unpack_roundtrip():
+    arr = np.linspace(-3.5, 12.25, 1001)
+    blob = pack_array(arr)
+    assert len(blob) == arr.size * 8
+    res = unpack_array(blob)
+    assert res.dtype == np.dtype('<f8')
+    assert np.array_equal(res, arr)
+
+
+def test_epoch_from_datetimes():
+    t0 = datetime(2025, 1, 30, 17, 19, 41, 123000)
+    lctime = [t0 + timedelta(seconds=0.1 * i) for i in range(100)]
+    epoch = to_epoch(lctime)
+    assert epoch[0] == (t0 - datetime(1970, 1, 1)).total_seconds()
+    # datetime64 input gives the same result
+    assert np.array_equal(to_epoch(np.array(lctime, dtype='datetime64[us]')), epoch)
+    # back to datetimes (UTC, naive)
+    assert list(epoch_to_datetime64(epoch).astype(datetime)) == lctime
+
+
+def test_codec_lossless():
+    t0 = datetime(2025, 1, 30, 17, 36, 50, 807000)
+    epoch = to_epoch([t0 + timedelta(milliseconds=100 * i + i % 3) for i in range(5000)])
+    mag = np.round(7 + 0.5 * np.sin(np.arange(5000) / 40.), 3)
+    jd_time = (2460746.230093974 + np.arange(5000) * 1.1574e-6 - 2440587.5) * 86400
+    for arr in (epoch, mag, jd_time, np.array([]), np.array([np.nan, 1.5])):
+        for compression in ("zlib", "lzma", "none"):
+            blob = encode_array(arr, compression=compression)
+            assert blob.startswith(CODEC_MAGIC)
+            assert np.array_equal(decode_array(blob), arr, equal_nan=True)
+    # delta-encoded times and magnitudes are much smaller than raw float64
+    assert len(encode_array(epoch)) < epoch.nbytes / 100
+    assert len(encode_array(mag)) < mag.nbytes / 3
+
+
+def test_codec_none_is_zero_copy():
+    mag = np.round(7 + 0.5 * np.sin(np.arange(1000) / 40.), 3)
+    blob = encode_array(mag, compression="none")
+    assert len(blob) == CODEC_HEADER.size + mag.nbytes
+    assert bytes(blob[CODEC_HEADER.size:]) == pack_array(mag)  # raw little-endian body
+    res = decode_array(blob)
+    assert np.array_equal(res, mag)
+    assert not res.flags.owndata and not res.flags.writeable  # view on the blob
+    # version 1 blobs have shuffled body also without compression
+    shuffled = mag.view(np.uint8).reshape(mag.size, 8).T.tobytes()
+    v1 = CODEC_HEADER.pack(CODEC_MAGIC, 1, 0, 0, 0, mag.size) + shuffled
+    assert np.array_equal(decode_array(v1), mag)
+
+
+def test_codec_float32_error_budget():
+    arr = np.random.default_rng(0).normal(1000., 50., 1000)
+    blob = encode_array(arr, max_error=1e-3)
+    assert np.abs(decode_array(blob) - arr).max() <= 1e-3
+    assert len(blob) < len(encode_array(arr, max_error=None))
+    # budget too small, values are stored as float64
+    assert np.array_equal(decode_array(encode_array(arr, max_error=1e-9)), arr)
+
+
+def test_codec_reads_raw_blobs_and_checks_version():
+    arr = np.linspace(0, 1, 100)
+    assert np.array_equal(decode_array(pack_array(arr)), arr)
+    blob = bytearray(encode_array(arr))
+    blob[len(CODEC_MAGIC)] = CODEC_VERSION + 1
+    if len(blob) % 8 == 0:  # can not be raw float64 blob
+        blob += b"\x00"
+    with pytest.raises(ValueError):
+        decode_array(bytes(blob))
+
+
+def test_codec_raw_blob_starting_with_magic():
+    # first value of raw blobs has b"LCZ" in its low mantissa bytes, rest of header looks valid
+    for version, encoding, compression in ((1, 0, 1), (CODEC_VERSION, 0, 0), (CODEC_VERSION, 2, 2), (9, 0, 0)):
+        head = CODEC_HEADER.pack(CODEC_MAGIC, version, encoding, compression, 0, 3)[:8]
+        arr = np.concatenate([np.frombuffer(head, dtype="<f8"), np.linspace(1, 2, 3)])
+        blob = pack_array(arr)
+        assert np.array_equal(decode_array(blob), arr, equal_nan=True)
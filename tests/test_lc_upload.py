@@ -1,6 +1,10 @@
-from app.models import User, Lightcurve, db
+from app.models import User, Satellite, Lightcurve, IngestJob, UploadedFile, db
 import io
 import os
+import pytest
+import tarfile
+import zipfile
+import time
 from datetime import datetime
 from werkzeug.datastructures import FileStorage
 import logging
@@ -152,4 +156,505 @@ def test_phx_lc_upload_jd(client, caplog, auth):
 
 # TODO: Test invalid LC file. Catch
 # log -> File {file.filename} processed with error. Skipping this file...."
-# log -> 'Wrong file ext in'
\ No newline at end of file
+# log -> 'Wrong file ext in'
+
+def test_batch_upload(client, auth):
+    """Кілька файлів завантажуються однією транзакцією, файл з помилкою не залишає записів у БД."""
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    good = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    # header is fine, but dt is broken: Satellite 99999 is created and then the file fails
+    broken = good.replace(b"NORAD ID=51511", b"NORAD ID=99999").replace(b"dt=1.0", b"dt=abc")
+    files = [
+        FileStorage(stream=io.BytesIO(good), filename="51511_250130_1719.phc"),
+        FileStorage(stream=io.BytesIO(broken), filename="99999_250130_1719.phc"),
+        FileStorage(stream=io.BytesIO(b"not a LC"), filename="bad.phV"),
+        FileStorage(stream=io.BytesIO(b"text"), filename="notes.txt"),
+        FileStorage(stream=io.BytesIO(good), filename="51511_250130_1719_copy.phc"),
+    ]
+    response = client.post("/sat_phot.html", data={"lc_file": files, "add": "1"},
+                           content_type="multipart/form-data", follow_redirects=True)
+    assert response.status_code == 200
+    assert b"51511_250130_1719.phc: 2 LC(s) added" in response.data
+    assert b"File 99999_250130_1719.phc processed with error" in response.data
+    assert b"File bad.phV processed with error" in response.data
+    assert b"Wrong file ext in notes.txt" in response.data
+    assert b"51511_250130_1719_copy.phc: file already uploaded" in response.data
+
+    assert Lightcurve.query.count() == 2
+    assert Satellite.get_by_norad(51511).lc_count == 2
+    assert Satellite.get_by_norad(99999) is None  # rolled back to savepoint
+
+
+def test_ingest_job(app, client, auth):
+    """Результат завантаження зберігається в IngestJob і доступний через /api/jobs."""
+    user = create_super_user()
+    user_id = user.id
+    assert client.get("/api/jobs/1").status_code == 401
+    auth.login("super_user", "user_pass")
+
+    files = [FileStorage(stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+                         filename="51511_250130_1719.phc"),
+             FileStorage(stream=io.BytesIO(b"not a LC"), filename="bad.phV")]
+    client.post("/sat_phot.html", data={"lc_file": files, "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    job = IngestJob.query.one()
+    assert (job.user_id, job.status, job.n_files, job.n_done, job.n_lcs) == (user_id, IngestJob.DONE, 2, 2, 2)
+    assert [f.path for f in job.files] == [None, None]  # spooled files are deleted after processing
+    assert os.listdir(app.config["INGEST_SPOOL_DIR"]) == []
+
+    data = client.get(f"/api/jobs/{job.id}").get_json()
+    assert data["status"] == "done"
+    assert [(f["file"], f["status"], f["lcs"]) for f in data["files"]] == \
+           [("51511_250130_1719.phc", "added", 2), ("bad.phV", "error", 0)]
+    assert [j["id"] for j in client.get("/api/jobs/").get_json()] == [job.id]
+    assert client.get(f"/api/jobs/{job.id + 1}").status_code == 404
+
+
+def test_requeue_running_job(app):
+    """Завдання, чий робітник завершився (рестарт), повторно ставиться в чергу командою ingest-run-queued."""
+    from app.ingest import spool_file
+    from app.jobs import run_queued_jobs
+
+    os.makedirs(app.config["INGEST_SPOOL_DIR"], exist_ok=True)
+    with open("tests/lc_to_upload/51511_250130_1719.phc", "rb") as f:
+        path = spool_file(f, app.config["INGEST_SPOOL_DIR"])
+    job = IngestJob.create([("51511_250130_1719.phc", path)])
+    assert IngestJob.claim(job.id)  # worker died after claim
+    job_id = job.id
+    assert run_queued_jobs() == []
+
+    # job of live worker (started recently) is not taken
+    app.test_cli_runner().invoke(args=["ingest-run-queued", "--requeue-running", "--older-than", "60"])
+    assert IngestJob.get_by_id(job_id).status == IngestJob.RUNNING
+    jobs = run_queued_jobs(requeue_running=True)
+    assert [(job.id, job.status, job.n_done, job.n_lcs) for job in jobs] == [(job_id, IngestJob.DONE, 1, 2)]
+    assert Lightcurve.query.count() == 2
+    assert not os.path.exists(path)
+
+
+def test_ingest_job_one_transaction(app, monkeypatch):
+    """Файли завдання зберігаються однією транзакцією: збій посеред завдання не лишає частини LC."""
+    import app.jobs as jobs
+    from app.ingest import spool_file
+
+    os.makedirs(app.config["INGEST_SPOOL_DIR"], exist_ok=True)
+    paths = []
+    for name in ["51511_250130_1719.phc", "51511_20250311_UT173120_OES30.phV"]:
+        with open(f"tests/lc_to_upload/{name}", "rb") as f:
+            paths.append((name, spool_file(f, app.config["INGEST_SPOOL_DIR"])))
+    job_id = IngestJob.create(paths).id
+    progress = []
+
+    def crash_on_second_file(files, on_file=None, **kwargs):
+        def on_file_crash(index, res):
+            on_file(index, res)
+            progress.append(jobs.job_progress(IngestJob.get_by_id(job_id))["n_done"])
+            if index == 1:
+                raise RuntimeError("worker crash")
+        return ingest_files(files, on_file=on_file_crash, **kwargs)
+
+    ingest_files = jobs.ingest_files
+    monkeypatch.setattr(jobs, "ingest_files", crash_on_second_file)
+    job = jobs.run_ingest_job(job_id)
+    assert progress == [1, 2]  # progress of running job, not committed
+    assert (job.status, job.n_done, job.n_lcs) == (IngestJob.FAILED, 0, 0)
+    assert [f.status for f in job.files] == [None, None]
+    assert Lightcurve.query.count() == 0
+    assert UploadedFile.query.count() == 0
+
+
+def test_ingest_job_progress_in_db(app, monkeypatch):
+    """Лічильники завдання пишуться в БД окремою транзакцією, інший процес бачить прогрес до кінця завдання."""
+    import app.jobs as jobs
+    from app.ingest import spool_file
+    from sqlalchemy.orm import Session
+
+    if db.engine.dialect.name == "sqlite":
+        pytest.skip("SQLite has one writer, progress is written only by server DB (TEST_DATABASE_URL)")
+    app.config["INGEST_PROGRESS_INTERVAL"] = 0
+    os.makedirs(app.config["INGEST_SPOOL_DIR"], exist_ok=True)
+    paths = []
+    for name in ["51511_250130_1719.phc", "51511_20250311_UT173120_OES30.phV"]:
+        with open(f"tests/lc_to_upload/{name}", "rb") as f:
+            paths.append((name, spool_file(f, app.config["INGEST_SPOOL_DIR"])))
+    job_id = IngestJob.create(paths).id
+    seen = []
+
+    def ingest_files(files, on_file=None, **kwargs):
+        # files are parsed in worker processes, LCs are committed at the end
+        for index, file in enumerate(files):
+            on_file(index, {"status": "added", "lcs": 2, "message": ""})
+            with Session(db.engine) as session:  # poll of other app process
+                job = session.get(IngestJob, job_id)
+                seen.append((job.status, job.n_done, job.n_lcs))
+        db.session.commit()
+
+    monkeypatch.setattr(jobs, "ingest_files", ingest_files)
+    job = jobs.run_ingest_job(job_id)
+    assert seen == [(IngestJob.RUNNING, 1, 2), (IngestJob.RUNNING, 2, 4)]
+    assert (job.status, job.n_done, job.n_lcs) == (IngestJob.DONE, 2, 4)
+    assert [f.status for f in job.files] == ["added", "added"]
+
+
+def test_ingest_job_background(app, client, auth):
+    """Запит на завантаження повертається одразу, файли обробляє фоновий потік."""
+    app.config["INGEST_WORKERS"] = 1
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(stream=open("tests/lc_to_upload/result_44517_20250130_UT173650.phV", "rb"),
+                        filename="result_44517_20250130_UT173650.phV")
+    response = client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                           content_type="multipart/form-data")
+    assert response.status_code == 302
+    assert "job=" in response.headers["Location"]
+    job_id = int(response.headers["Location"].split("job=")[1])
+    assert b"/api/jobs/%d" % job_id in client.get(response.headers["Location"]).data
+
+    # requests of test client share one app context: end the read transaction, so the worker can write
+    db.session.remove()
+    t0 = time.time()
+    data = client.get(f"/api/jobs/{job_id}").get_json()
+    while data["status"] not in ("done", "failed") and time.time() - t0 < 300:
+        db.session.remove()
+        time.sleep(0.5)
+        data = client.get(f"/api/jobs/{job_id}").get_json()
+    assert data["status"] == "done"
+    assert (data["n_done"], data["n_lcs"]) == (1, 1)
+    assert data["files"][0]["message"] == "1 LC(s) added"
+    db.session.remove()
+    assert Satellite.get_by_norad(44517).lc_count == 1
+
+    # period analysis is queued after the job
+    lc_data = client.get("/api/lightcurves/satellite/44517").get_json()[0]
+    while lc_data["analysis_status"] in ("pending", "running") and time.time() - t0 < 300:
+        db.session.remove()
+        time.sleep(0.5)
+        lc_data = client.get("/api/lightcurves/satellite/44517").get_json()[0]
+    assert lc_data["analysis_status"] == "done"
+    db.session.remove()
+
+
+def test_parallel_ingest(app):
+    """Розбір і аналіз у пулі процесів дає ті самі періоди, що й послідовний розрахунок."""
+    from app.ingest import ingest_files
+    from app.jobs import analyse_pending
+    from app.sat_utils import lsp_calc, calc_period_for_all_lc
+
+    good = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    files = [FileStorage(stream=io.BytesIO(good), filename="51511_250130_1719.phc"),
+             FileStorage(stream=io.BytesIO(b"not a LC"), filename="bad.phV"),
+             FileStorage(stream=io.BytesIO(good), filename="51511_250130_1719_copy.phc")]
+    report = ingest_files(files, processes=2)
+    assert [(r["status"], r["lcs"]) for r in report] == [("added", 2), ("error", 0), ("duplicate", 0)]
+    assert [status for _, status in analyse_pending(processes=2)] == ["done", "done"]
+
+    lcs = Lightcurve.query.order_by(Lightcurve.id).all()
+    assert [lc.band for lc in lcs] == ["B", "V"]
+    for lc in lcs:
+        assert lc.lsp_period == lsp_calc(lc_id=lc.id)
+
+    # recalculation of all LCs is the same analysis
+    periods = [lc.lsp_period for lc in lcs]
+    assert [status for _, status in calc_period_for_all_lc()] == ["done", "done"]
+    db.session.expire_all()
+    assert [lc.lsp_period for lc in Lightcurve.query.order_by(Lightcurve.id)] == periods
+
+
+def test_ingest_processes_default(app, monkeypatch):
+    """Ядра CPU діляться між воркерами gunicorn (WEB_CONCURRENCY), INGEST_PROCESSES задає кількість явно."""
+    from app import create_app
+
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    assert create_app().config["INGEST_PROCESSES"] == 2
+    monkeypatch.setenv("WEB_CONCURRENCY", "16")
+    assert create_app().config["INGEST_PROCESSES"] == 1
+    monkeypatch.setenv("INGEST_PROCESSES", "5")
+    assert create_app().config["INGEST_PROCESSES"] == 5
+
+
+def test_process_pools(app):
+    """Пул іншого розміру не зупиняє пул, що використовується; зламаний пул (процес загинув) замінюється."""
+    from concurrent.futures.process import BrokenProcessPool
+    from app.ingest import get_process_pool, submit_task
+
+    pool = get_process_pool(2)
+    assert get_process_pool(3) is not pool and get_process_pool(2) is pool
+    assert submit_task(pool, pow, 2, 3).result() == 8
+
+    with pytest.raises(BrokenProcessPool):
+        submit_task(pool, os._exit, 1).result()
+    assert submit_task(pool, pow, 2, 3).result() == 8  # in new pool
+    assert get_process_pool(2) is not pool
+
+
+def test_ingest_window(app):
+    """Файли читаються по мірі обробки: у пам'яті лише кілька файлів, а не все завантаження."""
+    from app.ingest import ingest_files
+
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    events = []
+
+    def files():
+        for i in range(6):
+            events.append(("read", i))
+            yield FileStorage(stream=io.BytesIO(phc.replace(b"NORAD ID=51511", f"NORAD ID={90000 + i}".encode())),
+                              filename=f"{90000 + i}.phc")
+
+    report = ingest_files(files(), processes=1, on_file=lambda index, res: events.append(("done", index)))
+    assert [r["status"] for r in report] == ["added"] * 6
+    # window of 1 file in parsing (processes=1)
+    assert events.index(("done", 0)) < events.index(("read", 5))
+    assert Lightcurve.query.count() == 12
+
+
+def test_upload_too_large(app, client, auth):
+    """Запит більший за MAX_CONTENT_LENGTH відхиляється (413) до розбору файлів."""
+    user = create_super_user()
+    user.sat_lc_upload = True
+    db.session.commit()
+    auth.login("super_user", "user_pass")
+    app.config["MAX_CONTENT_LENGTH"] = 1024 * 1024
+    big = b"0" * (2 * 1024 * 1024)
+
+    response = client.post("/sat_phot.html", data={"lc_file": [(io.BytesIO(big), "big.phc")], "add": "1"},
+                           content_type="multipart/form-data", follow_redirects=True)
+    assert response.status_code == 200
+    assert b"Upload is too big (max 1 MB)" in response.data
+
+    response = client.post("/api/jobs/", data={"files": [(io.BytesIO(big), "big.phc")]},
+                           content_type="multipart/form-data")
+    assert response.status_code == 413
+    assert IngestJob.query.count() == 0
+
+
+def test_deferred_analysis(app, client, auth, monkeypatch):
+    """LC видно одразу після завантаження (період "pending"), аналіз виконується окремо, збій можна повторити."""
+    import app.jobs as jobs
+    from app.ingest import ingest_files
+    from app.sat_utils import lsp_calc
+
+    user = create_super_user()
+    user.sat_lc_upload = True
+    db.session.commit()
+    auth.login("super_user", "user_pass")
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    ingest_files([FileStorage(stream=io.BytesIO(phc), filename="51511_250130_1719.phc")], processes=1)
+
+    lcs = Lightcurve.query.order_by(Lightcurve.id).all()
+    assert [(lc.analysis_status, lc.lsp_period) for lc in lcs] == [("pending", None), ("pending", None)]
+    form = {"draw": "1", "start": "0", "length": "10", "search[value]": "",
+            "order[0][column]": "0", "order[0][dir]": "asc", "columns[0][data]": "ut_start"}
+    rows = client.post(f"/ajaxfile_lc/{lcs[0].sat_id}", data=form).get_json()["aaData"]
+    assert [row["period"] for row in rows] == ["pending", "pending"]
+
+    def broken(*args):
+        raise ValueError("analysis failed")
+    monkeypatch.setattr(jobs, "calc_lsp_periodograms", broken)
+    assert jobs.analyse_pending(processes=1) == [(lcs[0].id, "failed"), (lcs[1].id, "failed")]
+    assert jobs.analyse_pending(processes=1) == []
+
+    monkeypatch.undo()
+    response = client.post(f"/api/lightcurves/{lcs[1].id}/analysis")
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data["analysis_status"] == "done"
+    assert data["lsp_period"] == lsp_calc(lc_id=lcs[1].id)
+    assert client.post(f"/api/lightcurves/{lcs[1].id}/analysis").status_code == 409
+    assert Lightcurve.get_by_id(lcs[0].id).analysis_status == "failed"  # only one LC is retried
+
+    # period set by hand is not overwritten by analysis
+    assert Lightcurve.retry_analysis(lcs[0].id) and Lightcurve.claim_analysis(lcs[0].id)
+    lc = Lightcurve.get_by_id(lcs[0].id)
+    lc.set_period(12.5)
+    db.session.commit()
+    assert not Lightcurve.set_analysis_status(lc.id, "done", "running", lsp_period=1.0)
+    assert Lightcurve.get_by_id(lc.id).lsp_period == 12.5
+
+
+def test_periodogram_store(app, client, auth, monkeypatch):
+    """Періодограма рахується один раз при аналізі, сторінка періоду її лише читає; нові параметри - новий розрахунок."""
+    import app.sat_utils as sat_utils
+    from app.ingest import ingest_files
+    from app.jobs import analyse_pending
+    from app.models import Periodogram
+
+    create_super_user()
+    auth.login("super_user", "user_pass")
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    ingest_files([FileStorage(stream=io.BytesIO(phc), filename="51511_250130_1719.phc")], processes=1)
+    analyse_pending(processes=1)
+
+    lc = Lightcurve.get_by_id(Lightcurve.query.order_by(Lightcurve.id).first().id, arrays=True)
+    min_freq, max_freq = sat_utils.lsp_frequency_range(lc.date_time, lc.dt)
+    stored = Periodogram.get(lc.id, min_freq, max_freq, 50, "standard")
+    expected = sat_utils.calc_periodogram(lc.date_time, lc.mag, lc.mag_err, min_freq, max_freq)
+    assert stored is not None and stored.peak_index.tolist() == expected["peaks"].tolist()
+    assert (stored.frequency == expected["frequency"]).all() and (stored.power == expected["power"]).all()
+    assert stored.fap_level == expected["fap_level"]
+    assert stored.full_range and Periodogram.get_full_range(lc.id, 50, "standard").id == stored.id
+    n_stored = Periodogram.query.count()
+    assert n_stored >= 2  # every LC
+
+    calc_periodogram = sat_utils.calc_periodogram
+    lsp_frequency_range = sat_utils.lsp_frequency_range
+    calls = []
+
+    def counted(*args, **kwargs):
+        calls.append(kwargs)
+        return calc_periodogram(*args, **kwargs)
+    monkeypatch.setattr(sat_utils, "calc_periodogram", counted)
+    response = client.get(f"/sat_lc_period_plot.html/{lc.id}")
+    assert response.status_code == 200 and b"Lomb-Scargle Periodogram" in response.data
+    assert calls == []
+
+    # full range periodogram is found without LC arrays (e.g. re-encoded by lc-recompress)
+    def no_range(*args):
+        raise AssertionError("frequency range is calculated")
+    monkeypatch.setattr(sat_utils, "lsp_frequency_range", no_range)
+    db.session.expire_all()
+    lc_meta = Lightcurve.get_by_id(lc.id)
+    assert sat_utils.get_periodogram(lc_meta).id == stored.id
+    assert "mag" not in lc_meta.__dict__ and calls == []
+    monkeypatch.setattr(sat_utils, "lsp_frequency_range", lsp_frequency_range)
+
+    # other grid: calculated and stored once
+    assert sat_utils.get_periodogram(lc, samples_per_peak=10).power.size < stored.power.size
+    assert sat_utils.get_periodogram(lc, samples_per_peak=10) is not None
+    assert len(calls) == 1 and Periodogram.query.count() == n_stored + 1
+
+    Lightcurve.delete_by_id(lc.id)
+    assert Periodogram.query.filter_by(lc_id=lc.id).count() == 0
+
+
+def test_periodogram_conflict(app, monkeypatch):
+    """Періодограма, збережена сторінкою LSP під час аналізу, не зупиняє аналіз інших LC."""
+    from app.ingest import ingest_files
+    from app.jobs import analyse_pending
+    from app.models import Periodogram
+    from app.sat_utils import lsp_calc
+
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    ingest_files([FileStorage(stream=io.BytesIO(phc), filename="51511_250130_1719.phc")], processes=1)
+    first_id, second_id = [lc.id for lc in Lightcurve.query.order_by(Lightcurve.id)]
+    store = Periodogram.store
+
+    def store_conflict(lc_id, periodogram):
+        row = store(lc_id, periodogram)
+        if lc_id == first_id and periodogram["full_range"]:
+            # the same periodogram committed by get_periodogram between delete and insert of store
+            db.session.add(Periodogram(lc_id=lc_id, **periodogram))
+        return row
+    monkeypatch.setattr(Periodogram, "store", store_conflict)
+
+    assert analyse_pending(processes=1) == [(first_id, "done"), (second_id, "done")]
+    lcs = Lightcurve.query.order_by(Lightcurve.id).all()
+    assert [lc.analysis_status for lc in lcs] == ["done", "done"]
+    assert lcs[0].lsp_period == lsp_calc(lc_id=first_id)
+    assert Periodogram.query.filter_by(lc_id=first_id).count() == 0
+    assert Periodogram.query.filter_by(lc_id=second_id).count() >= 1
+
+
+def test_archive_upload(app, client, auth):
+    """Архів нічних спостережень (zip, tar.gz) розбирається по одному файлу, звіт для кожного файлу."""
+    user = create_super_user()
+    user.sat_lc_upload = True
+    db.session.commit()
+    auth.login("super_user", "user_pass")
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+
+    zip_data = io.BytesIO()
+    with zipfile.ZipFile(zip_data, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("night/", b"")
+        zf.writestr("night/51511_250130_1719.phc", phc)
+        zf.writestr("night/notes.txt", b"text")
+        zf.writestr("__MACOSX/night/._51511_250130_1719.phc", b"resource fork")
+    zip_data.seek(0)
+    response = client.post("/sat_phot.html", data={"lc_file": [(zip_data, "night.zip")], "add": "1"},
+                           content_type="multipart/form-data", follow_redirects=True)
+    assert b"night.zip/night/51511_250130_1719.phc: 2 LC(s) added" in response.data
+    assert b"Wrong file ext in night.zip/night/notes.txt" in response.data
+    job = IngestJob.query.one()
+    assert [f.file_name for f in job.files] == ["night.zip/night/51511_250130_1719.phc", "night.zip/night/notes.txt"]
+
+    tar_data = io.BytesIO()
+    with tarfile.open(fileobj=tar_data, mode="w:gz") as tf:
+        info = tarfile.TarInfo("51511_250130_1719.phc")
+        info.size = len(phc)
+        tf.addfile(info, io.BytesIO(phc))
+    tar_data.seek(0)
+    response = client.post("/api/jobs/", data={"files": [(tar_data, "night.tar.gz")]},
+                           content_type="multipart/form-data")
+    assert response.status_code == 202
+    data = response.get_json()
+    assert data["status"] == "done"
+    assert [(f["file"], f["status"]) for f in data["files"]] == [("night.tar.gz/51511_250130_1719.phc", "duplicate")]
+
+    response = client.post("/api/jobs/", data={"files": [(io.BytesIO(b"not a zip"), "bad.zip")]},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "Bad archive bad.zip" in response.get_json()["message"]
+
+    # entries are spooled one by one, a too big entry cancels the whole upload
+    app.config["ARCHIVE_MAX_ENTRY_SIZE"] = 1024
+    zip_data = io.BytesIO()
+    with zipfile.ZipFile(zip_data, "w") as zf:
+        zf.writestr("small.phV", b"x" * 10)
+        zf.writestr("big.phV", b"x" * 2048)
+    zip_data.seek(0)
+    response = client.post("/api/jobs/", data={"files": [(zip_data, "big.zip")]},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "Entry big.phV is bigger than 1024 bytes" in response.get_json()["message"]
+    assert os.listdir(app.config["INGEST_SPOOL_DIR"]) == []
+    assert IngestJob.query.count() == 2
+    assert Lightcurve.query.count() == 2
+
+
+def test_reupload_not_parsed(app, monkeypatch):
+    """Повторне завантаження: файл не розбирається, лише хеш і пошук за заголовком."""
+    import app.ingest as ingest
+
+    phc = open("tests/lc_to_upload/51511_250130_1719.phc", "rb").read()
+    report = ingest.ingest_files([FileStorage(stream=io.BytesIO(phc), filename="51511_250130_1719.phc")],
+                                 processes=1)
+    assert report[0]["status"] == "added"
+    uploaded = UploadedFile.query.one()
+    assert (uploaded.n_lcs, uploaded.norad, uploaded.ut_start) == (2, 51511, datetime(2025, 1, 30, 17, 19, 41))
+
+    def no_parse(*args):
+        raise AssertionError("file is parsed")
+    monkeypatch.setattr(ingest, "parse_lc_file", no_parse)
+    files = [FileStorage(stream=io.BytesIO(phc), filename="again.phc"),
+             # other content (other hash), same LCs
+             FileStorage(stream=io.BytesIO(phc + b"\n"), filename="edited.phc")]
+    report = ingest.ingest_files(files, processes=1)
+    assert [(r["status"], r["message"]) for r in report] == [("duplicate", "file already uploaded"),
+                                                             ("duplicate", "LC(s) already in DB")]
+    assert UploadedFile.query.count() == 2
+
+    # file can be uploaded again after its LC is deleted
+    Lightcurve.delete_by_id(Lightcurve.query.filter_by(band="B").one().id)
+    assert UploadedFile.query.count() == 0
+
+
+def test_bad_start_time(app):
+    """Файл з пошкодженим часом початку LC отримує помилку, сусідні файли зберігаються."""
+    from app.ingest import ingest_files
+
+    good = open("tests/lc_to_upload/51511_20250311_UT173120_OES30.phV", "rb").read()
+    lines = open("tests/lc_to_upload/result_44517_20250130_UT173650.phV", "rb").read().splitlines(keepends=True)
+    lines[4] = b"# not a time\n"  # start of LC
+    files = [FileStorage(stream=io.BytesIO(good), filename="good.phV"),
+             FileStorage(stream=io.BytesIO(b"".join(lines)), filename="bad.phV")]
+    for processes in (1, 2):
+        report = ingest_files(files, processes=processes)
+        assert [r["status"] for r in report] == ["added" if processes == 1 else "duplicate", "error"]
+        for file in files:
+            file.stream.seek(0)
+    assert Lightcurve.query.count() == 1
+    assert UploadedFile.query.count() == 1
@@ -0,0 +1,189 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.lc_parser import parse_lc_file
+from app.lc_storage import to_epoch
+from app.period.auxiliary_funcs import autocor, shift_diff, shift_diffs, sum_shifted_function, sum_shifted_functions, \
+    tolerance_sweep, PhaseBinnedModel, fit_model
+from app.period.find_period import find_period
+from app.sat_utils import remove_trend, bin_lc, detect_period
+
+LC_DIR = os.path.join(os.path.dirname(__file__), "lc_to_upload")
+
+
+def read_lc(name, band_index=0):
+    with open(os.path.join(LC_DIR, name), "rb") as f:
+        return parse_lc_file(f.read(), os.path.splitext(name)[1])["lcs"][band_index]
+
+
+def lc_frame(lc, limit=2000):
+    # as in detect_period
+    return pd.DataFrame({"date": pd.to_datetime(to_epoch(lc["lctime"])[:limit], unit="s"),
+                         "value": remove_trend(lc["mag"], order=3)[:limit] * -1})
+
+
+@pytest.mark.parametrize("significant", [False, True])
+def test_autocor_fft(significant):
+    x = read_lc("result_44517_20250130_UT173650.phV")["mag"][:1000]
+    lags = list(range(0, x.size - 100))
+    r, p, func, lag_list = autocor(x, lags, 1e-7, significant, method="pearsonr")
+    r_fft, p_fft, func_fft, lag_list_fft = autocor(x, lags, 1e-7, significant, method="fft")
+    assert lag_list_fft == lag_list
+    assert np.allclose(r_fft, r, rtol=0, atol=1e-12)
+    assert np.allclose(p_fft, p, rtol=1e-8, atol=1e-300)
+    assert np.allclose(func_fft, func, rtol=0, atol=1e-12)
+    assert (np.array(func_fft) == 0).sum() == (np.array(func) == 0).sum()
+
+
+def test_autocor_fft_constant():
+    # constant parts have no correlation (NaN of pearsonr)
+    x = np.concatenate([np.ones(50), np.sin(np.arange(50.))])
+    lags = [0, 1, 10, 49, 60, 98]
+    r, p, func, _ = autocor(x, lags, 0.01, True, method="fft")
+    r_ref, p_ref, func_ref, _ = autocor(x, lags, 0.01, True, method="pearsonr")
+    assert np.allclose(r, r_ref, atol=1e-12) and np.allclose(func, func_ref, atol=1e-12)
+    assert r[-2:] == [0., 0.]
+    with pytest.raises(ValueError):
+        autocor(x, lags, 0.01, True, method="direct")
+
+
+@pytest.mark.parametrize("block_elements", [2 ** 20, 1000, 1])
+def test_shift_diffs(block_elements):
+    x = read_lc("51511_250130_1719.phc")["mag"]
+    corfunc = autocor(x, list(range(x.size - 100)), 1e-7, False, method="fft")[2]
+    number_of_shifts = int(len(corfunc) - len(corfunc) * 0.003)
+    diffs = shift_diffs(number_of_shifts, corfunc, block_elements=block_elements)
+    assert diffs.shape == (number_of_shifts,)
+    assert np.allclose(diffs, [shift_diff(i, corfunc) for i in range(number_of_shifts)], rtol=1e-12, atol=1e-15)
+    assert shift_diffs(0, corfunc).size == 0
+
+    shifts = [0, 1, 2, 100, len(corfunc) - 1]
+    assert np.allclose(sum_shifted_functions(shifts, corfunc), [sum_shifted_function(i, corfunc) for i in shifts],
+                       rtol=1e-12, atol=0)
+
+
+def test_tolerance_sweep():
+    rng = np.random.default_rng(0)
+    number_steps = 1000
+    diffs = rng.uniform(0, 1, 300)
+    sum_of_norms = diffs + rng.uniform(-0.2, 0.5, 300)
+    # values on the grid, shifts which are never relevant, NaN
+    diffs[:10] = np.linspace(0, 1, number_steps + 1)[[0, 5, 5, 17, 500, 999, 1000, 3, 3, 40]]
+    sum_of_norms[:10] = np.linspace(0, 1, number_steps + 1)[[5, 5, 6, 17, 700, 1000, 1000, 2, 9, 41]]
+    diffs[10], sum_of_norms[11] = np.nan, np.nan
+
+    events = [(tol, relevant.copy(), count)
+              for tol, relevant, count in tolerance_sweep(diffs, sum_of_norms, number_steps)]
+    assert len(events) < 2 * diffs.size
+    last = None
+    for tol in np.linspace(0, 1, number_steps + 1):
+        # loop of find_period before tolerance_sweep
+        relevant = (diffs <= tol) & (sum_of_norms > tol)
+        while events and events[0][0] <= tol:
+            last = events.pop(0)
+        if last is None:
+            assert not relevant.any()
+        else:
+            assert np.array_equal(last[1], relevant) and last[2] == relevant.sum()
+
+
+def test_find_period_fft():
+    df = lc_frame(read_lc("51511_250130_1719.phc"))
+    kwargs = dict(number_steps=5000, minimum_number_of_datapoints_for_correlation_test=100,
+                  minimum_ratio_of_datapoints_for_shift_autocorrelation=0.003,
+                  consider_only_significant_correlation=False, level_of_significance_for_pearson=1e-7)
+    res = find_period(df.copy(), autocorrelation_method="pearsonr", **kwargs)
+    res_fft = find_period(df.copy(), autocorrelation_method="fft", **kwargs)
+    assert res_fft.period == res.period == 0.575
+    assert res_fft.criteria == pytest.approx(res.criteria, abs=1e-12)
+
+
+@pytest.mark.parametrize("statistic, smoothing", [("mean", None), ("median", None), ("mean", 1.)])
+def test_phase_binned_model(statistic, smoothing):
+    rng = np.random.default_rng(0)
+    period = 34.5
+    x = np.sort(rng.uniform(0, 1000, 3000))
+    y = np.sin(2 * np.pi * x / period) + rng.normal(0, 0.1, x.size)
+    X = (x % period).reshape(-1, 1)
+    model = PhaseBinnedModel(period, statistic=statistic, smoothing=smoothing).fit(X, y)
+    assert np.abs(model.predict(X) - np.sin(2 * np.pi * x / period)).mean() < 0.06
+    # empty bins are interpolated, phases out of the fitted range wrap around the period
+    model = PhaseBinnedModel(period, bins=100, statistic=statistic, smoothing=smoothing).fit(X[:20], y[:20])
+    assert np.isfinite(model.predict(X + period)).all()
+    assert np.allclose(model.predict(X + period), model.predict(X))
+
+
+def test_phase_binned_median():
+    X = np.array([[0.1], [0.2], [0.3], [0.6], [0.7]])
+    model = PhaseBinnedModel(1., bins=2, statistic="median").fit(X, [5., 1., 3., 2., 4.])
+    assert model.predict([[0.05], [0.95]]).tolist() == [3., 3.]
+    with pytest.raises(ValueError):
+        PhaseBinnedModel(1., statistic="mode")
+
+
+def test_find_period_model():
+    df = lc_frame(read_lc("51511_250130_1719.phc"))
+    kwargs = dict(number_steps=5000, minimum_number_of_datapoints_for_correlation_test=100,
+                  minimum_ratio_of_datapoints_for_shift_autocorrelation=0.003,
+                  consider_only_significant_correlation=False, level_of_significance_for_pearson=1e-7)
+    res = find_period(df.copy(), model="phase_mean", **kwargs)
+    assert res.period == 0.575 and isinstance(res.model, PhaseBinnedModel)
+    res_custom = find_period(df.copy(), model=lambda period: PhaseBinnedModel(period, statistic="mean"), **kwargs)
+    assert res_custom.period == res.period and res_custom.criteria == res.criteria
+    with pytest.raises(ValueError):
+        fit_model(df.assign(date_modulo=0.), model="svr")
+
+
+def test_bin_lc():
+    t = np.arange(10.)
+    assert np.array_equal(bin_lc(t, t * 2, 10)[1], t * 2) and np.array_equal(bin_lc(t, t * 2, None)[1], t * 2)
+    t = np.concatenate([np.arange(0, 100.), np.arange(500, 1000.)])  # gap
+    binned_t, binned_mag = bin_lc(t, t * 2, 100)
+    assert binned_t.size == 60 and np.array_equal(binned_mag, binned_t * 2)
+    assert binned_t[0] == 4.5 and binned_t[-1] == 994.5
+    # all points at the same time
+    assert [a.tolist() for a in bin_lc(np.full(200, 5.), np.arange(200.), 100)] == [[5.], [99.5]]
+
+
+def test_detect_period_full_span():
+    # periodic in second half only, first 2000 points are noise
+    rng = np.random.default_rng(0)
+    t = 1.7e9 + np.arange(6000.)
+    mag = 5 + rng.normal(0, 0.05, t.size)
+    mag[3000:] += 0.5 * np.sin(2 * np.pi * t[3000:] / 241.)
+    assert detect_period(t[:2000], mag[:2000], model="phase_mean") == -1
+    assert detect_period(t, mag, model="phase_mean", max_points=2000) == pytest.approx(241, rel=0.01)
+
+
+def test_find_period_time_budget(monkeypatch):
+    import app.period.find_period as find_period_module
+    periods = []
+
+    def fit_model(df_data, model="random_forest", period=None):
+        periods.append(period)
+        return auxiliary_fit_model(df_data, model=model, period=period)
+
+    auxiliary_fit_model = find_period_module.fit_model
+    monkeypatch.setattr(find_period_module, "fit_model", fit_model)
+    df = lc_frame(read_lc("51511_250130_1719.phc"))
+    kwargs = dict(number_steps=5000, minimum_number_of_datapoints_for_correlation_test=100,
+                  minimum_ratio_of_datapoints_for_shift_autocorrelation=0.003,
+                  consider_only_significant_correlation=False, level_of_significance_for_pearson=1e-7,
+                  model="phase_mean")
+    find_period(df.copy(), **kwargs)
+    assert len(periods) > 1
+    periods.clear()
+    res = find_period(df.copy(), time_budget=0, **kwargs)
+    assert periods == [] and res.period == -1  # out of budget after the autocorrelation
+
+    def slow_fit_model(df_data, model="random_forest", period=None):
+        time.sleep(1)
+        return fit_model(df_data, model=model, period=period)
+
+    monkeypatch.setattr(find_period_module, "fit_model", slow_fit_model)
+    res = find_period(df.copy(), time_budget=0.9, **kwargs)
+    assert len(periods) == 1 and res.period == periods[0]
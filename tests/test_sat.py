@@ -4,7 +4,11 @@ from tests.conftest import client
 import matplotlib
 matplotlib.use("Agg")
 from test_lc_upload import create_super_user
-from app.models import Satellite, Lightcurve
+import numpy as np
+from app.models import Satellite, Lightcurve, LightcurveStats, ObservationGeometry, UploadedFile, db
+import sqlalchemy as sa
+from app.lc_storage import configure_codec, codec_header, pack_array
+from app import cache
 
 
 def test_sat_phot(client, auth):
@@ -58,3 +62,268 @@ def test_sat_all(client, auth):
     response = client.get(f"/sat_plot_periods.html/{sat.id}")
     assert response.status_code == 200
     assert b"Number of LCs=" in response.data
+
+
+def test_lc_table_without_arrays(client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    sat = Satellite.get_by_norad(51511)
+    lc = Lightcurve.query.filter_by(sat_id=sat.id).first()
+    assert lc.n_points == 692
+    # arrays are deferred
+    assert "flux" not in lc.__dict__ and "date_time" not in lc.__dict__
+
+    response = client.post(f"/ajaxfile_lc/{sat.id}", data={
+        "draw": "1", "search[value]": "", "start": "0", "length": "10",
+        "order[0][column]": "0", "columns[0][data]": "ut_start", "order[0][dir]": "asc",
+    })
+    assert response.status_code == 200
+    data = response.get_json()["aaData"]
+    assert len(data) == 2
+    assert int(data[0]["N"]) == 692  # n_points * dt, sec
+    assert float(data[0]["amp"]) == round(lc.stats.amplitude, 2)
+
+    # missing statistics are shown as "-"
+    lcs = Lightcurve.query.filter_by(sat_id=sat.id).order_by(Lightcurve.ut_start, Lightcurve.band).all()
+    lcs[0].stats.amplitude = None
+    db.session.delete(lcs[1].stats)
+    db.session.commit()
+    cache.clear()  # LC query is memoized
+    response = client.post(f"/ajaxfile_lc/{sat.id}", data={
+        "draw": "1", "search[value]": "", "start": "0", "length": "10",
+        "order[0][column]": "0", "columns[0][data]": "ut_start", "order[0][dir]": "asc",
+    })
+    assert response.status_code == 200
+    assert [row["amp"] for row in response.get_json()["aaData"]] == ["-", "-"]
+
+
+def test_lc_plot_without_stats(app, client, auth):
+    from app.sat_utils import lc_mag_limits
+
+    create_super_user()
+    auth.login("super_user", "user_pass")
+    file1 = FileStorage(stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+                        filename="51511_250130_1719.phc")
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    lcs = Lightcurve.query.order_by(Lightcurve.ut_start, Lightcurve.band).all()
+    limits = lc_mag_limits(lcs[0])
+    lcs[0].stats.mag_min = lcs[0].stats.mag_max = lcs[0].stats.amplitude = None  # no finite mag
+    db.session.delete(lcs[1].stats)
+    db.session.commit()
+    lc = Lightcurve.get_by_id(lcs[0].id, arrays=True)
+    assert lc_mag_limits(lc) == limits  # from LC arrays
+
+    for multi in (False, True):
+        app.config["multi_lc_state"] = multi
+        for lc in lcs:
+            response = client.get(f"/sat_lc_plot.html/{lc.id}")
+            assert response.status_code == 200
+
+
+def test_sat_lc_counters(app, client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    sat = Satellite.get_by_norad(51511)
+    st_time = datetime.strptime('2025-01-30 17:19:41', '%Y-%m-%d %H:%M:%S')
+    assert sat.lc_count == 2
+    assert sat.band_counts == {"B": 1, "V": 1}
+    assert sat.first_lc_time == st_time and sat.last_lc_time == st_time
+
+    lc_b = Lightcurve.query.filter_by(sat_id=sat.id, band="B").first()
+    assert Lightcurve.delete_by_id(lc_b.id)
+    sat = Satellite.get_by_norad(51511)
+    assert sat.lc_count == 1
+    assert sat.band_counts == {"V": 1}
+
+    # break counters and repair them with CLI command
+    sat.lc_count = 10
+    sat.band_counts = {}
+    Lightcurve.query.session.commit()
+    result = app.test_cli_runner().invoke(args=["lc-repair-stats"])
+    assert "rebuilt" in result.output
+    sat = Satellite.get_by_norad(51511)
+    assert sat.lc_count == 1
+    assert sat.band_counts == {"V": 1}
+
+
+def test_synch_lc(client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    sat = Satellite.get_by_norad(51511)
+    lc_b, lc_v = Lightcurve.query.filter_by(sat_id=sat.id).order_by(Lightcurve.band).all()
+    assert lc_b.observation_group_id == lc_v.observation_group_id == lc_b.id
+
+    lcs = Lightcurve.get_synch_lc(lc_v.id)
+    assert [lc.band for lc in lcs] == ["B", "V"]
+    # time window query gives the same LCs
+    assert [lc.id for lc in Lightcurve.get_synch_lc(lc_v.id, diff_in_sec=300)] == [lc.id for lc in lcs]
+
+
+def test_lc_stats(client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    sat = Satellite.get_by_norad(51511)
+    lc = Lightcurve.query.filter_by(sat_id=sat.id, band="V").first()
+    stats = lc.stats
+    # stats are loaded with LC, arrays are not
+    assert "date_time" not in lc.__dict__
+
+    lc = Lightcurve.get_by_id(lc.id, arrays=True)
+    assert stats.n_points == len(lc.mag) == 692
+    assert stats.duration == lc.date_time[-1] - lc.date_time[0]
+    assert stats.mag_min == lc.mag.min() and stats.mag_max == lc.mag.max()
+    assert stats.amplitude == lc.mag.max() - lc.mag.min()
+    assert stats.mag_median == np.median(lc.mag)
+    assert stats.mag_err_median is None  # no errors in PHC files
+    assert stats.el_min == lc.el.min() and stats.rg_max == lc.rg.max()
+
+    response = client.get(f"/api/lightcurves/{lc.id}")
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["band"] == "V"
+    assert data["stats"]["amplitude"] == stats.amplitude
+
+    response = client.get("/api/lightcurves/satellite/51511")
+    assert response.status_code == 200
+    assert [x["band"] for x in response.get_json()] == ["B", "V"]
+    assert client.get("/api/lightcurves/satellite/1").status_code == 404
+
+    assert Lightcurve.delete_by_id(lc.id)
+    assert Lightcurve.query.count() == 1
+    assert LightcurveStats.query.count() == 1
+
+
+def test_shared_geometry(client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    # B and V of PHC file have the same time and geometry arrays, stored once
+    sat = Satellite.get_by_norad(51511)
+    lc_b, lc_v = Lightcurve.query.filter_by(sat_id=sat.id).order_by(Lightcurve.band).all()
+    assert ObservationGeometry.query.count() == 1
+    assert lc_b.geometry_id == lc_v.geometry_id
+    lc_v = Lightcurve.get_by_id(lc_v.id, arrays=True)
+    assert len(lc_v.date_time) == len(lc_v.az) == len(lc_v.mag) == 692
+
+    # geometry is deleted with the last LC which uses it
+    assert Lightcurve.delete_by_id(lc_b.id)
+    assert ObservationGeometry.query.count() == 1
+    assert Lightcurve.delete_by_id(lc_v.id)
+    assert ObservationGeometry.query.count() == 0
+
+
+def test_lc_recompress(app, client, auth):
+    create_super_user()
+    auth.login("super_user", "user_pass")
+
+    file1 = FileStorage(
+        stream=open("tests/lc_to_upload/51511_250130_1719.phc", "rb"),
+        filename="51511_250130_1719.phc",
+        content_type="application/octet-stream"
+    )
+    client.post("/sat_phot.html", data={"lc_file": [file1], "add": "1"},
+                content_type="multipart/form-data", follow_redirects=True)
+
+    lc_id = Lightcurve.query.first().id
+    lc = Lightcurve.get_by_id(lc_id, arrays=True)
+    mag, date_time = lc.mag.copy(), lc.date_time.copy()
+
+    configure_codec(compression="lzma")
+    try:
+        result = app.test_cli_runner().invoke(args=["lc-recompress"])
+    finally:
+        configure_codec(compression="zlib", level=6, max_error=None)
+    assert "lightcurve: 2 rows" in result.output
+    assert "observation_geometry: 1 rows" in result.output
+
+    lc = Lightcurve.get_by_id(lc_id, arrays=True)
+    assert np.array_equal(lc.mag, mag) and np.array_equal(lc.date_time, date_time)
+
+    # raw float64 array (stored before the codec) is converted by --raw-only
+    table = Lightcurve.__table__
+    db.session.execute(table.update().where(table.c.id == lc_id).values(
+        mag=sa.bindparam("mag", pack_array(mag), type_=db.LargeBinary)))
+    db.session.commit()
+    result = app.test_cli_runner().invoke(args=["lc-recompress", "--raw-only"])
+    assert "lightcurve: 2 rows" in result.output
+    blob = db.session.execute(sa.select(sa.type_coerce(table.c.mag, db.LargeBinary))
+                              .where(table.c.id == lc_id)).scalar()
+    assert codec_header(blob) is not None
+    assert np.array_equal(Lightcurve.get_by_id(lc_id, arrays=True).mag, mag)
+
+
+def test_lc_import(app, tmp_path, capsys):
+    night = tmp_path / "2025" / "0130"
+    night.mkdir(parents=True)
+    with open("tests/lc_to_upload/51511_250130_1719.phc", "rb") as f:
+        (night / "51511_250130_1719.phc").write_bytes(f.read())
+    (night / "bad.phV").write_bytes(b"not a LC")
+    (tmp_path / "notes.txt").write_text("text")
+    runner = app.test_cli_runner()
+
+    def lc_import(*args):
+        result = runner.invoke(args=["lc-import", str(tmp_path), "--processes", "1", *args])
+        # live logging of pytest takes sys.stdout back from CliRunner after first log record
+        captured = capsys.readouterr()
+        return result.output + captured.out + captured.err
+
+    output = lc_import("--dry-run")
+    assert "2 LC files in" in output
+    assert "1 error, 1 new" in output
+    assert Lightcurve.query.count() == 0 and UploadedFile.query.count() == 0
+
+    output = lc_import()
+    assert "1 added, 1 error" in output
+    assert "2025/0130/bad.phV: bad format" in output
+    assert Lightcurve.query.count() == 2
+    assert UploadedFile.query.one().n_lcs == 2
+
+    # second run: imported file is skipped by hash, failed file is tried again
+    assert "1 duplicate, 1 error" in lc_import()
+    assert Lightcurve.query.count() == 2